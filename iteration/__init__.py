@@ -1,5 +1,7 @@
-from .listwise import (chaintype, each_with_each, flatlist, GridFeed, ifish, indmap, MaskableList,
-                       UnevenNestingError, Nesting, nesting, ngrams, nlen, sequence_binary_mask, Stack)
-from .dictwise import sort_by_value, merge_2_dicts, dicta
-from .rangewise import Range, Multirange
+from .listwise import (apply_mask, apply_mask_many, bool_mask, CartesianProduct, chaintype, each_with_each, flatlist,
+                       GridFeed, ifish, iflatten, indmap, indmap_array, lchunks, MaskableList, UnevenNestingError,
+                       Nesting, nesting, ngrams, ngram_array, ngram_counts, ngram_counts_stream, nlen, nchunks,
+                       NumericStack, sequence_binary_mask, SharedSplitter, split_bounds, Stack)
+from .dictwise import deep_merge, sort_by_value, merge_2_dicts, dicta
+from .rangewise import coverage, Range, Multirange, RangeMap
 from .other import zipeven
\ No newline at end of file
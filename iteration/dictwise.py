@@ -1,3 +1,6 @@
+from itertools import chain
+from typing import Callable, Union
+import operator
 import string
 import logging
 
@@ -57,22 +60,62 @@ def sort_by_value(dictionary: dict) -> dict:
     return {k: v for k, v in sorted(dictionary.items(), key=lambda item: item[1])}
 
 
-def merge_2_dicts(a: dict, b: dict, keep='a'):
-    """merges 2 nested dicts
-    If there is a value collision use keep parameter to indicate the dictionary with priority"""
-    for key in b.keys():
-        if key in a.keys():
-            if isinstance(a[key], dict) and isinstance(b[key], dict):
-                merge_2_dicts(a[key], b[key])
-            elif a[key] == b[key]:
-                pass
+def _union(a, b):
+    if isinstance(a, (set, frozenset)) and isinstance(b, (set, frozenset)):
+        return a | b
+    if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        return type(a)(chain(a, (e for e in b if e not in a)))
+    if a == b:
+        return a
+    raise TypeError(f'Could not union {type(a)} and {type(b)} values.')
+
+
+RESOLVERS = {
+    'a': lambda a, b: a,
+    'b': lambda a, b: b,
+    'union': _union,
+    'sum': operator.add,
+}
+
+
+def deep_merge(a: dict, b: dict, resolver: Union[str, Callable] = 'a', copy: bool = False) -> dict:
+    """
+    merges nested dict b into nested dict a, walking both with an explicit stack, so depth is not limited by recursion.
+    Keys missing in a are taken from b, dicts present in both are merged, other collisions are resolved by resolver:
+        'a' - keeps the value of a
+        'b' - takes the value of b
+        'union' - union of sets, or lists/tuples of a extended with elements of b missing in a
+        'sum' - a + b
+        callable - resolver(value_a, value_b) returns the merged value
+    copy=False merges into a and returns it. copy=True leaves a and b unchanged (copy on write):
+    only dicts on merged paths are copied, other subtrees are shared with a and b.
+    """
+    if isinstance(resolver, str):
+        if resolver not in RESOLVERS:
+            raise ValueError(f'resolver must be one of {tuple(RESOLVERS)} or a callable. Got {resolver}')
+        resolver = RESOLVERS[resolver]
+    elif not callable(resolver):
+        raise TypeError(f'resolver must be str or callable. Got {type(resolver)}')
+
+    merged = dict(a) if copy else a
+    stack = [(merged, b)]
+    while stack:
+        target, source = stack.pop()
+        for key, value in source.items():
+            if key not in target:
+                target[key] = value
+                continue
+            current = target[key]
+            if isinstance(current, dict) and isinstance(value, dict):
+                if copy:
+                    current = target[key] = dict(current)
+                stack.append((current, value))
             else:
-                if keep == 'a':
-                    pass
-                else:
-                    a[key] = b[key]
-        else:
-            a[key] = b[key]
-    return a
+                target[key] = resolver(current, value)
+    return merged
 
 
+def merge_2_dicts(a: dict, b: dict, keep='a'):
+    """merges 2 nested dicts
+    If there is a value collision use keep parameter to indicate the dictionary with priority"""
+    return deep_merge(a, b, resolver='a' if keep == 'a' else 'b')
@@ -1,10 +1,18 @@
-from collections.abc import Iterable, Callable, Sequence, Generator, Mapping
+from collections.abc import Iterable, Callable, Sequence, MutableSequence, Generator, Mapping
 from typing import Optional, NoReturn, Any
-from itertools import chain, product
+from itertools import chain, compress, product, islice
+from operator import itemgetter
 from collections import deque, UserList
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass, field
+from multiprocessing.shared_memory import SharedMemory
+import array
+import json
+import os
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 import random
-from math import ceil, floor
+from math import ceil, floor, prod
 
 
 def chaintype(t: type, *iterators: Iterable):
@@ -24,53 +32,280 @@ def chaintype(t: type, *iterators: Iterable):
 
 
 def each_with_each(*iterables):
-    """this function is actually faster than itertools.product"""
-    if len(iterables) == 1:
-        return ((i,) for i in iterables[0])
-    first = iterables[0]
-    rest = iterables[1:]
-    return (tuple((i,*j)) for i in first for j in each_with_each(*rest))
+    """
+    cartesian product of iterables as tuples, like itertools.product
+    The first iterable is consumed lazily, so it can be infinite or huge.
+    The other ones are read once into tuples, so one shot generators can be combined too.
+    """
+    if not iterables:
+        return iter(CartesianProduct())
+    pools = CartesianProduct(*iterables[1:]).pools
+    return chain.from_iterable(product((first,), *pools) for first in iterables[0])
+
+
+class CartesianProduct(Sequence):
+    """
+    Cartesian product of iterables as a lazy sequence of tuples.
+    Iterables are read once into tuples (pools), combinations are not stored.
+
+    Attributes:
+        pools: list of tuples - values of the iterables
+        sizes: list of ints - lengths of pools
+    Supported operations:
+        len - product of pool sizes
+        iter - itertools.product over pools, in C
+        indexing - i-th combination decoded as a mixed radix number (last pool changes fastest), O(number of pools)
+        slicing - returns list of combinations
+    Methods:
+        arrays(chunksize) - generator of 2 dimensional np.ndarray chunks of combinations, one combination per row
+    """
+    def __init__(self, *iterables: Iterable):
+        self.pools = [tuple(it) for it in iterables]
+        self.sizes = [len(pool) for pool in self.pools]
+        self.strides = [prod(self.sizes[j + 1:]) for j in range(len(self.sizes))]
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self[i] for i in range(len(self))[item]]
+        elif isinstance(item, int):
+            i = range(len(self))[item]
+            return tuple(pool[(i // stride) % size] for pool, stride, size in
+                         zip(self.pools, self.strides, self.sizes))
+        else:
+            raise TypeError(f'CartesianProduct indices must be integers or slices, not {type(item)}')
+
+    def __iter__(self):
+        return product(*self.pools)
+
+    def __len__(self):
+        return prod(self.sizes)
+
+    def __repr__(self):
+        return f'<CartesianProduct: sizes={self.sizes}, len={len(self)}>'
+
+    def arrays(self, chunksize: int = 65536, start: int = 0, stop: Optional[int] = None):
+        """
+        Yields combinations start to stop as 2 dimensional arrays of up to chunksize rows.
+        Row indices are unraveled with np.unravel_index and pool values are gathered with fancy indexing,
+        so no python tuple is made. Pools are converted with np.asarray, dtype of rows is their common type.
+        Pools of different dtype kinds (eg. ints and strings) or of sequences give object rows
+        holding the original values, instead of values cast to a common type.
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        pools = [np.asarray(pool) for pool in self.pools]
+        if len({pool.dtype.kind for pool in pools}) > 1 or any(pool.ndim != 1 for pool in pools):
+            pools = [np.fromiter(pool, dtype=object, count=len(pool)) for pool in self.pools]
+        dtype = np.result_type(*pools) if pools else np.int64
+        for chunk_start in range(start, stop, chunksize):
+            rows = np.arange(chunk_start, min(chunk_start + chunksize, stop))
+            chunk = np.empty((len(rows), len(pools)), dtype=dtype)
+            if not pools:
+                yield chunk
+                continue
+            for j, (pool, digits) in enumerate(zip(pools, np.unravel_index(rows, self.sizes))):
+                chunk[:, j] = pool[digits]
+            yield chunk
+
+
+FLATTEN_TYPES = (tuple, list, set, Generator, map)
+_flattenable = dict()  # type: bool - cached classification of types against FLATTEN_TYPES
+
+
+def iflatten(l, arrays: bool = True):
+    """
+    Generator flattening nested lists, tuples, sets, generators and maps.
+    It keeps a stack of iterators, so depth of nesting is not limited by recursion.
+    If arrays is True, np.ndarray elements are flattened too, as python scalars.
+    """
+    if arrays and type(l) is np.ndarray:
+        yield from l.ravel().tolist()
+        return
+    stack = [iter(l)]
+    while stack:
+        for item in stack[-1]:
+            t = type(item)
+            if arrays and t is np.ndarray:
+                yield from item.ravel().tolist()
+                continue
+            if t not in _flattenable:
+                _flattenable[t] = issubclass(t, FLATTEN_TYPES)
+            if _flattenable[t]:
+                stack.append(iter(item))
+                break
+            yield item
+        else:
+            stack.pop()
 
 
 def flatlist(l) -> list:
     """flattens nested lists"""
-    items = []
-    for item in l:
-        if isinstance(item, (tuple, list, set, Generator, map)):
-            items += flatlist(item)
-        else:
-            items.append(item)
-    return items
+    return list(iflatten(l, arrays=False))
+
+
+@dataclass
+class GridResult:
+    """result of fn called with one GridFeed combination; index is the position in the full grid"""
+    index: int
+    params: dict
+    result: Any
+    seconds: float
+
 
+def _run_grid_chunk(fn: Callable, chunk: list) -> list:
+    from ptbutil.time.timing import Stopper
+    results = []
+    for index, params in chunk:
+        stopper = Stopper()
+        stopper.start()
+        result = fn(**params)
+        results.append(GridResult(index, params, result, stopper.stop().total))
+    return results
 
-class GridFeed:
+
+def _grid_batches(fn: Callable, chunks: Iterable, executor: Optional[str], max_workers: Optional[int]):
+    """yields lists of GridResult as chunks complete, keeping at most 2 chunks per worker submitted"""
+    if executor is None:
+        for chunk in chunks:
+            yield _run_grid_chunk(fn, chunk)
+        return
+    pool_class = ProcessPoolExecutor if executor == 'process' else ThreadPoolExecutor
+    with pool_class(max_workers) as pool:
+        in_flight = 2 * (max_workers or os.cpu_count() or 1)
+        futures = {pool.submit(_run_grid_chunk, fn, chunk) for chunk in islice(chunks, in_flight)}
+        try:
+            while futures:
+                finished, futures = wait(futures, return_when=FIRST_COMPLETED)
+                futures |= {pool.submit(_run_grid_chunk, fn, chunk) for chunk in islice(chunks, len(finished))}
+                for future in finished:
+                    yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def _read_checkpoint(path: str) -> dict:
+    """results recorded in a GridFeed.map checkpoint, {} if there is none yet"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('results', {})
+    except FileNotFoundError:
+        return {}
+
+
+def _write_checkpoint(path: str, results: dict) -> None:
+    """writes a temporary file and replaces the checkpoint with it, so an interrupted write keeps the old one"""
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as f:
+        json.dump({'results': results}, f)
+    os.replace(temporary, path)
+
+
+class GridFeed(Sequence):
     """GridFeed is an object that lazily reconfigures dict of lists into list of single valued dicts
-    containing permutations of original values. GridFeed is an iterable, it has __iter__ method.
+    containing permutations of original values. GridFeed is a lazy sequence - combinations are decoded on demand.
     Attributres:
-        collections: dict - input data - a dictionary of lists
-        combinations : list - output data - a list of dinglevalued dictionaries that are permutations of collections."""
-    def __init__(self, collections):
+        collections: list - input data - values of the dictionary of lists, as tuples
+        keys: list - keys of the dictionary of lists
+        indices: range - positions of the full grid covered by this GridFeed
+        combinations : iterator - output data - single valued dictionaries that are permutations of collections.
+
+    Length is the product of collection sizes. grid[i] decodes i as a mixed radix number
+    (last key changes fastest, as in itertools.product). Slicing and partition return GridFeed views
+    over a range of grid positions, so no combinations are enumerated.
+    map(fn, ...) evaluates fn on the combinations in a process or thread pool.
+    """
+    def __init__(self, collections, indices: Optional[range] = None):
         if isinstance(collections, dict):
             if all([isinstance(v, Iterable) for k, v in collections.items()]):
-                self.collections = [value for key, value in collections.items()]
+                self.collections = [tuple(value) for key, value in collections.items()]
                 self.keys = [key for key, value in collections.items()]
-                self.combinations = ({key: value for key, value in zip(self.keys, set_)} for set_ in
-                                     product(*self.collections))
             else:
                 raise TypeError(f'One of passed values is not an iterable')
         elif isinstance(collections, GridFeed):
             self.collections = collections.collections
             self.keys = collections.keys
-            self.combinations = collections.combinations
+            indices = collections.indices if indices is None else indices
         else:
             raise TypeError(f'Passed type {type(collections)}. '
                             f'Expected tuple, list, set or dictionary of iterables.')
+        self.sizes = [len(c) for c in self.collections]
+        # strides[j] - number of grid positions between consecutive values of key j
+        self.strides = [prod(self.sizes[j + 1:]) for j in range(len(self.sizes))]
+        self.indices = range(prod(self.sizes)) if indices is None else indices
+
+    @property
+    def combinations(self):
+        return iter(self)
+
+    def _decode(self, i: int) -> dict:
+        return {key: c[(i // stride) % size] for key, c, stride, size in
+                zip(self.keys, self.collections, self.strides, self.sizes)}
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return GridFeed(self, indices=self.indices[item])
+        elif isinstance(item, int):
+            return self._decode(self.indices[item])
+        else:
+            raise TypeError(f'GridFeed indices must be integers or slices, not {type(item)}')
 
     def __iter__(self):
-        return ({key: value for key, value in zip(self.keys, set_)} for set_ in product(*self.collections))
+        if self.indices == range(prod(self.sizes)):
+            return ({key: value for key, value in zip(self.keys, set_)} for set_ in product(*self.collections))
+        return (self._decode(i) for i in self.indices)
 
     def __len__(self):
-        return len(tuple(iter(self)))
+        return len(self.indices)
+
+    def __repr__(self):
+        return f'<GridFeed: keys={self.keys}, len={len(self)}>'
+
+    def map(self, fn: Callable, executor: Optional[str] = 'process', max_workers: Optional[int] = None,
+            chunksize: int = 1, stop: Optional[Callable] = None, checkpoint: Optional[str] = None):
+        """
+        Calls fn(**combination) for every combination and yields GridResult objects as they complete.
+        :param fn: callable accepting grid keys as keyword arguments, picklable for process executor
+        :param executor: 'process', 'thread' or None to run in the calling thread
+        :param max_workers: number of workers, None leaves it to the executor
+        :param chunksize: number of combinations sent to a worker at once
+        :param stop: callable accepting GridResult, when it returns True no further results are yielded
+            and not started chunks are cancelled
+        :param checkpoint: path of a json file. Results are recorded there under 'results' key
+            as {grid index: result} (so they must be json serializable), and combinations recorded
+            by a previous run are skipped. The file is rewritten after every batch and when map returns,
+            nothing is kept open or written afterwards.
+        """
+        if executor not in ('process', 'thread', None):
+            raise ValueError(f"executor must be 'process', 'thread' or None. Got {executor}")
+        if chunksize < 1:
+            raise ValueError(f'chunksize must be a positive int. Got {chunksize}')
+        recorded = _read_checkpoint(checkpoint) if checkpoint else {}
+        done = {int(i) for i in recorded}
+        todo = ((i, self._decode(i)) for i in self.indices if i not in done)
+        chunks = iter(lambda: list(islice(todo, chunksize)), [])
+        batches = _grid_batches(fn, chunks, executor, max_workers)
+        try:
+            for batch in batches:
+                for result in batch:
+                    recorded[str(result.index)] = result.result
+                    yield result
+                    if stop is not None and stop(result):
+                        return
+                if checkpoint:
+                    _write_checkpoint(checkpoint, recorded)
+        finally:
+            batches.close()
+            if checkpoint:
+                _write_checkpoint(checkpoint, recorded)
+
+    def partition(self, n_workers: int, worker_id: int):
+        """
+        Returns GridFeed of every n_workers-th combination starting at worker_id,
+        so workers get disjoint parts of the grid differing in length by at most 1.
+        """
+        if not 0 <= worker_id < n_workers:
+            raise ValueError(f'worker_id must be in range(n_workers). Got {worker_id} for {n_workers} workers.')
+        return self[worker_id::n_workers]
 
 
 def ifish(it: Iterable, indexes: Iterable):
@@ -78,12 +313,35 @@ def ifish(it: Iterable, indexes: Iterable):
     USE:
     ifish(range(10,20), 3, 5, 6)
     13, 15, 16
+
+    Elements come in the order of the iterable, negative and out of range indexes are skipped.
+    Sequences are accessed directly by index (one fancy indexing for np.ndarray),
+    other iterables are consumed only up to the biggest index.
     """
     if not isinstance(it, Iterable):
         raise TypeError(f'function ifish can olny fish elements of an iterable. Got type {type(it)}')
+    indexes = set(indexes)
     if any(not isinstance(i, int) for i in indexes):
         raise TypeError(f'Indexes must be type int.')
-    return [e for n, e in enumerate(it) if n in indexes]
+    if isinstance(it, (Sequence, np.ndarray)):
+        positions = sorted(i for i in indexes if 0 <= i < len(it))
+        if not positions:
+            return []
+        if isinstance(it, np.ndarray):
+            return list(it[positions])
+        if len(positions) == 1:
+            return [it[positions[0]]]
+        return list(itemgetter(*positions)(it))
+    last = max(indexes, default=-1)
+    fished = []
+    if last < 0:
+        return fished
+    for n, e in enumerate(it):
+        if n in indexes:
+            fished.append(e)
+            if n == last:
+                break
+    return fished
 
 
 def indmap(fn, sequence, indices=None):
@@ -91,6 +349,7 @@ def indmap(fn, sequence, indices=None):
     :param fn: cal that accepts one argument and returns resulting object,
     :param sequence: any Sequence type,
     :param indices: any Collection type with integer indexes.
+    Elements after the biggest index are yielded without checking indices.
     """
     if not isinstance(sequence, Sequence):
         raise TypeError('sequences must be Sequence type. This means it has to have __getitem__ method implemented.')
@@ -99,17 +358,27 @@ def indmap(fn, sequence, indices=None):
     if not indices:
         yield from sequence
         return
-    elif any(not isinstance(ind, int) for ind in indices):
+    indices = set(indices)
+    if any(not isinstance(ind, int) for ind in indices):
         raise ValueError('indices must be a collection of integers.')
-    else:
-        l = len(sequence)
-        ind = 0
-        while ind < l:
-            if ind in indices:
-                yield fn(sequence[ind])
-            else:
-                yield sequence[ind]
-            ind += 1
+    last = max(indices)
+    iterator = iter(sequence)
+    for ind, e in zip(range(last + 1), iterator):
+        yield fn(e) if ind in indices else e
+    yield from iterator
+
+
+def indmap_array(fn, array: np.ndarray, indices) -> np.ndarray:
+    """
+    Vectorized indmap for np.ndarray: returns a copy of array with fn applied once
+    to the sub array of elements (or rows) at indices. fn must accept and return an array.
+    Negative indices count from the end, as in numpy.
+    """
+    array = np.array(array)
+    indices = np.unique(np.asarray(list(indices), dtype=np.intp))
+    if len(indices):
+        array[indices] = fn(array[indices])
+    return array
 
 
 def lsplit(seq: Sequence, length: int):
@@ -133,6 +402,241 @@ def lsplit(seq: Sequence, length: int):
     return splits
 
 
+BUFFER_TYPES = (bytes, bytearray, memoryview, array.array)
+
+
+def _viewable(data):
+    """memoryview of buffers, so slicing them does not copy"""
+    return memoryview(data) if isinstance(data, BUFFER_TYPES) else data
+
+
+def split_bounds(length: int, n: int) -> list:
+    """(start, stop) bounds of n consecutive parts of length elements, part lengths differ by at most 1"""
+    if n < 1:
+        raise ValueError(f'Number of parts must be a positive int. Got {n}')
+    size, reminder = divmod(length, n)
+    bounds = []
+    start = 0
+    for i in range(n):
+        stop = start + size + (i < reminder)
+        bounds.append((start, stop))
+        start = stop
+    return bounds
+
+
+def lchunks(data, length: int):
+    """
+    Generator of consecutive chunks of declared length, without copying data where possible:
+        bytes, bytearray, memoryview, array.array - memoryview slices
+        np.ndarray - views
+        other sequences - slices made one at a time (lists and tuples copy a chunk, range does not)
+        iterators and other iterables - lazy islice based chunks; each must be consumed before taking the next one
+    """
+    if length < 1:
+        raise ValueError(f'Chunk length must be a positive int. Got {length}')
+    data = _viewable(data)
+    if isinstance(data, (memoryview, np.ndarray, Sequence)):
+        for start in range(0, len(data), length):
+            yield data[start: start + length]
+    else:
+        iterator = iter(data)
+        for first in iterator:
+            yield chain((first,), islice(iterator, length - 1))
+
+
+def nchunks(data, n: int) -> list:
+    """Splits a sized data into n balanced chunks, which are views as in lchunks."""
+    data = _viewable(data)
+    return [data[start: stop] for start, stop in split_bounds(len(data), n)]
+
+
+@dataclass
+class SharedChunk:
+    """
+    Picklable handle of rows start:stop of an array in shared memory, made by SharedSplitter.
+    Used as a context manager it gives the rows as an ndarray view, nothing is copied:
+        with chunk as view:
+            total = view.sum()
+    The view must not be used after leaving the block.
+    """
+    name: str
+    dtype: str
+    shape: tuple
+    start: int
+    stop: int
+    _shm: Any = field(default=None, repr=False, compare=False)
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __enter__(self) -> np.ndarray:
+        self._shm = SharedMemory(name=self.name)
+        return np.ndarray(self.shape, dtype=np.dtype(self.dtype), buffer=self._shm.buf)[self.start: self.stop]
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        shm, self._shm = self._shm, None
+        try:
+            shm.close()
+        except BufferError:  # a view is still referenced, the mapping is released with it
+            pass
+
+    def __getstate__(self):
+        return {**self.__dict__, '_shm': None}
+
+
+class SharedSplitter:
+    """
+    Copies an array (or bytes) once into shared memory and splits it into SharedChunk handles,
+    so worker processes receive a few picklable fields instead of pickled data.
+
+    Usage:
+        def work(chunk):
+            with chunk as view:
+                return float(view.sum())
+
+        with SharedSplitter(array) as splitter:
+            with ProcessPoolExecutor() as pool:
+                sums = list(pool.map(work, splitter.split(8)))
+
+    Methods:
+        split(n) - n balanced chunks along the first axis
+        chunks(length) - chunks of declared number of rows
+        close() - releases and removes the shared memory block, called on leaving the with block
+    """
+
+    def __init__(self, data):
+        if isinstance(data, BUFFER_TYPES[:3]):
+            data = np.frombuffer(data, dtype=np.uint8)
+        data = np.asarray(data)
+        if data.dtype == object:
+            raise TypeError('SharedSplitter can not share arrays of python objects.')
+        self.shm = SharedMemory(create=True, size=max(data.nbytes, 1))
+        self.array = np.ndarray(data.shape, dtype=data.dtype, buffer=self.shm.buf)
+        self.array[...] = data
+
+    def _chunk(self, start: int, stop: int) -> SharedChunk:
+        return SharedChunk(self.shm.name, self.array.dtype.str, self.array.shape, start, stop)
+
+    def split(self, n: int) -> list:
+        return [self._chunk(start, stop) for start, stop in split_bounds(len(self.array), n)]
+
+    def chunks(self, length: int) -> list:
+        if length < 1:
+            raise ValueError(f'Chunk length must be a positive int. Got {length}')
+        return [self._chunk(start, min(start + length, len(self.array))) for start in range(0, len(self.array), length)]
+
+    def close(self):
+        self.array = None
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+MASK_OFF_CHARACTERS = np.array([ord('0'), ord(' ')], dtype=np.uint32)
+
+
+def bool_mask(mask, length: Optional[int] = None, packed: bool = False, bitorder: str = 'big') -> np.ndarray:
+    """
+    Converts a mask into np.ndarray of bools:
+        str - characters other than '0' and ' ' are True, as in MaskableList.mask
+        int - binary mask read from the lowest bit, as in sequence_binary_mask; requires length
+        packed bits (packed=True) - bytes or uint8 array made with np.packbits, unpacked with np.unpackbits
+        np.ndarray or other iterable - truth values of elements
+    If length is given, the mask is cut or padded with False to length.
+    """
+    if packed:
+        bits = np.unpackbits(np.frombuffer(mask, dtype=np.uint8) if isinstance(mask, (bytes, bytearray)) else
+                             np.asarray(mask, dtype=np.uint8), count=length, bitorder=bitorder)
+        mask = bits.view(bool)
+    elif isinstance(mask, int):
+        if length is None:
+            raise ValueError('length is required for int masks.')
+        if mask < 0:
+            raise ValueError('Binary mask must be a positive integer.')
+        mask = mask & ((1 << length) - 1)
+        data = np.frombuffer(mask.to_bytes((length + 7) // 8, 'little'), dtype=np.uint8)
+        mask = np.unpackbits(data, count=length, bitorder='little').view(bool)
+    elif isinstance(mask, str):
+        codes = np.frombuffer(mask.encode('utf-32-le'), dtype=np.uint32)
+        mask = ~np.isin(codes, MASK_OFF_CHARACTERS)
+    elif isinstance(mask, np.ndarray):
+        mask = mask.astype(bool, copy=False)
+    elif isinstance(mask, Iterable):
+        mask = np.fromiter((bool(e) for e in mask), dtype=bool)
+    else:
+        raise TypeError(f'Mask must be iterable, int or packed bits. Received: {mask}')
+    if length is not None and len(mask) != length:
+        mask = mask[:length] if len(mask) > length else np.concatenate((mask, np.zeros(length - len(mask), bool)))
+    return mask
+
+
+def _contiguous(indices: np.ndarray) -> Optional[slice]:
+    """slice of indices if they make a contiguous run"""
+    if len(indices) and indices[-1] - indices[0] + 1 == len(indices):
+        return slice(int(indices[0]), int(indices[-1]) + 1)
+    return None
+
+
+def apply_mask(sequence, mask, reduce: bool = True, fill=None, **mask_kwargs):
+    """
+    Masks a sequence with a mask of any form accepted by bool_mask (mask_kwargs are passed to it).
+    Missing mask positions are False.
+    reduce=True returns the selected elements:
+        np.ndarray - a view if the selected elements are contiguous, a fancy indexed copy otherwise
+        memoryview - a memoryview slice if contiguous, a list otherwise
+        other sequences - a list
+    reduce=False keeps positions:
+        np.ndarray - np.ma.MaskedArray with masked unselected elements, a view of the data
+        other sequences - a list with fill in place of unselected elements
+    """
+    mask = bool_mask(mask, length=len(sequence), **mask_kwargs)
+    if reduce:
+        if isinstance(sequence, (np.ndarray, memoryview)):
+            indices = np.flatnonzero(mask)
+            if (run := _contiguous(indices)) is not None:
+                return sequence[run]
+            if isinstance(sequence, np.ndarray):
+                return sequence[indices]
+        return list(compress(sequence, mask.tolist()))
+    if isinstance(sequence, np.ndarray):
+        return np.ma.masked_array(sequence, mask=~mask, copy=False)
+    return [e if m else fill for e, m in zip(sequence, mask.tolist())]
+
+
+def apply_mask_many(sequences, mask, reduce: bool = True, fill=None, **mask_kwargs):
+    """
+    Masks many sequences of equal length with one mask, converted once.
+    2 dimensional np.ndarray is masked along columns in a single indexing operation
+    (a view if the selected columns are contiguous). Other sequences are masked with one itemgetter.
+    Returns ndarray or list of lists.
+    """
+    if isinstance(sequences, np.ndarray) and sequences.ndim == 2:
+        mask = bool_mask(mask, length=sequences.shape[1], **mask_kwargs)
+        if not reduce:
+            return np.ma.masked_array(sequences, mask=np.broadcast_to(~mask, sequences.shape), copy=False)
+        indices = np.flatnonzero(mask)
+        run = _contiguous(indices)
+        return sequences[:, run if run is not None else indices]
+    sequences = list(sequences)
+    if not sequences:
+        return []
+    mask = bool_mask(mask, length=len(sequences[0]), **mask_kwargs)
+    if not reduce:
+        return [apply_mask(sequence, mask, reduce=False, fill=fill) for sequence in sequences]
+    indices = np.flatnonzero(mask).tolist()
+    if not indices:
+        return [[] for _ in sequences]
+    getter = itemgetter(*indices)
+    if len(indices) == 1:
+        return [[getter(sequence)] for sequence in sequences]
+    return [list(getter(sequence)) for sequence in sequences]
+
+
 class MaskableList(list):
     def __init__(self, lista=None):
         if lista is None:
@@ -144,13 +648,10 @@ class MaskableList(list):
     def mask(self, m, reduce=False):
         if not isinstance(m, Iterable):
             raise TypeError(f'Mask must be iterable. Received: {m}')
-        if type(m) == str:
-            m = [e.replace('0','').replace(' ','') for e in m]
-        m = [bool(el) for el in m]
-        prod = lambda x, y: x if y else None
+        m = bool_mask(m).tolist()
         if reduce:
-            return(pair[0] for pair in zip(self, m) if pair[1])
-        return (prod(*pair) for pair in zip(self, m))
+            return compress(self, m)
+        return (e if keep else None for e, keep in zip(self, m))
 
 
 def mix_sequence(seq, n: Optional[int] = None, k: Optional[float] = 1):
@@ -186,6 +687,9 @@ class UnevenNestingError(Exception):
     pass
 
 
+_end = object()
+
+
 class Nesting:
     """
         this class calculates nesting of iterables
@@ -211,9 +715,21 @@ class Nesting:
 
         self.common_iteration_types = (list, tuple, set, dict, np.ndarray, Iterable, Sequence, Generator)
         self.common_non_iteration_types = (int, float, str, bool, None, np.str_)
+        # types are compared by equality, so they are kept in sets for O(1) classification
+        self._nesting_types = self._type_set(self.nesting_type, self.common_iteration_types)
+        self._nested_types = self._type_set(self.nested_type, self.common_non_iteration_types)
 
         self.nesting = self._nesting(self.iterables)
 
+    @staticmethod
+    def _type_set(entry_type, default: tuple) -> set:
+        if not entry_type:
+            return set(default)
+        elif isinstance(entry_type, (tuple, list)):
+            return set(entry_type)
+        else:
+            return {entry_type}
+
     @staticmethod
     def _validate_entry_types(entry_type, parameter_name) -> NoReturn:
         message = f'{parameter_name} must be type or tuple of types.'
@@ -227,100 +743,73 @@ class Nesting:
 
     def _check_nesting_type(self, type_: type) -> bool:
         """checks if passed type is a nesting type"""
-        if self.nesting_type:
-            if isinstance(self.nesting_type, (tuple, list)):
-                if any(type_ == nt for nt in self.nesting_type):
-                    return True
-                else:
-                    return False
-            else:
-                if type_ == self.nesting_type:
-                    return True
-                else:
-                    return False
-        else:
-            if any(type_ == cit for cit in self.common_iteration_types):
-                return True
-            else:
-                return False
+        return type_ in self._nesting_types
 
     def _check_nested_type(self, type_: type) -> bool:
         """checks if passed type is a nested type"""
-        if self.nested_type:
-            if isinstance(self.nested_type, (tuple, list)):
-                if any(type_ == nt for nt in self.nested_type):
-                    return True
-                else:
-                    return False
-            else:
-                if type_ == self.nested_type:
-                    return True
-                else:
-                    return False
-        else:
-            if any(type_ == cnit for cnit in self.common_non_iteration_types):
-                return True
-            else:
-                return False
+        return type_ in self._nested_types
 
-    def _nesting(self, iterables: Iterable, _n=0) -> int:
+    def _visit(self, iterables, _n: int):
+        """returns nesting of iterables, or an iterator of its elements if they have to be visited"""
+        nesting_types = self._nesting_types
+        type_ = type(iterables)
         if self.nested_type:
-            if self._check_nested_type(type(iterables)):
+            nested_types = self._nested_types
+            if type_ in nested_types:
                 return _n
-            elif self._check_nesting_type(type(iterables)):  # possibly nesting_type:
-                if all(self._check_nested_type(type(token)) for token in iterables):
-                    return _n + 1
-                else:
-                    inner_types = {type(token) for token in iterables}
-                    if len(inner_types) == 0:
-                        return _n + 1
-                    elif len(inner_types) == 1:
-                        type_ = inner_types.pop()
-                        if self._check_nesting_type(type_):
-                            nestings_ = {self._nesting(token, _n=_n + 1) for token in iterables}
-                            if len(nestings_) > 1:
-                                raise UnevenNestingError('Uneven _nesting. Check data')
-                            else:
-                                return nestings_.pop()
-                        else:
-                            raise TypeError(f'Unsuported nested type or the found type has not been declared. '
-                                            f'Found {str(type_)} type')
-                    else:
-                        raise UnevenNestingError(f'Data contain various types or uneven nesting used.'
-                                                 f' Can only accept evenly nested Iterables of strings.'
-                                                 f' Types {str(inner_types)} have been found at the same level.')
-            else:
-                raise TypeError(f'Unresolved type {type(iterables)}. '
+            elif type_ not in nesting_types:
+                raise TypeError(f'Unresolved type {type_}. '
                                 f'Most likely bot nesting_type and nested_type have been declared, '
-                                f'and type {type(iterables)} has not been included.')
-
+                                f'and type {type_} has not been included.')
+            elif all(type(token) in nested_types for token in iterables):
+                return _n + 1
+            found = 'type'
         else:
-            if self._check_nesting_type(type(iterables)):  # possibly nesting_type:
-                if all(not self._check_nesting_type(type(token)) for token in iterables):  # none inner is nesting
-                    return _n + 1  # so probbably all innner are nested
-                else:  # at least one inner is nesting
-                    inner_types = {type(token) for token in iterables}
-                    if len(inner_types) == 0:
-                        return _n + 1
-                    elif len(inner_types) == 1:
-                        type_ = inner_types.pop()
-                        if self._check_nesting_type(type_):
-                            nestings_ = {self._nesting(token, _n=_n + 1) for token in iterables}
-                            if len(nestings_) > 1:
-                                raise UnevenNestingError('Uneven _nesting. Check data')
-                            else:
-                                return nestings_.pop()
-                        else:
-                            raise TypeError(f'Unsuported nested type or the found type has not been declared. '
-                                            f'Found {str(type_)} type.')
-                    else:
-                        raise UnevenNestingError(f'Data contain various types or uneven nesting used.'
-                                                 f' Can only accept evenly nested Iterables of strings.'
-                                                 f' Types {str(inner_types)} have been found at the same level.')
-            else:  # not nesting type -> so possibly nested type
-                self.nested_type = list()
-                self.nested_type.append(type(iterables))
-                return _n
+            if type_ is np.ndarray and iterables.dtype != object and iterables.ndim:
+                # elements of a numeric or string array are not nesting types, only the shape counts
+                empty = [i for i, size in enumerate(iterables.shape) if size == 0]
+                return _n + (empty[0] + 1 if empty else iterables.ndim)
+            if all(type(token) not in nesting_types for token in iterables):  # none inner is nesting
+                return _n + 1  # so probbably all innner are nested
+            found = 'type.'
+
+        inner_types = {type(token) for token in iterables}
+        if len(inner_types) == 1:
+            inner_type = inner_types.pop()
+            if inner_type in nesting_types:
+                return iter(iterables)
+            raise TypeError(f'Unsuported nested type or the found type has not been declared. '
+                            f'Found {str(inner_type)} {found}')
+        raise UnevenNestingError(f'Data contain various types or uneven nesting used.'
+                                 f' Can only accept evenly nested Iterables of strings.'
+                                 f' Types {str(inner_types)} have been found at the same level.')
+
+    def _nesting(self, iterables: Iterable, _n=0) -> int:
+        if not self.nested_type and not self._check_nesting_type(type(iterables)):
+            # not nesting type -> so possibly nested type
+            self.nested_type = [type(iterables)]
+            self._nested_types = {type(iterables)}
+            return _n
+
+        # depth first walk with a stack of [elements iterator, nesting of elements, found nestings of elements]
+        stack = []
+        value = self._visit(iterables, _n)
+        while True:
+            if isinstance(value, int):
+                if not stack:
+                    return value
+                stack[-1][2].add(value)
+            else:
+                stack.append([value, (stack[-1][1] if stack else _n) + 1, set()])
+            elements, n, nestings_ = stack[-1]
+            token = next(elements, _end)
+            if token is _end:
+                stack.pop()
+                if len(nestings_) > 1:
+                    raise UnevenNestingError('Uneven _nesting. Check data')
+                value = nestings_.pop()
+            else:
+                value = self._visit(token, n)
 
 
 def nesting(iterables, nested_type: Optional[type] = None, nesting_type: Optional[type] = None):
@@ -354,6 +843,140 @@ def ngrams(iterable: Iterable, n: int = 1):
             break
 
 
+def ngram_array(tokens, n: int = 2, pad: Optional[int] = None) -> np.ndarray:
+    """
+    Returns 2 dimensional array of n-grams of token ids, one n-gram per row.
+    Without padding it is a read only view of tokens, nothing is copied.
+    With pad, n - 1 pad ids are added on both sides, as ngrams does with None.
+    """
+    if n < 1:
+        raise ValueError('ngrams parameter must be bigger than 0.')
+    tokens = np.asarray(tokens)
+    if pad is not None:
+        tokens = np.concatenate((np.full(n - 1, pad, dtype=tokens.dtype), tokens, np.full(n - 1, pad, dtype=tokens.dtype)))
+    if len(tokens) < n:
+        return np.empty((0, n), dtype=tokens.dtype)
+    return sliding_window_view(tokens, n)
+
+
+def _packed_ngram_keys(seq: np.ndarray, ns: Sequence, base: int) -> dict:
+    """keys of all n-grams of seq packed into int64 as base-digit numbers, n-gram keys are built from (n-1)-gram keys"""
+    keys = {}
+    key = seq.astype(np.int64)
+    for n in range(1, max(ns) + 1):
+        if n > 1:
+            key = key[:-1] * base + seq[n - 1:]
+        if n in ns:
+            keys[n] = key
+    return keys
+
+
+def _unpack_ngram_keys(keys: np.ndarray, n: int, base: int) -> np.ndarray:
+    powers = base ** np.arange(n - 1, -1, -1, dtype=np.int64)
+    return (keys[:, None] // powers) % base
+
+
+def _merge_counts(keys: np.ndarray, counts: np.ndarray, new_keys: np.ndarray, new_counts: np.ndarray) -> tuple:
+    """merges two sorted arrays of unique keys with their counts, in linear time"""
+    at = np.searchsorted(keys, new_keys)
+    found = at < len(keys)
+    found[found] = keys[at[found]] == new_keys[found]
+    counts = counts.copy()
+    counts[at[found]] += new_counts[found]
+    missing = ~found
+    return np.insert(keys, at[missing], new_keys[missing]), np.insert(counts, at[missing], new_counts[missing])
+
+
+def _flush_counts(total: tuple, buffer: list) -> tuple:
+    new_keys, new_counts = np.unique(np.concatenate(buffer), return_counts=True)
+    buffer.clear()
+    return _merge_counts(*total, new_keys, new_counts.astype(np.int64))
+
+
+def _check_token_ids(tokens: np.ndarray, vocab_size: int) -> NoReturn:
+    if len(tokens) and (tokens.min() < 0 or tokens.max() >= vocab_size):
+        raise ValueError(f'Token ids must be in range({vocab_size}). '
+                         f'Got ids from {tokens.min()} to {tokens.max()}.')
+
+
+# number of n-gram keys collected from chunks before they are merged with the counts
+NGRAM_MERGE_BUFFER = 1 << 20
+
+
+def ngram_counts_stream(chunks: Iterable, n=(1, 2), vocab_size: int = None, pad: Optional[int] = None) -> dict:
+    """
+    Counts n-grams of token ids coming in chunks (arrays or lists), for corpora that do not fit in memory.
+    n-grams crossing chunk borders are counted once. Several n values are counted in one pass.
+    Each n-gram is packed into a single int64 (token ids are digits of a number in base vocab_size),
+    so counting is np.unique over integers. vocab_size must be given and vocab_size ** max(n) must fit in int64.
+    Token ids and pad must be in range(vocab_size), otherwise ValueError is raised.
+    Keys of chunks are buffered and merged with the counts once the buffer is at least as long
+    as the counts (and NGRAM_MERGE_BUFFER), so counts are not rebuilt for every chunk.
+    :return: dict of n: (grams, counts) - grams is 2 dimensional array of unique n-grams in lexicographic order
+    """
+    ns = (n,) if isinstance(n, int) else tuple(sorted(set(n)))
+    if not ns or ns[0] < 1:
+        raise ValueError('ngrams parameter must be bigger than 0.')
+    if vocab_size is None or vocab_size < 1:
+        raise ValueError(f'vocab_size must be a positive int. Got {vocab_size}')
+    if pad is not None and not 0 <= pad < vocab_size:
+        raise ValueError(f'pad must be in range({vocab_size}). Got {pad}')
+    top = ns[-1]
+    if vocab_size ** top > np.iinfo(np.int64).max:
+        raise ValueError(f'{top}-grams of vocabulary of {vocab_size} do not fit in int64.')
+    totals = {k: (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)) for k in ns}
+    buffers = {k: [] for k in ns}
+    buffered = dict.fromkeys(ns, 0)
+    carry = np.empty(0, dtype=np.int64)
+    position = 0  # position of carry[0] in the whole padded stream
+    if pad is not None:
+        # pad ids for the longest n-grams, windows of shorter n-grams are trimmed to their own n - 1 pad ids
+        chunks = chain([np.full(top - 1, pad, dtype=np.int64)], chunks)
+    for chunk, last in chain(((chunk, False) for chunk in chunks),
+                             [(np.full(top - 1, pad, dtype=np.int64), True)] if pad is not None else []):
+        chunk = np.asarray(chunk, dtype=np.int64)
+        _check_token_ids(chunk, vocab_size)
+        seq = np.concatenate((carry, chunk))
+        for k, keys in _packed_ngram_keys(seq, ns, vocab_size).items():
+            # n-grams lying within carry were counted with the previous chunk
+            first = len(carry) - k + 1
+            stop = len(keys)
+            if pad is not None:
+                first = max(first, top - k - position)
+                if last:
+                    stop -= top - k
+            if stop > max(first, 0):
+                buffers[k].append(keys[max(first, 0): stop])
+                buffered[k] += stop - max(first, 0)
+                if buffered[k] >= max(len(totals[k][0]), NGRAM_MERGE_BUFFER):
+                    totals[k] = _flush_counts(totals[k], buffers[k])
+                    buffered[k] = 0
+        carry = seq[len(seq) - min(top - 1, len(seq)):]
+        position += len(seq) - len(carry)
+    for k in ns:
+        if buffers[k]:
+            totals[k] = _flush_counts(totals[k], buffers[k])
+    return {k: (_unpack_ngram_keys(keys, k, vocab_size), counts) for k, (keys, counts) in totals.items()}
+
+
+def ngram_counts(tokens, n=(1, 2), pad: Optional[int] = None) -> dict:
+    """
+    Counts n-grams of an array of non negative token ids for one or several n values at once.
+    With pad, n - 1 pad ids are added on both sides of tokens for each n.
+    Negative token ids or pad raise ValueError.
+    :return: dict of n: (grams, counts) - grams is 2 dimensional array of unique n-grams in lexicographic order
+    """
+    tokens = np.asarray(tokens, dtype=np.int64)
+    ns = (n,) if isinstance(n, int) else tuple(sorted(set(n)))
+    if (len(tokens) and tokens.min() < 0) or (pad is not None and pad < 0):
+        raise ValueError('Token ids and pad must be non negative.')
+    base = int(max(tokens.max(initial=0), pad or 0)) + 1
+    if base ** max(ns) <= np.iinfo(np.int64).max:
+        return ngram_counts_stream([tokens], n=ns, vocab_size=base, pad=pad)
+    # n-grams that can not be packed are compared as rows
+    return {k: np.unique(ngram_array(tokens, k, pad), axis=0, return_counts=True) for k in ns}
+
+
 def nlen(*iterables):
     """przyjmuje dowolną liczbę argumentów
     zwraca długości wszystkich argumentów
@@ -392,32 +1015,247 @@ def sequence_binary_mask(sequence, binary_mask: int = 0):
     """returns a generator of elements from sequence masked with a binary number.
     Binary mask is read from right, but sequence  is read from left.
     sequence = 'abcde' and mask = 0b1101 will return (a,c,d).
-    :param binary_mask: can be any positive integer"""
-    ind = 0
-    l = len(sequence)
-    while ind < l:
-        if binary_mask >> ind & 1:
-            yield sequence[ind]
-        else:
-            pass
-        ind += 1
+    :param binary_mask: can be any integer, negative ones are read as infinite two's complement (-1 keeps all)"""
+    binary_mask &= (1 << len(sequence)) - 1
+    for ind in np.flatnonzero(bool_mask(binary_mask, length=len(sequence))).tolist():
+        yield sequence[ind]
 
 
-class Stack(list):
+class Stack(MutableSequence):
     """Classical stack object with maximum size declaration.
+    It is a fixed capacity ring buffer, so appending to a full stack evicts the oldest element in O(1).
+    Supports list API: indexing, slicing (returns list), len, iter, in, ==, +, append, extend, pop, insert, del,
+    sort, copy and to_list.
+    Unlike the list based Stack it replaces, it is not a list subclass: isinstance(stack, list) is False
+    and json.dumps needs stack.to_list(). extend and insert keep max_size too, evicting the oldest elements.
     For bidirectional object find collections.deque"""
     def __init__(self, lista=None, max_size=100):
-        super().__init__()
         lista = lista or []
         if not isinstance(lista, list):
             raise TypeError('Passed object is not list.')
-        self.max_size = max_size
-        [self.append(x) for x in lista]
+        self._max_size = max_size
+        self._reset(lista)
+
+    def _reset(self, items: list):
+        """refills the buffer with the last max_size items"""
+        items = items[-self._max_size:] if self._max_size else []
+        self._buffer = items + [None] * (self._max_size - len(items))
+        self._start = 0
+        self._len = len(items)
+
+    @property
+    def max_size(self) -> int:
+        return self._max_size
+
+    @max_size.setter
+    def max_size(self, max_size: int):
+        items = list(self)
+        self._max_size = max_size
+        self._reset(items)
+
+    def _position(self, index: int) -> int:
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError('Stack index out of range')
+        return (self._start + index) % self._max_size
 
     def append(self, item):
-        if len(self) >= self.max_size:
-            self.pop(0)
-        super().append(item)
+        if not self._max_size:
+            return
+        if self._len == self._max_size:
+            self._buffer[self._start] = item
+            self._start = (self._start + 1) % self._max_size
+        else:
+            self._buffer[(self._start + self._len) % self._max_size] = item
+            self._len += 1
+
+    def pop(self, index: int = -1):
+        if index in (-1, self._len - 1):
+            position = self._position(-1)
+            self._len -= 1
+        elif index in (0, -self._len):
+            position = self._position(0)
+            self._start = (self._start + 1) % self._max_size
+            self._len -= 1
+        else:
+            items = list(self)
+            item = items.pop(index)
+            self._reset(items)
+            return item
+        item, self._buffer[position] = self._buffer[position], None
+        return item
+
+    def clear(self):
+        self._reset([])
+
+    def copy(self):
+        return Stack(list(self), max_size=self._max_size)
+
+    def to_list(self) -> list:
+        return list(self)
+
+    def sort(self, *, key=None, reverse=False):
+        self._reset(sorted(self, key=key, reverse=reverse))
+
+    def insert(self, index: int, item):
+        items = list(self)
+        items.insert(index, item)
+        self._reset(items)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self[i] for i in range(*item.indices(self._len))]
+        return self._buffer[self._position(item)]
+
+    def __setitem__(self, key, value):
+        if isinstance(key, slice):
+            items = list(self)
+            items[key] = value
+            self._reset(items)
+        else:
+            self._buffer[self._position(key)] = value
+
+    def __delitem__(self, key):
+        items = list(self)
+        del items[key]
+        self._reset(items)
+
+    def __iter__(self):
+        stop = self._start + self._len
+        yield from self._buffer[self._start: min(stop, self._max_size)]
+        if stop > self._max_size:
+            yield from self._buffer[: stop - self._max_size]
+
+    def __len__(self):
+        return self._len
+
+    def __add__(self, other):
+        """concatenation gives a list, as it did when Stack was a list"""
+        return list(self) + list(other)
+
+    def __radd__(self, other):
+        return list(other) + list(self)
+
+    def __eq__(self, other):
+        if isinstance(other, Stack):
+            other = list(other)
+        return list(self) == other
+
+    def __repr__(self):
+        return f'Stack({list(self)}, max_size={self._max_size})'
+
+
+class NumericStack:
+    """
+    Fixed capacity window of numbers in a numpy ring buffer, with O(1) rolling statistics.
+    Appending to a full stack evicts the oldest value.
+    sum and mean are updated with each append (and recomputed every max_size evictions to limit float drift),
+    min and max are kept in monotonic deques, so all of them are O(1) (amortized for min and max).
+
+    Attributes:
+        max_size: int - capacity
+        dtype: numpy dtype of values
+    Methods:
+        append(value), extend(values), clear()
+        array() - ordered copy of values, oldest first
+        sum(), mean(), min(), max()
+        full - True if the stack holds max_size values
+    """
+    def __init__(self, values: Optional[Iterable] = None, max_size: int = 100, dtype=np.float64):
+        if max_size < 1:
+            raise ValueError(f'max_size must be a positive int. Got {max_size}')
+        self.max_size = max_size
+        self.dtype = np.dtype(dtype)
+        self.clear()
+        if values is not None:
+            self.extend(values)
+
+    def clear(self):
+        self._buffer = np.zeros(self.max_size, dtype=self.dtype)
+        self._start = 0
+        self._len = 0
+        self._appended = 0  # number of values ever appended, it numbers values in the deques
+        self._evicted = 0
+        self._sum = self.dtype.type(0)
+        self._mins = deque()  # (number, value) with increasing values
+        self._maxs = deque()  # (number, value) with decreasing values
+
+    def append(self, value):
+        value = self.dtype.type(value)
+        if self._len == self.max_size:
+            self._evict()
+        self._buffer[(self._start + self._len) % self.max_size] = value
+        self._len += 1
+        self._sum += value
+        number = self._appended
+        self._appended += 1
+        while self._mins and self._mins[-1][1] >= value:
+            self._mins.pop()
+        self._mins.append((number, value))
+        while self._maxs and self._maxs[-1][1] <= value:
+            self._maxs.pop()
+        self._maxs.append((number, value))
+
+    def _evict(self):
+        number = self._appended - self._len
+        self._sum -= self._buffer[self._start]
+        self._start = (self._start + 1) % self.max_size
+        self._len -= 1
+        if self._mins[0][0] == number:
+            self._mins.popleft()
+        if self._maxs[0][0] == number:
+            self._maxs.popleft()
+        self._evicted += 1
+        if self._evicted % self.max_size == 0:
+            self._sum = self.array().sum(dtype=self.dtype)
+
+    def extend(self, values: Iterable):
+        for value in values:
+            self.append(value)
+
+    def array(self) -> np.ndarray:
+        return np.roll(self._buffer, -self._start)[:self._len]
+
+    @property
+    def full(self) -> bool:
+        return self._len == self.max_size
+
+    def sum(self):
+        return self._sum
+
+    def mean(self) -> float:
+        if not self._len:
+            raise ValueError('mean of an empty NumericStack')
+        return float(self._sum) / self._len
+
+    def min(self):
+        if not self._len:
+            raise ValueError('min of an empty NumericStack')
+        return self._mins[0][1]
+
+    def max(self):
+        if not self._len:
+            raise ValueError('max of an empty NumericStack')
+        return self._maxs[0][1]
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return self.array()[item]
+        if item < 0:
+            item += self._len
+        if not 0 <= item < self._len:
+            raise IndexError('NumericStack index out of range')
+        return self._buffer[(self._start + item) % self.max_size]
+
+    def __iter__(self):
+        return iter(self.array())
+
+    def __len__(self):
+        return self._len
+
+    def __repr__(self):
+        return f'<NumericStack len={self._len}, max_size={self.max_size}, dtype={self.dtype}>'
 
 
 class TypeRestrictedList(UserList):
@@ -1,67 +1,47 @@
-from collections.abc import Iterable, Generator
+from collections.abc import Iterable
 from typing import Tuple
 
 
 DLI_MESSAGE = 'Different length iterables.'
 
+try:
+    zip(strict=True)
+    STRICT_ZIP = True
+except TypeError:  # python < 3.10
+    STRICT_ZIP = False
 
-def zipeven(*iterables: Iterable) -> Generator:
+
+def zipeven(*iterables: Iterable) -> Iterable:
     """
-    this does the same thig as zip bur raises if iterables lengths are uneven
+    this does the same thig as zip bur raises ValueError if iterables lengths are uneven
+    If all iterables are sized, lengths are checked at once and plain zip is returned.
+    Otherwise it is a streaming strict zip: ValueError is raised when the shortest iterable ends,
+    all elements before are yielded. It uses zip(strict=True) where available.
     :return:
     """
-
-    l = 0
-    gen_detected = 0
-    non_gen_detected = 0
-
-    for ind, it in enumerate(iterables):
+    lengths = set()
+    for it in iterables:
         try:
-            it_l = len(it)
-            if non_gen_detected > 0 and it_l != l:
-                raise ValueError(DLI_MESSAGE)
-            l = it_l
-            non_gen_detected += 1
-
+            lengths.add(len(it))
         except TypeError:
-            if isinstance(it, Generator):
-                gen_detected += 1
-                continue
-            else:
-                raise NotImplemented from TypeError(f'{type(it)}')
-
-    if gen_detected:
-        return _zip_with_generators(*iterables)
+            break
     else:
+        if len(lengths) > 1:
+            raise ValueError(DLI_MESSAGE)
         return zip(*iterables)
 
-
-def _zip_with_generators(*iterables):
-    iterables = [iter(it) for it in iterables]
-    safe = 0
-    while True:
-        safe += 1
-        if safe > 5:
-            break
-        yieldable = []
-        for ind, it in enumerate(iterables):
-            try:
-                yieldable.append(next(it))
-            except StopIteration:
-                if ind == 0:
-                    return _deplete_others(*iterables[1:])  # check if others end in the next step too
-                else:
-                    raise ValueError(DLI_MESSAGE)
-
-        yield tuple(yieldable)
-        # not need to break while loop as this happens at the StopIteration
+    if STRICT_ZIP:
+        return zip(*iterables, strict=True)
+    return _zip_strict(*iterables)
 
 
-def _deplete_others(*iterables):
-    for it in iterables:
-        try:
-            next(it)  # expected to raise StopIteration
+def _zip_strict(*iterables):
+    iterators = [iter(it) for it in iterables]
+    end = object()
+    while True:
+        items = tuple(next(it, end) for it in iterators)
+        if all(item is end for item in items):
+            return
+        if any(item is end for item in items):
             raise ValueError(DLI_MESSAGE)
-        except StopIteration:
-            continue
-    return  # If all iterables end at the same time
+        yield items
@@ -1,11 +1,17 @@
 """
 inspired by: advent of code 2023 day 5
 
-Range and Multirange classes
+Range, Multirange and RangeMap classes
+coverage function counting how many ranges cover each sub-interval
 """
 
 from collections.abc import Iterable
 import math
+import numpy as np
+
+
+INT64_MIN = int(np.iinfo(np.int64).min)
+INT64_MAX = int(np.iinfo(np.int64).max)
 
 
 class Range:
@@ -103,7 +109,7 @@ class Range:
 
     def difference(self, other):
         if isinstance(other, Multirange):
-            return other.difference(self)
+            return Multirange(self).difference(other)
         if not isinstance(other, self.__class__):
             raise TypeError(f'{type(other)}')
 
@@ -182,10 +188,104 @@ class Range:
         return self.__class__(start, stop)
 
 
+# Interval arrays are int64, unless some boundary does not fit int64 - then they are object arrays of python ints,
+# so Range boundaries of any size are kept exactly. Arrays of object dtype are converted back to int64 when they fit.
+def _int_array(values) -> np.ndarray:
+    try:
+        return np.asarray(values, dtype=np.int64)
+    except OverflowError:
+        return np.asarray(values, dtype=object)
+
+
+def _add(a: np.ndarray, b, sign: int = 1) -> np.ndarray:
+    """a + sign * b of int arrays (b can be an int), on python ints if the result does not fit int64"""
+    b = _int_array(b)
+    if not len(a):
+        return a.copy()
+    if a.dtype != object and b.dtype != object:
+        b_lo, b_hi = (int(b.min()), int(b.max())) if sign > 0 else (-int(b.max()), -int(b.min()))
+        if INT64_MIN <= int(a.min()) + b_lo and int(a.max()) + b_hi <= INT64_MAX:
+            return a + b if sign > 0 else a - b
+    return _int_array(a.astype(object) + sign * b.astype(object))
+
+
+def _overlaps(a_starts, a_stops, b_starts, b_stops) -> tuple:
+    """
+    Pairs of overlapping ranges of two sorted disjoint interval arrays.
+    Returns starts, stops of the overlaps and indices of the a and b ranges they come from.
+    """
+    # ranges of b overlapping a[i] are b[lo[i]:hi[i]]
+    lo = np.searchsorted(b_stops, a_starts, side='right')
+    hi = np.searchsorted(b_starts, a_stops, side='left')
+    counts = np.maximum(hi - lo, 0)
+    a_index = np.repeat(np.arange(len(a_starts)), counts)
+    b_index = np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts - lo, counts)
+    starts = np.maximum(a_starts[a_index], b_starts[b_index])
+    stops = np.minimum(a_stops[a_index], b_stops[b_index])
+    keep = starts < stops
+    return starts[keep], stops[keep], a_index[keep], b_index[keep]
+
+
+def _complement(starts, stops, *others) -> tuple:
+    """
+    gaps between sorted disjoint ranges, unbounded ends are INT64_MIN and INT64_MAX,
+    or infinities if the ranges or the others arrays, which the gaps will be intersected with, are of object dtype
+    """
+    if any(a.dtype == object for a in (starts, stops, *others)):
+        lo, hi = np.array([-math.inf], dtype=object), np.array([math.inf], dtype=object)
+    else:
+        lo, hi = np.array([INT64_MIN], dtype=np.int64), np.array([INT64_MAX], dtype=np.int64)
+    return np.concatenate((lo, stops)), np.concatenate((starts, hi))
+
+
+def _interval_arrays(r) -> tuple:
+    if isinstance(r, Range):
+        return _int_array([r.start]), _int_array([r.stop])
+    elif isinstance(r, Multirange):
+        return r.starts, r.stops
+    else:
+        raise TypeError(f'Expected Range or Multirange. Got {type(r)}')
+
+
+def coverage(*ranges) -> tuple:
+    """
+    Counts how many of the Range or Multirange arguments cover each sub-interval, in one sweep over all endpoints.
+    Returns numpy arrays (starts, stops, counts) of sorted disjoint sub-intervals covered at least once.
+    Neighbouring sub-intervals always have different counts.
+    """
+    arrays = [_interval_arrays(r) for r in ranges]
+    empty = np.empty(0, dtype=np.int64)
+    starts = np.concatenate([a for a, _ in arrays] or [empty])
+    stops = np.concatenate([b for _, b in arrays] or [empty])
+    keep = starts < stops
+    starts, stops = starts[keep], stops[keep]
+    points = np.concatenate((starts, stops))
+    if not len(points):
+        return empty, empty, empty
+    deltas = np.concatenate((np.ones(len(starts), dtype=np.int64), np.full(len(stops), -1, dtype=np.int64)))
+    # inputs are sorted runs, which stable sort merges
+    order = np.argsort(points, kind='stable')
+    points, deltas = points[order], deltas[order]
+    first = np.ones(len(points), dtype=bool)
+    first[1:] = points[1:] != points[:-1]
+    groups = np.flatnonzero(first)
+    points, deltas = points[groups], np.add.reduceat(deltas, groups)
+    # points where one range stops and another starts do not change the count
+    points = points[deltas != 0]
+    counts = np.cumsum(deltas[deltas != 0])[:-1]
+    covered = counts > 0
+    return points[:-1][covered], points[1:][covered], counts[covered]
+
+
 class Multirange:
     """
     Multirange is a union type object of multiple Range objects.
-    If Ranges included in the Multirange object overlap, they are reduced so all common elements are present.
+    If Ranges included in the Multirange object overlap or touch, they are reduced so all common elements are present.
+
+    Ranges are kept as two sorted numpy int64 arrays of disjoint start and stop values,
+    so set operations are vectorized sweeps and lookups are binary searches.
+    Boundaries, which do not fit int64, are kept as python ints in object arrays.
+    An empty Multirange is lower than any other.
 
     Instantiation accepts:
     - any even number of integers to indicate start and stop values of Ranges to be included
@@ -194,19 +294,25 @@ class Multirange:
         will make 2 included ranges (2,4) and (7,9)
     - Range objects
     - Multirange objects
-
-
+    Multirange() is empty.
 
     methods:
         - union(other: Union[Range, Multirange]) - works as set.union. Returns Multirange.
         - intersection(other: Union[Range, Multirange]) - works as set.intersection. Returns Multirange.
-        - shift(v: int) - shifts all Range objects by v. Returns Multirange.
+        - difference(other: Union[Range, Multirange]) - works as set.difference. Returns Range or Multirange.
+        - shift(v: Union[int, Iterable[int]]) - shifts all Range objects by v or each Range by its value. Returns self.
+        - contains_many(values) - returns numpy bool array of membership of values
+        - Multirange.union_all(*ranges), Multirange.intersect_all(*ranges) - set operations on many
+            Range or Multirange objects at once
     properties:
+        - ranges - tuple of included Range objects
+        - starts, stops - numpy arrays of range boundaries
         - info - returns printable information
 
     supported operations:
-        =, <, >, len, iter, indexing, slicing
-        Indexing returns iteger, slicing returns range
+        =, <, >, len, iter, indexing, slicing, hash
+        Indexing returns iteger, slicing returns Multirange. Both work on range boundaries, so they do not
+        enumerate elements.
 
     Slicing does not support stepped or inverse order slicing:
     [1:4:2] is illegal (stepped slicing)
@@ -214,94 +320,88 @@ class Multirange:
     """
 
     def __add__(self, other):
-        if isinstance(other, Range):
-            ranges = self.ranges
-            ranges.append(other)
-        elif isinstance(other, self.__class__):
-            ranges = self.ranges + other.ranges
+        if isinstance(other, (Range, self.__class__)):
+            return self.union(other)
         else:
             raise TypeError(f'Could not add Multirange and {type(other)}')
-        return Multirange(*ranges)
 
     def __contains__(self, v):
-        return any(v in r for r in self.ranges)
+        i = int(np.searchsorted(self._starts, v, side='right')) - 1
+        return i >= 0 and bool(v < self._stops[i])
 
     def __eq__(self, other):
         if not isinstance(other, self.__class__):
             raise TypeError(f'{type(other)}')
-        return self.ranges == other.ranges
+        return np.array_equal(self._starts, other._starts) and np.array_equal(self._stops, other._stops)
 
     def __getitem__(self, item):
         if isinstance(item, int):
-            if item < 0:
-                i = len(self) + item
-                if i >= 0:
-                    return self[i]
-                else:
-                    raise IndexError(f'{item}')
-            else:
-                for r in self.ranges:
-                    try:
-                        return r[item]
-                    except IndexError:
-                        item = item - len(r)
+            size = self._size()
+            i = size + item if item < 0 else item
+            if not 0 <= i < size:
                 raise IndexError(f'{item}')
+            # offsets[k] is the number of elements before range k
+            k = int(np.searchsorted(self._offsets, i, side='right')) - 1
+            return int(self._starts[k]) + i - int(self._offsets[k])
 
         elif isinstance(item, slice):
             if item.step is not None:
                 raise ValueError('Multirange does not support stepped slicing.')
-            start = item.start or 0
-            stop = item.stop or len(self)
-            if start < 0:
-                start = len(self) + start
-            if stop < 0:
-                stop = len(self) + stop
+            start, stop, _ = item.indices(self._size())
             if start > stop:
                 raise ValueError('Multirange does not support inverse order slicing.')
             return self._slice(start, stop)
+        else:
+            raise TypeError(f'{item}')
 
     def __hash__(self):
-        return hash(''.join(repr(r) for r in self.ranges))
+        if self._starts.dtype == object or self._stops.dtype == object:
+            return hash((tuple(self._starts.tolist()), tuple(self._stops.tolist())))
+        return hash((self._starts.tobytes(), self._stops.tobytes()))
 
     def _slice(self, start, stop):
-        it = iter(self)
-        for _ in range(start):
-            next(it)
-        for _ in range(start, stop):
-            try:
-                yield next(it)
-            except StopIteration:
-                return
+        """Multirange of elements at positions start to stop, found with binary search over prefix sums"""
+        if start >= stop:
+            return self.__class__()
+        first = int(np.searchsorted(self._offsets, start, side='right')) - 1
+        last = int(np.searchsorted(self._offsets, stop - 1, side='right')) - 1
+        first_start = int(self._starts[first]) + start - int(self._offsets[first])
+        last_stop = int(self._starts[last]) + stop - int(self._offsets[last])
+        starts = np.concatenate((_int_array([first_start]), self._starts[first + 1: last + 1]))
+        stops = np.concatenate((self._stops[first: last], _int_array([last_stop])))
+        return self._from_arrays(starts, stops, reduce=False)
 
     def __init__(self, *r):
         if all(isinstance(i, Range) for i in r):
-            ranges = r
+            starts = [i.start for i in r]
+            stops = [i.stop for i in r]
         elif all(isinstance(i, int) for i in r):
             if len(r) % 2 != 0:
                 raise ValueError(f'Expected even number of elements if indexes are used for instantiation.')
-            ranges = []
-            for ind in range(0, len(r) - 1, 2):
-                ranges.append(Range(r[ind], r[ind + 1]))
-        elif all(isinstance(i, (Multirange, Range)) for i in r) :
-            ranges = set()
-            for i in r:
-                if isinstance(i, Range):
-                    ranges.add(i)
-                elif isinstance(i, Multirange):
-                    ranges = ranges.union(set(i.ranges))
-                else:
-                    raise RuntimeError('This code has a flaw here.')
+            starts, stops = r[0::2], r[1::2]
+            for start, stop in zip(starts, stops):
+                if stop < start:
+                    raise ValueError(f'Stop index can not be lower than start: {(start, stop)}')
+        elif all(isinstance(i, (Multirange, Range)) for i in r):
+            arrays = [_interval_arrays(i) for i in r]
+            starts = np.concatenate([a for a, _ in arrays])
+            stops = np.concatenate([b for _, b in arrays])
         else:
             raise TypeError(f'Multirange requires int indices OR Range objects OR Multirange objects at instantiation.')
-        self.ranges = sorted(self._reduce(ranges))
+        self._set_arrays(*self._reduce(_int_array(starts), _int_array(stops)))
 
     def __iter__(self):
-        for r in self.ranges:
-            for e in range(r.start, r.stop):
-                yield e
+        for start, stop in zip(self._starts.tolist(), self._stops.tolist()):
+            yield from range(start, stop)
 
     def __len__(self):
-        return sum(len(r) for r in self.ranges)
+        return self._size()
+
+    def _size(self) -> int:
+        """number of elements as python int, len() fails above sys.maxsize"""
+        if not len(self._starts):
+            return 0
+        return int(self._offsets[-1]) + int(self._stops[-1]) - int(self._starts[-1])
 
     def __lt__(self, other) -> bool:
         """
@@ -309,129 +409,322 @@ class Multirange:
         """
         if not isinstance(other, self.__class__):
             raise TypeError(f'{type(other)}')
-        if self.ranges[0].start == other.ranges[0].start:
-            if self.ranges[-1].stop == other.ranges[-1].stop:
-                return len(self) < len(other)
+        if not len(self._starts) or not len(other._starts):
+            return not len(self._starts) and len(other._starts) > 0
+        if self._starts[0] == other._starts[0]:
+            if self._stops[-1] == other._stops[-1]:
+                return self._size() < other._size()
             else:
-                return self.ranges[-1].stop < other.ranges[-1].stop
+                return bool(self._stops[-1] < other._stops[-1])
         else:
-            return self.ranges[0].start < other.ranges[0].start
+            return bool(self._starts[0] < other._starts[0])
 
     def __repr__(self) -> str:
         template = '({}:{})'
         return f'<Multirange:{"".join((template.format(r.start, r.stop) for r in self.ranges))}>'
 
-    def _reduce(self, ranges):
-        ranges = sorted(ranges)
-        r = ranges[0]
-        try:
-            other = ranges[1]
-        except IndexError:
-            return [r]
-
-        if r.stop < other.start:  # not overlapping
-            result = [r]
-            result.extend(self._reduce(ranges[1:]))
-            return result
-        else:  # overlapping
-            union = r.union(other)
-            return self._reduce((union, *ranges[2:]))
+    @classmethod
+    def _from_arrays(cls, starts: np.ndarray, stops: np.ndarray, reduce: bool = True):
+        multirange = cls.__new__(cls)
+        if reduce:
+            starts, stops = cls._reduce(starts, stops)
+        multirange._set_arrays(starts, stops)
+        return multirange
+
+    def _set_arrays(self, starts: np.ndarray, stops: np.ndarray):
+        self._starts = _int_array(starts)
+        self._stops = _int_array(stops)
+        lengths = _add(self._stops, self._starts, -1)
+        offsets = np.cumsum(lengths)
+        if offsets.dtype != object and (offsets < 0).any():  # int64 overflow
+            offsets = np.cumsum(lengths.astype(object))
+        self._offsets = _int_array(np.concatenate((np.zeros(1, dtype=offsets.dtype), offsets[:-1])))
+
+    @staticmethod
+    def _reduce(starts: np.ndarray, stops: np.ndarray) -> tuple:
+        """sorts ranges, drops empty ones and merges overlapping or touching ones"""
+        keep = stops > starts
+        starts, stops = starts[keep], stops[keep]
+        if not len(starts):
+            return starts, stops
+        order = np.argsort(starts, kind='stable')
+        starts, stops = starts[order], stops[order]
+        reach = np.maximum.accumulate(stops)
+        first = np.empty(len(starts), dtype=bool)
+        first[0] = True
+        first[1:] = starts[1:] > reach[:-1]
+        groups = np.flatnonzero(first)
+        return starts[groups], np.maximum.reduceat(stops, groups)
+
+    @staticmethod
+    def _intersect(a_starts, a_stops, b_starts, b_stops) -> tuple:
+        """intersection of two reduced interval arrays, the result is reduced too"""
+        starts, stops, _, _ = _overlaps(a_starts, a_stops, b_starts, b_stops)
+        return starts, stops
+
+    @staticmethod
+    def _as_arrays(other) -> tuple:
+        if isinstance(other, (Range, Multirange)):
+            return _interval_arrays(other)
+        else:
+            raise TypeError(f'{type(other)}')
 
-    def difference(self, other):
-        ranges = set()
-        if isinstance(other, Range):
-            for r in self.ranges:
-                ranges.add(r.difference(other))
-        if isinstance(other, Multirange):
-            for r in self.ranges:
-                for ro in other.ranges:
-                    if r.intersection(ro):
-                        ranges.add(r.difference(ro))
-                    else:
-                        ranges.add(r)
-        ranges = {r for r in ranges if r}
-        if not ranges:
+    def _simplified(self):
+        """None if empty, Range if single, else self"""
+        if not len(self._starts):
             return None
-        if len(ranges) == 1:
-            return ranges.pop()
-        return Multirange(*ranges)
+        elif len(self._starts) == 1:
+            return Range(int(self._starts[0]), int(self._stops[0]))
+        else:
+            return self
+
+    @property
+    def ranges(self) -> tuple:
+        """Range objects are built on every access, assign the ranges to change them"""
+        return tuple(Range(start, stop) for start, stop in zip(self._starts.tolist(), self._stops.tolist()))
+
+    @ranges.setter
+    def ranges(self, ranges):
+        ranges = list(ranges)
+        starts = _int_array([r.start for r in ranges])
+        stops = _int_array([r.stop for r in ranges])
+        self._set_arrays(*self._reduce(starts, stops))
+
+    @property
+    def starts(self) -> np.ndarray:
+        return self._starts
+
+    @property
+    def stops(self) -> np.ndarray:
+        return self._stops
+
+    def contains_many(self, values) -> np.ndarray:
+        values = np.asarray(values)
+        i = np.searchsorted(self._starts, values, side='right') - 1
+        found = i >= 0
+        found[found] = values[found] < self._stops[i[found]]
+        return found
+
+    def difference(self, other):
+        b_starts, b_stops = self._as_arrays(other)
+        starts, stops = self._intersect(self._starts, self._stops,
+                                        *_complement(b_starts, b_stops, self._starts, self._stops))
+        return self._from_arrays(starts, stops, reduce=False)._simplified()
 
     @property
     def info(self):
-        x = self.ranges[-1].start
-        x = math.ceil(math.log(x, 10))
+        x = max((len(str(v)) for v in self._starts.tolist()), default=1)
         template = f"{{:{x}d}} - {{}}"
         return 'Multirange:\n' + '\n'.join((template.format(r.start, r.stop) for r in self.ranges))
 
     def intersection(self, other):
-        if isinstance(other, Range):
-            return self.intersection(self.__class__(other))
-        elif isinstance(other, self.__class__):
-            intersected = []
-            for r in self.ranges:
-                for ro in other.ranges:
-                    if inter := r.intersection(ro):
-                        intersected.append(inter)
-                    else:
-                        pass
-            if not intersected:
-                return None
-            else:
-                return self.__class__(*intersected)
-        else:
-            raise TypeError(f'{type(other)}')
+        b_starts, b_stops = self._as_arrays(other)
+        starts, stops = self._intersect(self._starts, self._stops, b_starts, b_stops)
+        if not len(starts):
+            return None
+        return self._from_arrays(starts, stops, reduce=False)
 
     def shift(self, v: int):
         if isinstance(v, int):
-            return Multirange(*[r.shift(v) for r in self.ranges])
+            self._set_arrays(_add(self._starts, v), _add(self._stops, v))
         elif isinstance(v, Iterable):
             v = tuple(v)
             if not all(isinstance(s, int) for s in v):
                 raise TypeError('Shift values must be int.')
-            if not len(v) == len(self.ranges):
-                raise ValueError(f'Got {len(v)} shift values but have {len(self.ranges)} ranges')
-            for r, s in zip(self.ranges, v):
-                r.shift(s)
-            self.ranges = sorted(self._reduce(self.ranges))
+            if not len(v) == len(self._starts):
+                raise ValueError(f'Got {len(v)} shift values but have {len(self._starts)} ranges')
+            v = _int_array(v)
+            self._set_arrays(*self._reduce(_add(self._starts, v), _add(self._stops, v)))
+        else:
+            raise TypeError(f'Expected int or iterable of ints. Got {v}')
+        return self
 
     def take_from(self, i: int):
-        ranges = []
-        for r in self.ranges:
-            if r < i:
-                continue
-            elif i in r:
-                ranges.append(r.take_from(i))
-            else:
-                ranges.append(r)
-        if ranges:
-            if len(ranges) == 1:
-                return ranges.pop()
-            else:
-                return Multirange(*ranges)
-        else:
-            return None
+        if not isinstance(i, int):
+            raise TypeError('parameter i must be type int')
+        gap_starts, gap_stops = _complement(_int_array([i]), _int_array([i]), self._starts, self._stops)
+        starts, stops = self._intersect(self._starts, self._stops, gap_starts[1:], gap_stops[1:])
+        return self._from_arrays(starts, stops, reduce=False)._simplified()
 
     def take_upto(self, i: int):
-        ranges = []
-        for r in self.ranges:
-            if r < i:
-                ranges.append(r)
-            elif i in r:
-                ranges.append(r.take_upto(i))
-            else:
-                continue
-        if ranges:
-            if len(ranges) == 1:
-                return ranges.pop()
-            else:
-                return Multirange(*ranges)
-        else:
+        if not isinstance(i, int):
+            raise TypeError('parameter i must be type int')
+        gap_starts, gap_stops = _complement(_int_array([i]), _int_array([i]), self._starts, self._stops)
+        starts, stops = self._intersect(self._starts, self._stops, gap_starts[:1], gap_stops[:1])
+        return self._from_arrays(starts, stops, reduce=False)._simplified()
+
+    @classmethod
+    def union_all(cls, *ranges):
+        """union of any number of Range or Multirange objects, in one sweep"""
+        starts, stops, _ = coverage(*ranges)
+        return cls._from_arrays(starts, stops)
+
+    @classmethod
+    def intersect_all(cls, *ranges):
+        """intersection of any number of Range or Multirange objects, in one sweep. Returns None if empty"""
+        starts, stops, counts = coverage(*ranges)
+        full = counts == len(ranges)
+        if not ranges or not full.any():
             return None
+        return cls._from_arrays(starts[full], stops[full], reduce=False)
 
     def union(self, other):
+        b_starts, b_stops = self._as_arrays(other)
+        return self._from_arrays(np.concatenate((self._starts, b_starts)), np.concatenate((self._stops, b_stops)))
+
+
+class RangeMap:
+    """
+    RangeMap maps disjoint source Ranges to integer offsets - like the almanac maps of advent of code 2023 day 5.
+    An integer v in a mapped Range translates to v + offset, integers outside mapped Ranges translate to themselves.
+    Mapped ranges are kept as sorted numpy arrays of starts, stops and offsets.
+
+    Instantiation accepts pairs of (Range, offset):
+        RangeMap((Range(98, 100), -48), (Range(50, 98), 2))
+    or almanac triples of destination start, source start and length:
+        RangeMap.from_triples((50, 98, 2), (52, 50, 48))
+    Overlapping source ranges raise ValueError.
+
+    Entries are kept in one normal form: ranges mapped to offset 0 are dropped, as they translate to themselves,
+    and touching ranges of equal offsets are merged. So maps translating equally are equal and have equal len.
+
+    methods:
+        - set(r: Range, offset: int) - maps the range
+        - lookup(v: int) - returns (Range, offset) of the mapped range containing v or None. O(log n)
+        - get(v: int, default=None) - returns offset of v or default
+        - translate(v: int) - returns translated integer
+        - map(other: Union[Range, Multirange]) - translates all elements of other, returns Multirange.
+            Works on range boundaries, elements are not enumerated.
+        - compose(*others: RangeMap) - returns RangeMap translating through self and then others in order
+
+    supported operations:
+        =, len, iter (of (Range, offset) pairs), in, call (as translate)
+    """
+
+    def __init__(self, *pairs):
+        for r, offset in pairs:
+            self._validate(r, offset)
+        self._set_arrays(_int_array([r.start for r, _ in pairs]),
+                         _int_array([r.stop for r, _ in pairs]),
+                         _int_array([offset for _, offset in pairs]),
+                         check=True)
+
+    @classmethod
+    def from_triples(cls, *triples):
+        return cls(*((Range(source, source + length), destination - source) for destination, source, length in triples))
+
+    @classmethod
+    def _from_arrays(cls, starts: np.ndarray, stops: np.ndarray, offsets: np.ndarray):
+        range_map = cls()
+        range_map._set_arrays(starts, stops, offsets)
+        return range_map
+
+    def _set_arrays(self, starts: np.ndarray, stops: np.ndarray, offsets: np.ndarray, check: bool = False):
+        """keeps the entries in the normal form - see __doc__. check - raises ValueError if the ranges overlap"""
+        starts, stops, offsets = _int_array(starts), _int_array(stops), _int_array(offsets)
+        keep = starts < stops
+        starts, stops, offsets = starts[keep], stops[keep], offsets[keep]
+        order = np.argsort(starts, kind='stable')
+        starts, stops, offsets = starts[order], stops[order], offsets[order]
+        if check and len(starts) > 1 and (overlap := np.flatnonzero(starts[1:] < stops[:-1])).size:
+            i = int(overlap[0]) + 1
+            raise ValueError(f'{Range(int(starts[i]), int(stops[i]))} overlaps a mapped range')
+        keep = offsets != 0
+        starts, stops, offsets = starts[keep], stops[keep], offsets[keep]
+        # touching pieces with equal offsets are merged
+        first = np.ones(len(starts), dtype=bool)
+        first[1:] = (starts[1:] != stops[:-1]) | (offsets[1:] != offsets[:-1])
+        groups = np.flatnonzero(first)
+        last = np.flatnonzero(np.append(first[1:], True))[:len(groups)]
+        self._starts, self._stops, self._offsets = starts[groups], stops[last], offsets[groups]
+
+    @staticmethod
+    def _validate(r, offset):
+        if not isinstance(r, Range):
+            raise TypeError(f'Expected Range. Got {type(r)}')
+        if not isinstance(offset, int):
+            raise TypeError(f'Offset must be type int. Got {type(offset)}')
+
+    def __call__(self, v: int) -> int:
+        return self.translate(v)
+
+    def __contains__(self, v) -> bool:
+        return self._find(v) is not None
+
+    def __eq__(self, other):
+        if not isinstance(other, self.__class__):
+            raise TypeError(f'Could not compare RangeMap to {type(other)}')
+        return all(np.array_equal(a, b) for a, b in ((self._starts, other._starts), (self._stops, other._stops),
+                                                       (self._offsets, other._offsets)))
+
+    def __iter__(self):
+        for start, stop, offset in zip(self._starts.tolist(), self._stops.tolist(), self._offsets.tolist()):
+            yield Range(start, stop), offset
+
+    def __len__(self):
+        return len(self._starts)
+
+    def __repr__(self):
+        template = '({}:{}){:+d}'
+        return f'<RangeMap:{"".join(template.format(r.start, r.stop, offset) for r, offset in self)}>'
+
+    def _find(self, v):
+        i = int(np.searchsorted(self._starts, v, side='right')) - 1
+        if i >= 0 and v < self._stops[i]:
+            return i
+        return None
+
+    def set(self, r: Range, offset: int):
+        self._validate(r, offset)
+        i = int(np.searchsorted(self._starts, r.start, side='right'))
+        if r and ((i > 0 and self._stops[i - 1] > r.start) or (i < len(self._starts) and self._starts[i] < r.stop)):
+            raise ValueError(f'{r} overlaps a mapped range')
+        self._set_arrays(np.concatenate((self._starts, _int_array([r.start]))),
+                         np.concatenate((self._stops, _int_array([r.stop]))),
+                         np.concatenate((self._offsets, _int_array([offset]))))
+
+    def lookup(self, v: int):
+        i = self._find(v)
+        if i is None:
+            return None
+        return Range(int(self._starts[i]), int(self._stops[i])), int(self._offsets[i])
+
+    def get(self, v: int, default=None):
+        i = self._find(v)
+        return default if i is None else int(self._offsets[i])
+
+    def translate(self, v: int) -> int:
+        return v + self.get(v, 0)
+
+    def _translate_arrays(self, starts: np.ndarray, stops: np.ndarray) -> tuple:
+        """translated pieces of sorted disjoint ranges and indices of the ranges they come from"""
+        mapped_starts, mapped_stops, index, mapped = _overlaps(starts, stops, self._starts, self._stops)
+        kept_starts, kept_stops, kept_index, _ = _overlaps(starts, stops,
+                                                           *_complement(self._starts, self._stops, starts, stops))
+        offsets = np.concatenate((self._offsets[mapped], np.zeros(len(kept_starts), dtype=np.int64)))
+        return (np.concatenate((mapped_starts, kept_starts)), np.concatenate((mapped_stops, kept_stops)),
+                offsets, np.concatenate((index, kept_index)))
+
+    def map(self, other):
         if isinstance(other, Range):
-            return self.union(Multirange(other))
-        elif isinstance(other, Multirange):
-            return self + other
-        else:
+            other = Multirange(other)
+        if not isinstance(other, Multirange):
             raise TypeError(f'{type(other)}')
+        starts, stops, offsets, _ = self._translate_arrays(other.starts, other.stops)
+        return Multirange._from_arrays(_add(starts, offsets), _add(stops, offsets))
+
+    def compose(self, *others):
+        result = self
+        for other in others:
+            if not isinstance(other, self.__class__):
+                raise TypeError(f'Could not compose RangeMap with {type(other)}')
+            # images of mapped ranges go through other, unmapped integers go through other as they are
+            starts, stops, offsets, index = other._translate_arrays(_add(result._starts, result._offsets),
+                                                                     _add(result._stops, result._offsets))
+            shift = result._offsets[index]
+            rest_starts, rest_stops, rest_index, _ = _overlaps(
+                other._starts, other._stops, *_complement(result._starts, result._stops, other._starts, other._stops))
+            result = self._from_arrays(np.concatenate((_add(starts, shift, -1), rest_starts)),
+                                       np.concatenate((_add(stops, shift, -1), rest_stops)),
+                                       np.concatenate((_add(offsets, shift), other._offsets[rest_index])))
+        return result
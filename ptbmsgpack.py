@@ -0,0 +1,242 @@
+"""
+Pure python MessagePack packer and unpacker.
+
+It is a fallback of the msgpack package (C backed) used by ptbserialization binary format,
+so it mirrors the part of msgpack API used there:
+    packb(obj, default=None, use_bin_type=True, strict_types=False) -> bytes
+    unpackb(data, ext_hook=ExtType, raw=False, strict_map_key=False) -> object
+    ExtType(code, data)
+
+Supported types: None, bool, int (64 bit), float, str, bytes, bytearray, memoryview, list, tuple, dict, ExtType.
+Other types are passed to default, which must return one of the supported types.
+With strict_types=True subclasses of supported types and tuples are passed to default too, as in msgpack.
+"""
+
+from collections import namedtuple
+from typing import Callable, Optional
+import struct
+
+
+ExtType = namedtuple('ExtType', 'code data')
+
+
+class PackException(Exception):
+    pass
+
+
+class UnpackException(ValueError):
+    pass
+
+
+_FIXEXT = {1: 0xd4, 2: 0xd5, 4: 0xd6, 8: 0xd7, 16: 0xd8}
+
+
+def packb(obj, default: Optional[Callable] = None, use_bin_type: bool = True, strict_types: bool = False) -> bytes:
+    out = bytearray()
+    _pack(obj, out, default, strict_types)
+    return bytes(out)
+
+
+def _pack(obj, out: bytearray, default, strict_types, _depth=0):
+    if _depth > 512:
+        raise PackException('Nesting too deep.')
+    t = type(obj)
+    if obj is None:
+        out.append(0xc0)
+    elif t is bool:
+        out.append(0xc3 if obj else 0xc2)
+    elif t is int or (not strict_types and isinstance(obj, int)):
+        _pack_int(obj, out)
+    elif t is float or (not strict_types and isinstance(obj, float)):
+        out.append(0xcb)
+        out += struct.pack('>d', obj)
+    elif t is str or (not strict_types and isinstance(obj, str)):
+        data = obj.encode('utf-8')
+        n = len(data)
+        if n < 32:
+            out.append(0xa0 | n)
+        elif n < 0x100:
+            out += struct.pack('>BB', 0xd9, n)
+        elif n < 0x10000:
+            out += struct.pack('>BH', 0xda, n)
+        else:
+            out += struct.pack('>BI', 0xdb, n)
+        out += data
+    elif t in (bytes, bytearray, memoryview) or (not strict_types and isinstance(obj, (bytes, bytearray))):
+        data = memoryview(obj).cast('B')
+        n = len(data)
+        if n < 0x100:
+            out += struct.pack('>BB', 0xc4, n)
+        elif n < 0x10000:
+            out += struct.pack('>BH', 0xc5, n)
+        else:
+            out += struct.pack('>BI', 0xc6, n)
+        out += data
+    elif t is ExtType:
+        code, data = obj
+        n = len(data)
+        if n in _FIXEXT:
+            out += struct.pack('>Bb', _FIXEXT[n], code)
+        elif n < 0x100:
+            out += struct.pack('>BBb', 0xc7, n, code)
+        elif n < 0x10000:
+            out += struct.pack('>BHb', 0xc8, n, code)
+        else:
+            out += struct.pack('>BIb', 0xc9, n, code)
+        out += data
+    elif t is list or (not strict_types and isinstance(obj, (list, tuple))):
+        n = len(obj)
+        if n < 16:
+            out.append(0x90 | n)
+        elif n < 0x10000:
+            out += struct.pack('>BH', 0xdc, n)
+        else:
+            out += struct.pack('>BI', 0xdd, n)
+        for member in obj:
+            _pack(member, out, default, strict_types, _depth + 1)
+    elif t is dict or (not strict_types and isinstance(obj, dict)):
+        n = len(obj)
+        if n < 16:
+            out.append(0x80 | n)
+        elif n < 0x10000:
+            out += struct.pack('>BH', 0xde, n)
+        else:
+            out += struct.pack('>BI', 0xdf, n)
+        for k, v in obj.items():
+            _pack(k, out, default, strict_types, _depth + 1)
+            _pack(v, out, default, strict_types, _depth + 1)
+    elif default is not None:
+        _pack(default(obj), out, default, strict_types, _depth + 1)
+    else:
+        raise TypeError(f'Can not serialize {t}')
+
+
+def _pack_int(obj: int, out: bytearray):
+    if 0 <= obj < 0x80:
+        out.append(obj)
+    elif -32 <= obj < 0:
+        out += struct.pack('>b', obj)
+    elif obj >= 0:
+        if obj < 0x100:
+            out += struct.pack('>BB', 0xcc, obj)
+        elif obj < 0x10000:
+            out += struct.pack('>BH', 0xcd, obj)
+        elif obj < 0x100000000:
+            out += struct.pack('>BI', 0xce, obj)
+        elif obj < 0x10000000000000000:
+            out += struct.pack('>BQ', 0xcf, obj)
+        else:
+            raise OverflowError('Integer value out of range')
+    else:
+        if obj >= -0x80:
+            out += struct.pack('>Bb', 0xd0, obj)
+        elif obj >= -0x8000:
+            out += struct.pack('>Bh', 0xd1, obj)
+        elif obj >= -0x80000000:
+            out += struct.pack('>Bi', 0xd2, obj)
+        elif obj >= -0x8000000000000000:
+            out += struct.pack('>Bq', 0xd3, obj)
+        else:
+            raise OverflowError('Integer value out of range')
+
+
+# first byte: (struct format of the length or value, kind)
+_HEADS = {
+    0xc4: ('>B', 'bin'), 0xc5: ('>H', 'bin'), 0xc6: ('>I', 'bin'),
+    0xc7: ('>B', 'ext'), 0xc8: ('>H', 'ext'), 0xc9: ('>I', 'ext'),
+    0xca: ('>f', 'value'), 0xcb: ('>d', 'value'),
+    0xcc: ('>B', 'value'), 0xcd: ('>H', 'value'), 0xce: ('>I', 'value'), 0xcf: ('>Q', 'value'),
+    0xd0: ('>b', 'value'), 0xd1: ('>h', 'value'), 0xd2: ('>i', 'value'), 0xd3: ('>q', 'value'),
+    0xd9: ('>B', 'str'), 0xda: ('>H', 'str'), 0xdb: ('>I', 'str'),
+    0xdc: ('>H', 'array'), 0xdd: ('>I', 'array'),
+    0xde: ('>H', 'map'), 0xdf: ('>I', 'map'),
+}
+_FIXEXT_SIZES = {0xd4: 1, 0xd5: 2, 0xd6: 4, 0xd7: 8, 0xd8: 16}
+
+
+def unpackb(data, ext_hook: Callable = ExtType, raw: bool = False, strict_map_key: bool = False):
+    data = memoryview(data).cast('B')
+    obj, pos = _unpack(data, 0, ext_hook, strict_map_key)
+    if pos != len(data):
+        raise UnpackException('Extra data after the packed object.')
+    return obj
+
+
+def _unpack(data: memoryview, pos: int, ext_hook, strict_map_key):
+    try:
+        b = data[pos]
+    except IndexError:
+        raise UnpackException('Unexpected end of data.') from None
+    pos += 1
+    if b < 0x80:
+        return b, pos
+    elif b >= 0xe0:
+        return b - 0x100, pos
+    elif 0xa0 <= b < 0xc0:
+        return _read_str(data, pos, b & 0x1f)
+    elif 0x90 <= b < 0xa0:
+        return _read_array(data, pos, b & 0x0f, ext_hook, strict_map_key)
+    elif 0x80 <= b < 0x90:
+        return _read_map(data, pos, b & 0x0f, ext_hook, strict_map_key)
+    elif b == 0xc0:
+        return None, pos
+    elif b == 0xc2:
+        return False, pos
+    elif b == 0xc3:
+        return True, pos
+    elif b in _FIXEXT_SIZES:
+        n = _FIXEXT_SIZES[b]
+        return _read_ext(data, pos, n, ext_hook)
+    elif b in _HEADS:
+        fmt, kind = _HEADS[b]
+        size = struct.calcsize(fmt)
+        (value,) = struct.unpack(fmt, _take(data, pos, size))
+        pos += size
+        if kind == 'value':
+            return value, pos
+        elif kind == 'str':
+            return _read_str(data, pos, value)
+        elif kind == 'bin':
+            return bytes(_take(data, pos, value)), pos + value
+        elif kind == 'ext':
+            return _read_ext(data, pos, value, ext_hook)
+        elif kind == 'array':
+            return _read_array(data, pos, value, ext_hook, strict_map_key)
+        else:
+            return _read_map(data, pos, value, ext_hook, strict_map_key)
+    else:
+        raise UnpackException(f'Unsupported type byte {hex(b)}')
+
+
+def _take(data, pos, n):
+    if pos + n > len(data):
+        raise UnpackException('Unexpected end of data.')
+    return data[pos: pos + n]
+
+
+def _read_str(data, pos, n):
+    return str(_take(data, pos, n), 'utf-8'), pos + n
+
+
+def _read_ext(data, pos, n, ext_hook):
+    (code,) = struct.unpack('>b', _take(data, pos, 1))
+    pos += 1
+    return ext_hook(code, bytes(_take(data, pos, n))), pos + n
+
+
+def _read_array(data, pos, n, ext_hook, strict_map_key):
+    items = []
+    for _ in range(n):
+        item, pos = _unpack(data, pos, ext_hook, strict_map_key)
+        items.append(item)
+    return items, pos
+
+
+def _read_map(data, pos, n, ext_hook, strict_map_key):
+    items = {}
+    for _ in range(n):
+        k, pos = _unpack(data, pos, ext_hook, strict_map_key)
+        if strict_map_key and type(k) not in (str, bytes):
+            raise ValueError(f'{type(k)} is not allowed for map key')
+        items[k], pos = _unpack(data, pos, ext_hook, strict_map_key)
+    return items, pos
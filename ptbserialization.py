@@ -1,13 +1,43 @@
 from abc import ABC, abstractmethod
-from typing import Any, Optional, Callable
+from typing import Any, Optional, Callable, Iterable, Generator, IO
+from itertools import islice
 import json
+from json.decoder import scanstring
+from json.scanner import NUMBER_RE
+import re
+import struct
+import base64
 from collections.abc import Mapping
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+
+try:
+    import msgpack
+except ImportError:
+    from ptbutil import ptbmsgpack as msgpack
 
 
 TYPE_ANNOTATION_KEY = 'TYPE__'
 INIT_ANNOTATION_KEY = 'INIT__'
 ATTRS_ANNOTATION_KEY = 'ATTRS__'
+FACTORY_ANNOTATION_KEY = 'FACTORY__'
+ID_ANNOTATION_KEY = 'ID__'
+REF_ANNOTATION_KEY = 'REF__'
+
+# binary format
+BINARY_FORMAT_VERSION = 1
+OBJECT_EXT = 1
+DATETIME_EXT = 2
+NDARRAY_EXT = 3
+
+# streams
+FRAMINGS = ('ndjson', 'frames')
+FRAME_HEADER = struct.Struct('>I')
+
+# Serialization plans:
+# a plan is a function preprocessing an object of a single type into json serializable data.
+# Plans are compiled once per type and cached in PLANS, so preprocessing a node costs a dict lookup
+# instead of a chain of isinstance checks. Registering a type clears the cache.
+PLANS = dict()
 
 
 class PtbSerializable(ABC):
@@ -53,15 +83,18 @@ class PtbSerializable(ABC):
 
         """
         bases = tuple([b for b in subclass.__bases__ if b is not object] + [cls])
-        new_type = type(subclass.__name__, bases, dict(subclass.__dict__))
+        namespace = {k: v for k, v in subclass.__dict__.items() if k not in ('__dict__', '__weakref__')}
+        new_type = type(subclass.__name__, bases, namespace)
         PtbSerializable.SERIALIZABLE_REGISTRY[subclass.__name__] = new_type
+        PLANS.clear()
         return new_type
 
     @classmethod
     def register_foreign(cls,
                          type_: type,
                          serializable_init_params: Optional[Callable] = None,
-                         serialization_instance_attrs: Optional[Callable] = None):
+                         serialization_instance_attrs: Optional[Callable] = None,
+                         factory: Optional[Callable] = None):
         """
         This is a class method to register a foreign type to be serialized.
         It accepts the following parameters:
@@ -76,6 +109,9 @@ class PtbSerializable(ABC):
             When called with a serialized instance,
             it is expected to deliver a dict of attributes that will be ascribed to the instance after instantiation.
             If this is left None (default), no attributes will be ascribed after instantiation.
+        :param factory: callable (optional):
+            It will be called instead of type_ with the instantiation parameters on deserialization.
+            If this is left None (default), type_ is called.
 
         the registered methods (functions) will be used for ptbserialization
         """
@@ -85,14 +121,18 @@ class PtbSerializable(ABC):
             raise TypeError(f'serializable_init_params must be callable. See __doc__.')
         if serialization_instance_attrs and not callable(serialization_instance_attrs):
             raise TypeError(f'serializable_init_params must be callable. See __doc__.')
+        if factory and not callable(factory):
+            raise TypeError(f'factory must be callable. See __doc__.')
 
         PtbSerializable.FOREIGN_SERIALIZABLE_REGISTRY.update(
             {
                 type_.__name__: {TYPE_ANNOTATION_KEY: type_,
                                  INIT_ANNOTATION_KEY: serializable_init_params,
-                                 ATTRS_ANNOTATION_KEY: serialization_instance_attrs}
+                                 ATTRS_ANNOTATION_KEY: serialization_instance_attrs,
+                                 FACTORY_ANNOTATION_KEY: factory}
             }
         )
+        PLANS.clear()
 
     @abstractmethod
     def serialization_init_params(self) -> Any:
@@ -139,26 +179,221 @@ class PtbSerializable(ABC):
 PtbSerializable.register_foreign(datetime, serializable_init_params=lambda x: {'*': x.timetuple()[:6]})
 
 
-def ptbs_preprocess(obj):
-    if isinstance(obj, PtbSerializable):
-        return {TYPE_ANNOTATION_KEY: obj.__class__.__name__,
-                INIT_ANNOTATION_KEY: ptbs_preprocess(obj.serialization_init_params()),
-                ATTRS_ANNOTATION_KEY: ptbs_preprocess(obj.serialization_instance_attrs())}
-    elif PtbSerializable.FOREIGN_SERIALIZABLE_REGISTRY.get(type(obj).__name__):
-        return preprocess_foreign(obj)
-    elif isinstance(obj, Mapping):
-        return {k: ptbs_preprocess(v) for k, v in obj.items()}
-    elif isinstance(obj, (list, tuple)):
-        return [ptbs_preprocess(member) for member in obj]
+# registering numpy and pandas
+# Their types are registered lazily - see LAZY_FOREIGN, so numpy and pandas are imported only when used.
+# Arrays are stored as raw buffers with dtype and shape (base64 in json, native in the binary format)
+# and decoded with np.frombuffer, so no python object is created per element.
+# Decoded arrays are read-only views of the decoded buffer. Object arrays are stored as lists.
+# DataFrames are stored column-wise, every column as an array. Columns (and indexes) of pandas extension dtypes
+# are stored as a dict of arrays: categorical as codes, categories and ordered, datetime with tz as int64 and tz,
+# string as items and storage. Other extension dtypes raise TypeError.
+def ndarray_init_params(array) -> dict:
+    import numpy as np
+    if array.dtype.hasobject:
+        return {'**': {'dtype': '|O', 'shape': list(array.shape), 'items': array.ravel().tolist()}}
+    if array.dtype.fields is None:
+        dtype = array.dtype.str
     else:
-        return obj
+        dtype = np.lib.format.dtype_to_descr(array.dtype)
+    data = np.ascontiguousarray(array).reshape(-1).view(np.uint8)
+    return {'**': {'dtype': dtype, 'shape': list(array.shape), 'data': base64.b64encode(data).decode('ascii')}}
+
+
+def ndarray_from_buffer(dtype, shape, data=None, items=None):
+    import numpy as np
+    if items is not None:
+        array = np.empty(len(items), dtype=object)
+        array[:] = items
+        return array.reshape(shape)
+    dtype = _dtype_descr(dtype)
+    if isinstance(data, str):
+        data = base64.b64decode(data)
+    return np.frombuffer(data, dtype=np.dtype(dtype)).reshape(shape)
+
+
+def _dtype_descr(descr):
+    """structured dtype descr decoded from json lists, nested structures included"""
+    if isinstance(descr, str):
+        return descr
+    fields = []
+    for name, field_descr, *shape in descr:
+        name = tuple(name) if isinstance(name, list) else name  # (title, name)
+        fields.append((name, _dtype_descr(field_descr), *(tuple(s) for s in shape)))
+    return fields
+
+
+def column_init_params(values):
+    """values of a Series or Index as an ndarray, or a dict for the supported pandas extension dtypes"""
+    import pandas as pd
+    dtype = values.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        return {'extension': 'category', 'codes': values.array.codes,
+                'categories': column_init_params(dtype.categories), 'ordered': dtype.ordered}
+    if isinstance(dtype, pd.DatetimeTZDtype):
+        return {'extension': 'datetimetz', 'i8': values.array.asi8, 'unit': dtype.unit, 'tz': str(dtype.tz)}
+    if isinstance(dtype, pd.StringDtype):
+        return {'extension': 'string', 'items': values.to_numpy(dtype=object, na_value=None).tolist(),
+                'storage': dtype.storage, 'nullable': dtype.na_value is pd.NA}
+    if isinstance(dtype, pd.api.extensions.ExtensionDtype):
+        raise TypeError(f'pandas extension dtype {dtype} is not serializable. '
+                        f'Supported are category, datetime with tz and string, convert others with astype.')
+    return values.to_numpy()
+
+
+def column_from_params(params):
+    """inverse of column_init_params, returns an ndarray or a pandas extension array"""
+    if not isinstance(params, dict):
+        return params
+    import numpy as np
+    import pandas as pd
+    extension = params['extension']
+    if extension == 'category':
+        return pd.Categorical.from_codes(params['codes'], ordered=params['ordered'],
+                                         categories=pd.Index(column_from_params(params['categories'])))
+    if extension == 'datetimetz':
+        values = np.asarray(params['i8'], dtype=np.int64).view(f'M8[{params["unit"]}]')
+        return pd.DatetimeIndex(values, tz='UTC').tz_convert(params['tz']).array
+    if extension == 'string':
+        dtype = pd.StringDtype(params['storage'], na_value=pd.NA if params['nullable'] else np.nan)
+        return pd.array(params['items'], dtype=dtype)
+    raise ValueError(f'Unknown pandas extension {extension}')
+
+
+def _index_init_params(index):
+    return None if _default_index(index) else column_init_params(index)
+
+
+def _index_from_params(params):
+    import pandas as pd
+    return None if params is None else pd.Index(column_from_params(params))
+
+
+def _default_index(index) -> bool:
+    import pandas as pd
+    return isinstance(index, pd.RangeIndex) and index.start == 0 and index.step == 1
+
+
+def dataframe_init_params(df) -> dict:
+    return {'**': {'columns': list(df.columns),
+                   'arrays': [column_init_params(df.iloc[:, i]) for i in range(df.shape[1])],
+                   'index': _index_init_params(df.index),
+                   'index_name': df.index.name}}
+
+
+def dataframe_from_columns(columns, arrays, index=None, index_name=None):
+    import pandas as pd
+    df = pd.DataFrame({i: column_from_params(array) for i, array in enumerate(arrays)},
+                      index=_index_from_params(index), copy=False)
+    df.columns = columns
+    df.index.name = index_name
+    return df
+
+
+def series_init_params(series) -> dict:
+    return {'**': {'name': series.name,
+                   'array': column_init_params(series),
+                   'index': _index_init_params(series.index),
+                   'index_name': series.index.name}}
+
+
+def series_from_array(array, name=None, index=None, index_name=None):
+    import pandas as pd
+    series = pd.Series(column_from_params(array), index=_index_from_params(index), name=name, copy=False)
+    series.index.name = index_name
+    return series
+
+
+def register_numpy():
+    import numpy as np
+    PtbSerializable.register_foreign(np.ndarray,
+                                     serializable_init_params=ndarray_init_params,
+                                     factory=ndarray_from_buffer)
+
+
+def register_pandas():
+    import pandas as pd
+    PtbSerializable.register_foreign(pd.DataFrame,
+                                     serializable_init_params=dataframe_init_params,
+                                     factory=dataframe_from_columns)
+    PtbSerializable.register_foreign(pd.Series,
+                                     serializable_init_params=series_init_params,
+                                     factory=series_from_array)
+
+
+# Foreign types registered on first use - type name: (package of the type, registering function)
+LAZY_FOREIGN = {'ndarray': ('numpy', register_numpy),
+                'DataFrame': ('pandas', register_pandas),
+                'Series': ('pandas', register_pandas)}
+
+
+def registered_foreign(name: str, module: Optional[str] = None) -> Optional[dict]:
+    """
+    Returns the FOREIGN_SERIALIZABLE_REGISTRY record of the type name or None.
+    Types of LAZY_FOREIGN are registered on the first lookup.
+    module - module of the looked up type, so a package is not imported for an unrelated type of the same name.
+        It is None on decoding, then the package is imported if it is installed.
+    """
+    if registered := PtbSerializable.FOREIGN_SERIALIZABLE_REGISTRY.get(name):
+        return registered
+    if name in LAZY_FOREIGN:
+        package, register = LAZY_FOREIGN[name]
+        if module is None or module.split('.')[0] == package:
+            try:
+                register()
+            except ImportError:
+                return None
+            return PtbSerializable.FOREIGN_SERIALIZABLE_REGISTRY.get(name)
+    return None
+
+
+def compile_plan(type_: type) -> Callable:
+    if issubclass(type_, PtbSerializable):
+        plan = preprocess_serializable
+    elif registered_foreign(type_.__name__, type_.__module__):
+        plan = preprocess_foreign
+    elif issubclass(type_, Mapping):
+        plan = preprocess_mapping
+    elif issubclass(type_, (list, tuple)):
+        plan = preprocess_sequence
+    else:
+        plan = preprocess_atom
+    PLANS[type_] = plan
+    return plan
+
+
+def ptbs_preprocess(obj):
+    try:
+        plan = PLANS[type(obj)]
+    except KeyError:
+        plan = compile_plan(type(obj))
+    return plan(obj)
+
+
+def preprocess_serializable(obj) -> dict:
+    return {TYPE_ANNOTATION_KEY: obj.__class__.__name__,
+            INIT_ANNOTATION_KEY: ptbs_preprocess(obj.serialization_init_params()),
+            ATTRS_ANNOTATION_KEY: ptbs_preprocess(obj.serialization_instance_attrs())}
+
+
+def preprocess_mapping(obj) -> dict:
+    plans = PLANS
+    return {k: (plans.get(type(v)) or compile_plan(type(v)))(v) for k, v in obj.items()}
+
+
+def preprocess_sequence(obj) -> list:
+    plans = PLANS
+    return [(plans.get(type(member)) or compile_plan(type(member)))(member) for member in obj]
+
+
+def preprocess_atom(obj):
+    return obj
 
 
 def preprocess_foreign(obj) -> dict:
     registered = PtbSerializable.FOREIGN_SERIALIZABLE_REGISTRY[type(obj).__name__]
 
     if init_factory := registered.get(INIT_ANNOTATION_KEY):
-        inits = init_factory(obj)
+        inits = ptbs_preprocess(init_factory(obj))
     else:
         inits = None
 
@@ -194,13 +429,19 @@ class PtbSerialisationEncoder(json.JSONEncoder):
 
 
 class PtbSerialisationDecoder(json.JSONDecoder):
+    """
+    Decodes serialized objects through json object_hook:
+    the hook is called by the json parser for every parsed json object (dict), the innermost first,
+    so only dicts are touched and annotated dicts are reinstantiated with already decoded parameters.
+    """
 
     def __init__(self, *args, **kwargs):
+        kwargs.setdefault('object_hook', self.decode_object)
         super().__init__(*args, **kwargs)
 
-    def decode(self, obj: str):
-        obj = super().decode(obj)
-        obj = self.decode_dispatch(obj)
+    def decode_object(self, obj: dict):
+        if TYPE_ANNOTATION_KEY in obj:
+            return self.reinstantiate(obj)
         return obj
 
     def decode_dispatch(self, obj):
@@ -216,12 +457,19 @@ class PtbSerialisationDecoder(json.JSONDecoder):
     def decode_generic(self, obj):
         if not isinstance(obj, Mapping):
             raise TypeError('Expected type Mapping')
-
+        obj = dict(obj)
+        obj[INIT_ANNOTATION_KEY] = self.decode_dispatch(obj.get(INIT_ANNOTATION_KEY))
+        if obj.get(ATTRS_ANNOTATION_KEY):
+            obj[ATTRS_ANNOTATION_KEY] = self.decode_dispatch(obj[ATTRS_ANNOTATION_KEY])
+        return self.reinstantiate(obj)
+
+    def reinstantiate(self, obj: Mapping):
+        """reinstantiates an annotated object, which parameters and attributes are already decoded"""
         factory = self.get_factory(obj)
         if not factory:
             return obj
 
-        instance = self.instantiate_serialized(factory, obj[INIT_ANNOTATION_KEY])
+        instance = self.call_factory(factory, obj[INIT_ANNOTATION_KEY])
 
         postinit_attrs = obj.get(ATTRS_ANNOTATION_KEY, None)
         if postinit_attrs and isinstance(postinit_attrs, Mapping):
@@ -238,18 +486,21 @@ class PtbSerialisationDecoder(json.JSONDecoder):
     def get_factory(obj: Mapping):
         factory = PtbSerializable.SERIALIZABLE_REGISTRY.get(obj[TYPE_ANNOTATION_KEY], None)
         if not factory:
-            registerd = PtbSerializable.FOREIGN_SERIALIZABLE_REGISTRY.get(obj[TYPE_ANNOTATION_KEY], None)
+            registerd = registered_foreign(obj[TYPE_ANNOTATION_KEY])
             if not registerd:
                 factory = None
             else:
-                factory = registerd[TYPE_ANNOTATION_KEY]
+                factory = registerd.get(FACTORY_ANNOTATION_KEY) or registerd[TYPE_ANNOTATION_KEY]
         if not factory:
             raise ValueError(f'PtbSerialisationDecoder attempted to reinstantiate {obj[TYPE_ANNOTATION_KEY]},'
                              f' but could not find any valid record.')
         return factory
 
     def instantiate_serialized(self, factory, args):
-        args = self.decode_dispatch(args)
+        return self.call_factory(factory, self.decode_dispatch(args))
+
+    @staticmethod
+    def call_factory(factory, args):
         if args:
             if isinstance(args, Mapping):
                 unpack_keys = ("*", "**")
@@ -272,17 +523,496 @@ class PtbSerialisationDecoder(json.JSONDecoder):
         return instance
 
 
-def serialize(obj):
+# Reference tracking:
+# every registered object (PtbSerializable or foreign) is emitted once, annotated with ID__,
+# and every next occurrence of the same object is emitted as {REF__: id}.
+# Both traversals are iterative and visit nodes in the same order (depth first, INIT__ before ATTRS__),
+# so a reference always follows the definition of its object.
+# Cycles are allowed through ATTRS__, as attributes are ascribed after all objects are instantiated.
+# A reference among INIT__ parameters of an object, to an object which INIT__ is still being serialized,
+# closes a cycle that can not be reinstantiated and raises ValueError at serialization.
+# The same reference among ATTRS__ of any object is fine.
+# json encoding and parsing are done by the json module, and by _dumps_iterative and _loads_iterative
+# if the output is nested deeper than the json module recursion allows, so any depth is handled.
+_INIT_DONE = object()
+_CONTAINER_DONE = object()
+
+
+def ptbs_preprocess_references(obj):
+    """works as ptbs_preprocess but tracks references - see above"""
+    ids = dict()
+    alive = []  # keeps temporary objects alive, so their id() is not reused
+    pending_init = set()
+    active_containers = set()
+    root = [None]
+    stack = [(obj, root, 0, False)]  # in_init - item is a part of INIT__ of the nearest enclosing object
+    while stack:
+        item, target, key, in_init = stack.pop()
+        if item is _INIT_DONE:
+            pending_init.discard(key)
+            continue
+        if item is _CONTAINER_DONE:
+            active_containers.discard(key)
+            continue
+
+        type_ = type(item)
+        plan = PLANS.get(type_) or compile_plan(type_)
+        if plan is preprocess_serializable or plan is preprocess_foreign:
+            if (item_id := id(item)) in ids:
+                ref = ids[item_id]
+                if in_init and ref in pending_init:
+                    raise ValueError(f'Circular reference through initialization parameters of {type_.__name__} '
+                                     f'can not be serialized.')
+                target[key] = {REF_ANNOTATION_KEY: ref}
+                continue
+            ref = ids[item_id] = len(ids)
+            alive.append(item)
+            if plan is preprocess_serializable:
+                name = type_.__name__
+                init = item.serialization_init_params()
+                attrs = item.serialization_instance_attrs()
+            else:
+                registered = PtbSerializable.FOREIGN_SERIALIZABLE_REGISTRY[type_.__name__]
+                name = registered[TYPE_ANNOTATION_KEY].__name__
+                init = (init_factory := registered.get(INIT_ANNOTATION_KEY)) and init_factory(item)
+                attrs = (attrs_factory := registered.get(ATTRS_ANNOTATION_KEY)) and attrs_factory(item)
+                if attrs is not None and not isinstance(attrs, dict):
+                    raise TypeError(f'Invalid serialization_instance_attrs registered with '
+                                    f'PtbSerializable.register_foreign. expected type dict in return. '
+                                    f'Got {type(attrs)}')
+            alive.append(init)
+            alive.append(attrs)
+            out = {TYPE_ANNOTATION_KEY: name, ID_ANNOTATION_KEY: ref,
+                   INIT_ANNOTATION_KEY: None, ATTRS_ANNOTATION_KEY: None}
+            target[key] = out
+            pending_init.add(ref)
+            stack.append((attrs, out, ATTRS_ANNOTATION_KEY, False))
+            stack.append((_INIT_DONE, None, ref, False))
+            stack.append((init, out, INIT_ANNOTATION_KEY, True))
+        elif plan is preprocess_mapping or plan is preprocess_sequence:
+            if (item_id := id(item)) in active_containers:
+                raise ValueError('Circular reference in containers can not be serialized.')
+            active_containers.add(item_id)
+            stack.append((_CONTAINER_DONE, None, item_id, in_init))
+            if plan is preprocess_mapping:
+                out = dict.fromkeys(item.keys())
+                children = list(item.items())
+            else:
+                out = [None] * len(item)
+                children = list(enumerate(item))
+            target[key] = out
+            for k, v in reversed(children):
+                stack.append((v, out, k, in_init))
+        else:
+            target[key] = item
+    return root[0]
+
+
+class _Unresolved:
+    def __init__(self, ref):
+        self.ref = ref
+
+
+_INSTANTIATE = object()
+
+
+def decode_references(obj):
+    """reinstantiates objects of json loaded ptbs_preprocess_references output"""
+    decoder = PtbSerialisationDecoder()
+    objects = dict()
+    unresolved = []  # (container, key) holding _Unresolved
+    attributes = []  # (instance, attrs) ascribed at the end
+    root = [None]
+    stack = [(obj, root, 0)]
+    while stack:
+        item, target, key = stack.pop()
+        if item is _INSTANTIATE:
+            holder, annotated = target, key
+            instance = decoder.call_factory(decoder.get_factory(annotated), holder[INIT_ANNOTATION_KEY])
+            if ID_ANNOTATION_KEY in annotated:
+                objects[annotated[ID_ANNOTATION_KEY]] = instance
+            holder['target'][holder['key']] = instance
+            holder['instance'] = instance
+            attributes.append(holder)
+            continue
+        if isinstance(item, list):
+            out = [None] * len(item)
+            target[key] = out
+            for k in range(len(item) - 1, -1, -1):
+                stack.append((item[k], out, k))
+        elif isinstance(item, dict):
+            if REF_ANNOTATION_KEY in item and len(item) == 1:
+                ref = item[REF_ANNOTATION_KEY]
+                if ref in objects:
+                    target[key] = objects[ref]
+                else:
+                    target[key] = _Unresolved(ref)
+                    unresolved.append((target, key))
+            elif TYPE_ANNOTATION_KEY in item:
+                holder = {'target': target, 'key': key, INIT_ANNOTATION_KEY: None, ATTRS_ANNOTATION_KEY: None}
+                stack.append((item.get(ATTRS_ANNOTATION_KEY), holder, ATTRS_ANNOTATION_KEY))
+                stack.append((_INSTANTIATE, holder, item))
+                stack.append((item.get(INIT_ANNOTATION_KEY), holder, INIT_ANNOTATION_KEY))
+            else:
+                out = dict.fromkeys(item.keys())
+                target[key] = out
+                for k, v in reversed(list(item.items())):
+                    stack.append((v, out, k))
+        else:
+            target[key] = item
+
+    for container, key in unresolved:
+        ref = container[key].ref
+        if ref not in objects:
+            raise ValueError(f'Reference {ref} to an object that was not serialized.')
+        container[key] = objects[ref]
+    for holder in attributes:
+        instance = holder['instance']
+        postinit_attrs = holder[ATTRS_ANNOTATION_KEY]
+        if postinit_attrs and isinstance(postinit_attrs, Mapping):
+            decoder.asign_attrs(instance, postinit_attrs)
+        try:
+            instance._was_serialized = True
+        except AttributeError:
+            pass  # some classes dont allow atribute ascribing
+    return root[0]
+
+
+_END = object()
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_JSON_CONSTANTS = {'null': None, 'true': True, 'false': False,
+                   'NaN': float('nan'), 'Infinity': float('inf'), '-Infinity': float('-inf')}
+
+
+def _json_key(key) -> str:
+    if isinstance(key, str):
+        return json.encoder.encode_basestring_ascii(key)
+    return json.dumps({key: None})[1:-len(': null}')]  # int, float, bool and None keys as json converts them
+
+
+def _dumps_iterative(obj) -> str:
+    """json.dumps(obj, cls=PtbSerialisationEncoder) of nested dicts and lists, with a stack instead of recursion"""
+    parts = []
+    stack = []  # [items iterator, closing bracket, is dict, is first item]
+
+    def emit(value):
+        if isinstance(value, dict) and value:
+            parts.append('{')
+            stack.append([iter(value.items()), '}', True, True])
+        elif isinstance(value, list) and value:
+            parts.append('[')
+            stack.append([iter(value), ']', False, True])
+        else:
+            parts.append(json.dumps(value, cls=PtbSerialisationEncoder))
+
+    emit(obj)
+    while stack:
+        frame = stack[-1]
+        item = next(frame[0], _END)
+        if item is _END:
+            parts.append(frame[1])
+            stack.pop()
+            continue
+        if not frame[3]:
+            parts.append(', ')
+        frame[3] = False
+        if frame[2]:
+            key, item = item
+            parts.append(_json_key(key))
+            parts.append(': ')
+        emit(item)
+    return ''.join(parts)
+
+
+def _loads_iterative(s: str):
+    """json.loads(s) with a stack of open containers instead of recursion"""
+    if isinstance(s, (bytes, bytearray)):
+        s = s.decode(json.detect_encoding(s), 'surrogatepass')
+    root = []
+    containers = []
+    keys = []  # key of the value being parsed, for every open dict
+
+    def skip(pos: int) -> int:
+        return _WHITESPACE.match(s, pos).end()
+
+    def read_key(pos: int) -> int:
+        if s[pos:pos + 1] != '"':
+            raise json.JSONDecodeError('Expecting property name enclosed in double quotes', s, pos)
+        keys[-1], pos = scanstring(s, pos + 1)
+        pos = skip(pos)
+        if s[pos:pos + 1] != ':':
+            raise json.JSONDecodeError("Expecting ':' delimiter", s, pos)
+        return skip(pos + 1)
+
+    def attach(value):
+        if not containers:
+            root.append(value)
+        elif keys[-1] is _END:
+            containers[-1].append(value)
+        else:
+            containers[-1][keys[-1]] = value
+
+    pos = skip(0)
+    while True:
+        char = s[pos:pos + 1]
+        if char in ('{', '['):
+            value = {} if char == '{' else []
+            attach(value)
+            pos = skip(pos + 1)
+            if s[pos:pos + 1] == ('}' if char == '{' else ']'):
+                pos += 1
+            else:
+                containers.append(value)
+                keys.append(None if char == '{' else _END)
+                if char == '{':
+                    pos = read_key(pos)
+                continue
+        elif char == '"':
+            value, pos = scanstring(s, pos + 1)
+            attach(value)
+        else:
+            for literal, value in _JSON_CONSTANTS.items():
+                if s.startswith(literal, pos):
+                    pos += len(literal)
+                    break
+            else:
+                if not (match := NUMBER_RE.match(s, pos)):
+                    raise json.JSONDecodeError('Expecting value', s, pos)
+                integer, fraction, exponent = match.groups()
+                value = float(integer + (fraction or '') + (exponent or '')) if fraction or exponent else int(integer)
+                pos = match.end()
+            attach(value)
+        # after a value: close finished containers, then expect the next value
+        while True:
+            pos = skip(pos)
+            if not containers:
+                if pos != len(s):
+                    raise json.JSONDecodeError('Extra data', s, pos)
+                return root[0]
+            char = s[pos:pos + 1]
+            if char == ',':
+                pos = skip(pos + 1)
+                if keys[-1] is not _END:
+                    pos = read_key(pos)
+                break
+            if char != ('}' if keys[-1] is not _END else ']'):
+                raise json.JSONDecodeError("Expecting ',' delimiter", s, pos)
+            containers.pop()
+            keys.pop()
+            pos += 1
+
+
+def serialize(obj, references: bool = False):
     """
     this is extension of the json.dumps() with emploed PtbSerialisationEncoder
     It serializes all classes registered by PtbSerializable
+    If references is True, every registered object is serialized once and referenced afterwards,
+    which also allows cycles through serialization_instance_attrs - see ptbs_preprocess_references.
+    Such output must be deserialized with references=True.
+    With references=True objects can be nested to any depth. Without references nesting is limited
+    by the recursion limit (sys.getrecursionlimit()) of preprocessing and of the json module.
     """
+    if references:
+        preprocessed = ptbs_preprocess_references(obj)
+        try:
+            return json.dumps(preprocessed, cls=PtbSerialisationEncoder)
+        except RecursionError:
+            return _dumps_iterative(preprocessed)
     return json.dumps(ptbs_preprocess(obj), cls=PtbSerialisationEncoder)
 
 
-def deserialize(obj):
+def deserialize(obj, references: bool = False):
     """
     this is an extension of the json.loads() with employed PtbSerialisationDecoder
     It deserializes all classes registered by PtbSerializable
+    references must be True for the output of serialize(..., references=True)
     """
+    if references:
+        try:
+            loaded = json.loads(obj)
+        except RecursionError:
+            loaded = _loads_iterative(obj)
+        return decode_references(loaded)
     return json.loads(obj, cls=PtbSerialisationDecoder)
+
+
+class BinaryEncoder:
+    """
+    Encodes objects into a compact MessagePack based binary format.
+    It uses msgpack package if installed (C backed) or ptbutil.ptbmsgpack pure python fallback otherwise.
+
+    The serialized objects follow the PtbSerializable model, but instead of annotated dicts
+    they are packed as MessagePack extension of OBJECT_EXT code with payload [type_id, init, attrs].
+    Type names are interned: type_id is an index of the type name in the types table stored once in the header.
+    bytes are packed natively, datetime and numpy.ndarray (if numpy is installed)
+    are packed as DATETIME_EXT and NDARRAY_EXT extensions, the latter as a raw buffer.
+    Tuples are packed as arrays, so they are deserialized as lists, as in json.
+    """
+
+    def __init__(self):
+        self.types = dict()
+
+    def type_id(self, name: str) -> int:
+        return self.types.setdefault(name, len(self.types))
+
+    def pack(self, obj) -> bytes:
+        return msgpack.packb(obj, default=self.default, use_bin_type=True, strict_types=True)
+
+    def default(self, obj):
+        """called by packer for objects of types, which are not packed natively"""
+        type_ = type(obj)
+        if type_ is tuple:
+            return list(obj)
+        elif type_ is datetime:
+            params = [*obj.timetuple()[:6], obj.microsecond]
+            if (offset := obj.utcoffset()) is not None:
+                params.append(offset.total_seconds())
+            return msgpack.ExtType(DATETIME_EXT, self.pack(params))
+        elif (type_.__name__ == 'ndarray' and type_.__module__ == 'numpy'
+              and obj.dtype.fields is None and not obj.dtype.hasobject):
+            buffer = memoryview(obj.reshape(-1).view('u1'))
+            return msgpack.ExtType(NDARRAY_EXT, self.pack([obj.dtype.str, list(obj.shape), buffer]))
+        elif isinstance(obj, PtbSerializable):
+            name = type_.__name__
+            init = obj.serialization_init_params()
+            attrs = obj.serialization_instance_attrs()
+        elif registered := registered_foreign(type_.__name__, type_.__module__):
+            name = registered[TYPE_ANNOTATION_KEY].__name__
+            init = (init_factory := registered.get(INIT_ANNOTATION_KEY)) and init_factory(obj)
+            attrs = (attrs_factory := registered.get(ATTRS_ANNOTATION_KEY)) and attrs_factory(obj)
+        elif isinstance(obj, Mapping):
+            return dict(obj)
+        elif isinstance(obj, (list, tuple)):
+            return list(obj)
+        elif isinstance(obj, (bool, int, float, str, bytes)):  # subclasses eg. enum.IntEnum
+            return next(t for t in (bool, int, float, str, bytes) if isinstance(obj, t))(obj)
+        elif type_.__module__ == 'numpy' and hasattr(obj, 'item'):  # numpy scalars
+            return obj.item()
+        else:
+            raise TypeError(f'Object of type {type_.__name__} is not serializable. '
+                            f'Register it with PtbSerializable.')
+        return msgpack.ExtType(OBJECT_EXT, self.pack([self.type_id(name), init, attrs]))
+
+
+class BinaryDecoder:
+    """
+    Decodes BinaryEncoder payloads, see BinaryEncoder.
+    Decoded numpy arrays are read-only views of the payload buffer.
+    """
+
+    def __init__(self, types: list):
+        self.types = types
+        self.decoder = PtbSerialisationDecoder()
+
+    def unpack(self, data: bytes):
+        return msgpack.unpackb(data, ext_hook=self.ext_hook, raw=False, strict_map_key=False)
+
+    def ext_hook(self, code: int, data: bytes):
+        if code == OBJECT_EXT:
+            type_id, init, attrs = self.unpack(data)
+            return self.decoder.reinstantiate({TYPE_ANNOTATION_KEY: self.types[type_id],
+                                               INIT_ANNOTATION_KEY: init,
+                                               ATTRS_ANNOTATION_KEY: attrs})
+        elif code == DATETIME_EXT:
+            params = self.unpack(data)
+            if len(params) > 7:
+                return datetime(*params[:7], tzinfo=timezone(timedelta(seconds=params[7])))
+            return datetime(*params)
+        elif code == NDARRAY_EXT:
+            try:
+                import numpy as np
+            except ImportError:
+                raise ImportError('Deserialization of numpy.ndarray requires numpy to be installed.') from None
+            dtype, shape, buffer = self.unpack(data)
+            return np.frombuffer(buffer, dtype=np.dtype(dtype)).reshape(shape)
+        return msgpack.ExtType(code, data)
+
+
+def serialize_binary(obj) -> bytes:
+    """
+    Serializes obj into the compact binary format - see BinaryEncoder.
+    It serializes all classes registered by PtbSerializable.
+    """
+    encoder = BinaryEncoder()
+    body = encoder.pack(obj)
+    return msgpack.packb([BINARY_FORMAT_VERSION, list(encoder.types), body], use_bin_type=True)
+
+
+def deserialize_binary(data: bytes):
+    """
+    Deserializes serialize_binary output.
+    It deserializes all classes registered by PtbSerializable
+    """
+    version, types, body = msgpack.unpackb(data, raw=False)
+    if version != BINARY_FORMAT_VERSION:
+        raise ValueError(f'Unsupported binary format version {version}.')
+    return BinaryDecoder(types).unpack(body)
+
+
+def serialize_stream(iterable: Iterable,
+                     fp: IO,
+                     framing: str = 'ndjson',
+                     processes: Optional[int] = None,
+                     chunksize: int = 1000) -> int:
+    """
+    Serializes objects of the iterable one by one into the open file fp, so the whole sequence
+    is never held in memory.
+    :param framing: 'ndjson' - fp is a text file, every object is serialized to json in its own line
+                    'frames' - fp is a binary file, every object is serialized with serialize_binary
+                               and written as a frame prefixed with its length (4 bytes big endian)
+    :param processes: if passed, objects are encoded in a ProcessPoolExecutor of that many processes.
+        Useful if serialization methods are cpu heavy.
+        Registered classes must be importable by the worker processes.
+    :param chunksize: number of objects encoded at a time - it bounds memory use of the process pool path
+    :return: number of serialized objects
+    """
+    if framing not in FRAMINGS:
+        raise ValueError(f'framing must be one of {FRAMINGS}. Got {framing}')
+    encode = serialize if framing == 'ndjson' else serialize_binary
+    iterator = iter(iterable)
+    n = 0
+    if processes:
+        from concurrent.futures import ProcessPoolExecutor  # imported on demand, it is slow to import
+        executor = ProcessPoolExecutor(processes)
+    else:
+        executor = None
+    try:
+        while chunk := list(islice(iterator, chunksize)):
+            if executor is None:
+                encoded = map(encode, chunk)
+            else:
+                encoded = executor.map(encode, chunk, chunksize=max(1, len(chunk) // (4 * processes)))
+            for data in encoded:
+                if framing == 'ndjson':
+                    fp.write(data)
+                    fp.write('\n')
+                else:
+                    fp.write(FRAME_HEADER.pack(len(data)))
+                    fp.write(data)
+                n += 1
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return n
+
+
+def deserialize_stream(fp: IO, framing: str = 'ndjson') -> Generator:
+    """
+    Yields objects deserialized one by one from the open file fp written by serialize_stream.
+    For framing see serialize_stream.
+    """
+    if framing not in FRAMINGS:
+        raise ValueError(f'framing must be one of {FRAMINGS}. Got {framing}')
+    if framing == 'ndjson':
+        for line in fp:
+            if line.strip():
+                yield deserialize(line)
+        return
+    while header := fp.read(FRAME_HEADER.size):
+        if len(header) < FRAME_HEADER.size:
+            raise ValueError('Truncated frame header.')
+        (size,) = FRAME_HEADER.unpack(header)
+        data = fp.read(size)
+        if len(data) < size:
+            raise ValueError('Truncated frame.')
+        yield deserialize_binary(data)
@@ -0,0 +1,152 @@
+"""
+MinHash signatures and an LSH band index for near-duplicate detection of texts.
+
+A text is turned into a set of character shingles (k-grams of the lowercased text with whitespace collapsed).
+The MinHash signature of the set is a vector of num_perm minimal values of universal hash functions,
+and the fraction of equal positions of two signatures estimates the Jaccard similarity of the shingle sets.
+
+LSHIndex splits signatures into bands of rows. Texts sharing at least one whole band are candidates,
+so a query is answered without comparing the signature to every indexed signature.
+The probability of becoming a candidate crosses 0.5 near similarity (1 / bands) ** (1 / rows).
+
+Signatures depend only on num_perm, k and seed, so they can be stored and compared across sessions.
+
+Usage:
+    index = LSHIndex(num_perm=128, bands=16)
+    index.insert('doc1', minhash_signature(text1))
+    index.similar(minhash_signature(text2), threshold=0.9) -> [(0.95, 'doc1')]
+"""
+
+from hashlib import sha1
+from typing import Hashable, Iterable, Optional
+import re
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = np.uint64((1 << 32) - 1)
+SHINGLE_BASE = np.uint64(1000003)
+WHITESPACE = re.compile(r'\s+')
+
+
+def shingle_hashes(text: str, k: int = 5) -> np.ndarray:
+    """
+    Returns unique 32 bit hashes of character k-grams of the normalized text.
+    Texts shorter than k make a single shingle.
+    """
+    text = WHITESPACE.sub(' ', text.lower()).strip()
+    if not text:
+        return np.empty(0, dtype=np.uint64)
+    codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+    k = min(k, len(codes))
+    powers = SHINGLE_BASE ** np.arange(k - 1, -1, -1, dtype=np.uint64)
+    hashes = sliding_window_view(codes, k) @ powers  # wraps modulo 2 ** 64
+    hashes = (hashes ^ (hashes >> np.uint64(32))) & MAX_HASH
+    return np.unique(hashes)
+
+
+def permutations(num_perm: int = 128, seed: int = 1) -> tuple:
+    """
+    Returns (a, b) parameters of num_perm universal hash functions (a * x + b) mod MERSENNE_PRIME.
+    They are derived from sha1, so they do not depend on numpy random generators.
+    """
+    params = [int.from_bytes(sha1(f'{seed}:{i}'.encode()).digest()[:8], 'little') for i in range(num_perm)]
+    a = np.array([(p & 0xffffffff) | 1 for p in params], dtype=np.uint64)
+    b = np.array([p >> 32 for p in params], dtype=np.uint64)
+    return a, b
+
+
+_PERMUTATIONS = dict()
+
+
+def minhash_signature(text: str, num_perm: int = 128, k: int = 5, seed: int = 1, chunk: int = 4096) -> np.ndarray:
+    """
+    Returns MinHash signature of the text - np.ndarray of num_perm uint64 values.
+    Shingles are processed in chunks, so long texts do not build a num_perm x shingles matrix at once.
+    """
+    if (num_perm, seed) not in _PERMUTATIONS:
+        _PERMUTATIONS[(num_perm, seed)] = permutations(num_perm, seed)
+    a, b = _PERMUTATIONS[(num_perm, seed)]
+    signature = np.full(num_perm, MERSENNE_PRIME, dtype=np.uint64)
+    hashes = shingle_hashes(text, k=k)
+    for start in range(0, len(hashes), chunk):
+        x = hashes[start: start + chunk]
+        # a, x < 2 ** 32 so a * x + b fits in uint64
+        values = (np.outer(a, x) + b[:, None]) % np.uint64(MERSENNE_PRIME)
+        np.minimum(signature, values.min(axis=1), out=signature)
+    return signature
+
+
+def signature_similarity(a: Iterable, b: Iterable) -> float:
+    """estimated Jaccard similarity of two signatures"""
+    a = np.asarray(a, dtype=np.uint64)
+    b = np.asarray(b, dtype=np.uint64)
+    if a.shape != b.shape:
+        raise ValueError(f'Signatures of different lengths: {len(a)} and {len(b)}')
+    return float(np.count_nonzero(a == b)) / len(a)
+
+
+class LSHIndex:
+    """
+    Locality sensitive hashing index of MinHash signatures.
+
+    Attributes:
+        num_perm: int - length of indexed signatures
+        bands: int - number of bands, num_perm must be divisible by bands
+        rows: int - number of signature values in a band
+        signatures: dict of key: signature
+
+    Methods:
+        insert(key, signature) - indexes the signature under the key
+        candidates(signature) - returns keys sharing at least one band with the signature
+        similar(signature, threshold) - returns sorted (similarity, key) pairs of candidates above threshold
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 16):
+        if num_perm % bands:
+            raise ValueError(f'num_perm must be divisible by bands. Got {num_perm} and {bands}')
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.buckets = [dict() for _ in range(bands)]
+        self.signatures = dict()
+
+    @property
+    def threshold(self) -> float:
+        """similarity at which a pair becomes a candidate with probability about 0.5"""
+        return (1 / self.bands) ** (1 / self.rows)
+
+    def _band_keys(self, signature: np.ndarray) -> list:
+        signature = np.asarray(signature, dtype=np.uint64)
+        if len(signature) != self.num_perm:
+            raise ValueError(f'Expected signature of length {self.num_perm}. Got {len(signature)}')
+        return [band.tobytes() for band in signature.reshape(self.bands, self.rows)]
+
+    def insert(self, key: Hashable, signature: Iterable) -> None:
+        signature = np.asarray(signature, dtype=np.uint64)
+        for bucket, band_key in zip(self.buckets, self._band_keys(signature)):
+            bucket.setdefault(band_key, set()).add(key)
+        self.signatures[key] = signature
+
+    def candidates(self, signature: Iterable) -> set:
+        found = set()
+        for bucket, band_key in zip(self.buckets, self._band_keys(signature)):
+            found.update(bucket.get(band_key, ()))
+        return found
+
+    def similar(self, signature: Iterable, threshold: Optional[float] = None) -> list:
+        """threshold defaults to LSHIndex.threshold"""
+        threshold = self.threshold if threshold is None else threshold
+        signature = np.asarray(signature, dtype=np.uint64)
+        found = ((signature_similarity(signature, self.signatures[key]), key) for key in self.candidates(signature))
+        return sorted(((s, key) for s, key in found if s >= threshold), key=lambda x: x[0], reverse=True)
+
+    def __contains__(self, key) -> bool:
+        return key in self.signatures
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+    def __repr__(self):
+        return f'<LSHIndex bands={self.bands}, rows={self.rows}, len={len(self)}>'
@@ -6,13 +6,40 @@ in a specified directory. It includes functionality for writing single or
 multiple texts, reading files based on filename or conditions, and maintaining
 an index of stored files.
 
+Layouts:
+    'flat' (default) - every text is a file directly in the depo directory.
+    'sharded' - every text is stored as ab/cd/<hash>.txt, so no directory grows
+        beyond 256 entries. The path of each file is recorded in its descriptor,
+        so depos written with the flat layout remain readable.
+    'pack' - texts are compressed one by one and appended to pack files
+        (<file_name>00000.pack.gz, ...). The descriptor records the pack, the offset
+        and the size of each record, so a read seeks straight to it.
+        Records are independent gzip members (or zstd frames if codec='zstd' and
+        zstandard package is installed), so a whole pack also decompresses with
+        gzip/zstd tools.
+
+Indexes:
+    'json' (default) - the index is a QuickStore json file <file_name>.index
+    'sqlite' - the index is an sqlite database <file_name>.index.db with secondary indexes
+        on meta keys declared in indexed_meta, so read_many(where=..., time_range=...)
+        is resolved by the database. An existing json index is imported on first use.
+
+Near duplicates:
+    With minhash=True every descriptor keeps a MinHash signature of its text (see ptbutil.store.minhash).
+    write(..., near_duplicate_threshold=0.9) drops texts which estimated similarity to any stored text
+    reaches the threshold, and TextDepo.similar(text) finds similar stored texts.
+    Both use an LSH band index built from the stored signatures on first use.
+
 Classes:
     TextDepoIndex: A subclass of QuickStore for managing the file index.
+    TextDepoSqliteIndex: An sqlite backed file index with the TextDepoIndex interface.
     FileDescriptor: A dataclass for storing file metadata.
     TextDepo: The main class for text storage and retrieval operations.
+    IngestionReport: A dataclass summarizing TextDepo.ingest.
 
 Functions:
     textdepo_hash: Generates a hash for a given text.
+    shard_path: Builds the relative sharded path of a text from its hash.
 
 Dependencies:
     pathlib, os, time, dataclasses, typing, collections.abc, hashlib,
@@ -24,15 +51,27 @@ import pathlib
 import os
 import time
 import json
+import gzip
+import sqlite3
+import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from dataclasses import dataclass, field
 from typing import Union, Optional, Iterable, Callable, Generator, Any, NoReturn
 from collections.abc import Iterable as IterableType
+from itertools import repeat, islice
 from hashlib import sha1
 from ptbutil.files.functions import absolute_path, timestampped_filename
 from ptbutil.validation import validate_type, validate_with_callable
 from ptbutil.store.quickstore import QuickStore
+from ptbutil.db.sqlite import get_connection, create_table
+from ptbutil.store.minhash import minhash_signature, LSHIndex
 from ptbutil.iteration import zipeven
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 
 def textdepo_hash(text) -> str:
     """
@@ -47,6 +86,65 @@ def textdepo_hash(text) -> str:
     return sha1(text.encode()).hexdigest()
 
 
+def shard_path(text_hash: str, depth: int = 2, width: int = 2, extension: str = 'txt') -> str:
+    """
+    Build a relative path of a text file in the sharded layout.
+
+    Args:
+        text_hash (str): hash of the text as returned by textdepo_hash.
+        depth (int): number of nested shard directories.
+        width (int): number of hash characters naming each shard directory.
+        extension (str): file extension.
+
+    Returns:
+        str: relative path eg. 'ab/cd/abcd....txt'
+    """
+    shards = [text_hash[i * width: (i + 1) * width] for i in range(depth)]
+    return os.path.join(*shards, f'{text_hash}.{extension}')
+
+
+def compress(data: bytes, codec: str) -> bytes:
+    if codec == 'gzip':
+        return gzip.compress(data, mtime=0)
+    elif codec == 'zstd':
+        return zstandard.ZstdCompressor().compress(data)
+    else:
+        raise ValueError(f'Unknown codec {codec}. Expected one of {tuple(PACK_EXTENSIONS)}')
+
+
+def decompress(data: bytes, codec: str) -> bytes:
+    if codec == 'gzip':
+        return gzip.decompress(data)
+    elif codec == 'zstd':
+        return zstandard.ZstdDecompressor().decompress(data)
+    else:
+        raise ValueError(f'Unknown codec {codec}. Expected one of {tuple(PACK_EXTENSIONS)}')
+
+
+def cook_record(text: str,
+                encoding: str = 'utf-8',
+                codec: Optional[str] = None,
+                num_perm: Optional[int] = None) -> tuple:
+    """
+    Returns (hash, length, record, signature) of the text.
+    The record is compressed encoded text if codec is passed, else None.
+    The signature is a MinHash signature list if num_perm is passed, else None.
+    This is a worker function of TextDepo.ingest process pool.
+    """
+    return (textdepo_hash(text),
+            len(text),
+            codec and compress(text.encode(encoding), codec),
+            num_perm and minhash_signature(text, num_perm=num_perm).tolist())
+
+
+def write_text_file(path: str, text: str, encoding: str = 'utf-8', makedirs: bool = False) -> None:
+    """This is a worker function of TextDepo.ingest thread pool."""
+    if makedirs:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding=encoding) as f:
+        f.write(text)
+
+
 def conditional_check(condition, s: str) -> bool:
     if isinstance(condition, str):
         return condition in s
@@ -59,6 +157,30 @@ def conditional_check(condition, s: str) -> bool:
         raise TypeError(f'condition must be str or Callable returning bool.')
 
 
+def meta_check(descriptor: dict, where: Optional[dict] = None, time_range: Optional[tuple] = None) -> bool:
+    """
+    checks if descriptor meets the query conditions:
+    where - dict of meta keys and required values, a list, tuple or set value means: one of.
+        None matches descriptors with None meta value or without the key.
+    time_range - tuple of (start, stop) time strings, start is inclusive, stop is exclusive, both can be None
+    """
+    if time_range:
+        start, stop = time_range
+        if start is not None and descriptor['time'] < start:
+            return False
+        if stop is not None and descriptor['time'] >= stop:
+            return False
+    if where:
+        meta = descriptor.get('filemeta', {})
+        for k, v in where.items():
+            if isinstance(v, (list, tuple, set)):
+                if meta.get(k) not in v:
+                    return False
+            elif meta.get(k) != v:
+                return False
+    return True
+
+
 def serializable(obj: Any):
     try:
         json.dumps(obj)
@@ -67,6 +189,12 @@ def serializable(obj: Any):
         return False
 
 
+REQUIRED_DESCRIPTOR_FIELDS = ('hash', 'len', 'time', 'filename')
+INDEXES = ('json', 'sqlite')
+LAYOUTS = ('flat', 'sharded', 'pack')
+PACK_EXTENSIONS = {'gzip': 'pack.gz', 'zstd': 'pack.zst'}
+
+
 class TextDepoIndex(QuickStore):
     """
     A subclass of QuickStore for managing the file index of TextDepo.
@@ -75,20 +203,26 @@ class TextDepoIndex(QuickStore):
     of items in the file index.
     """
 
+    def __init__(self, file_path: str):
+        super().__init__(file_path)
+        self._filenames = None
+
     def set(self, k, v) -> QuickStore:
+        if self._filenames is not None:
+            self._filenames[v['filename']] = k
         return self['files_index'].update({k: v})
 
     def get(self, k) -> Any:
-        return self['files_index'].data.get(k)
+        return self.store.get('files_index', {}).get(k)
 
     def keys(self):
-        return self['files_index'].data.keys()
+        return self.store.get('files_index', {}).keys()
 
     def values(self):
-        return self['files_index'].data.values()
+        return self.store.get('files_index', {}).values()
 
     def items(self):
-        return self['files_index'].data.items()
+        return self.store.get('files_index', {}).items()
 
     def __contains__(self, item) -> bool:
         try:
@@ -97,7 +231,156 @@ class TextDepoIndex(QuickStore):
             return False
 
     def __len__(self) -> int:
-        return len(self['files_index'].data)
+        try:
+            return len(self['files_index'].data)
+        except KeyError:
+            return 0
+
+    def by_filename(self, filename) -> Optional[dict]:
+        """
+        Returns the descriptor of a file of the given name or None.
+        The filename lookup table is built once and then kept in step by set.
+        """
+        if self._filenames is None:
+            self._filenames = {v['filename']: k for k, v in self.items()}
+        k = self._filenames.get(filename)
+        return k and self.get(k)
+
+    def query(self, where: Optional[dict] = None, time_range: Optional[tuple] = None) -> Generator:
+        """yields descriptors meeting the conditions - see meta_check"""
+        return (d for d in tuple(self.values()) if meta_check(d, where=where, time_range=time_range))
+
+    def close(self) -> None:
+        """the json index holds no open files, so closing only dumps it"""
+        self.dump()
+
+
+class TextDepoSqliteIndex:
+    """
+    An sqlite backed file index of TextDepo.
+
+    It has the same interface as TextDepoIndex, but changes are committed only at dump
+    and query is resolved by the database.
+    Descriptors are kept in a single table: required fields have their own columns,
+    filemeta and the remaining descriptor fields are kept as json.
+    Meta keys passed in indexed_meta get an expression index,
+    so the equality and time queries on them do not scan the table.
+    close() commits and closes the connection, it is called on leaving a with block.
+    """
+
+    SCHEMA = ('CREATE TABLE IF NOT EXISTS descriptors '
+              '(hash TEXT PRIMARY KEY, len INTEGER, time TEXT, filename TEXT, meta TEXT, extra TEXT)')
+
+    def __init__(self, file_path: str, indexed_meta: Iterable[str] = ()):
+        self.filepath = absolute_path(file_path)
+        self.con = get_connection(self.filepath)
+        create_table(self.con, self.SCHEMA)
+        self.con.execute('CREATE INDEX IF NOT EXISTS descriptors_filename ON descriptors(filename)')
+        self.con.execute('CREATE INDEX IF NOT EXISTS descriptors_time ON descriptors(time)')
+        for key in indexed_meta:
+            self.con.execute(f'CREATE INDEX IF NOT EXISTS "descriptors_meta_{key}" '
+                             f'ON descriptors({self._meta_expression(key)})')
+        self.con.commit()
+
+    @staticmethod
+    def _meta_expression(key: str) -> str:
+        if not isinstance(key, str) or '"' in key or "'" in key:
+            raise ValueError(f'Invalid meta key {key!r}')
+        return f"json_extract(meta, '$.\"{key}\"')"
+
+    @staticmethod
+    def _row_descriptor(row: sqlite3.Row) -> dict:
+        descriptor = {k: row[k] for k in REQUIRED_DESCRIPTOR_FIELDS}
+        if meta := json.loads(row['meta']):
+            descriptor['filemeta'] = meta
+        descriptor.update(json.loads(row['extra']))
+        return descriptor
+
+    @staticmethod
+    def _descriptor_row(descriptor: dict) -> tuple:
+        extra = {k: v for k, v in descriptor.items() if k not in REQUIRED_DESCRIPTOR_FIELDS and k != 'filemeta'}
+        return (*(descriptor[k] for k in REQUIRED_DESCRIPTOR_FIELDS),
+                json.dumps(descriptor.get('filemeta', {})),
+                json.dumps(extra))
+
+    def set(self, k, v) -> 'TextDepoSqliteIndex':
+        self.con.execute('INSERT OR REPLACE INTO descriptors VALUES (?, ?, ?, ?, ?, ?)',
+                         self._descriptor_row(dict(v, hash=k)))
+        return self
+
+    def set_many(self, items: Iterable) -> 'TextDepoSqliteIndex':
+        self.con.executemany('INSERT OR REPLACE INTO descriptors VALUES (?, ?, ?, ?, ?, ?)',
+                             (self._descriptor_row(dict(v, hash=k)) for k, v in items))
+        return self
+
+    def get(self, k) -> Optional[dict]:
+        row = self.con.execute('SELECT * FROM descriptors WHERE hash = ?', (k,)).fetchone()
+        return row and self._row_descriptor(row)
+
+    def keys(self):
+        return (row[0] for row in self.con.execute('SELECT hash FROM descriptors'))
+
+    def values(self):
+        return (self._row_descriptor(row) for row in self.con.execute('SELECT * FROM descriptors'))
+
+    def items(self):
+        return ((d['hash'], d) for d in self.values())
+
+    def __contains__(self, item) -> bool:
+        return self.con.execute('SELECT 1 FROM descriptors WHERE hash = ?', (item,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        return self.con.execute('SELECT COUNT(*) FROM descriptors').fetchone()[0]
+
+    def by_filename(self, filename) -> Optional[dict]:
+        row = self.con.execute('SELECT * FROM descriptors WHERE filename = ?', (filename,)).fetchone()
+        return row and self._row_descriptor(row)
+
+    def query(self, where: Optional[dict] = None, time_range: Optional[tuple] = None) -> Generator:
+        """yields descriptors meeting the conditions - see meta_check"""
+        clauses, params = [], []
+        if time_range:
+            start, stop = time_range
+            if start is not None:
+                clauses.append('time >= ?')
+                params.append(start)
+            if stop is not None:
+                clauses.append('time < ?')
+                params.append(stop)
+        for k, v in (where or {}).items():
+            expression = self._meta_expression(k)
+            if isinstance(v, (list, tuple, set)):
+                # NULL never equals anything, so None is matched with IS NULL
+                values = tuple(e for e in v if e is not None)
+                alternatives = [f'{expression} IN ({", ".join("?" * len(values))})'] if values else []
+                if len(values) < len(v):
+                    alternatives.append(f'{expression} IS NULL')
+                clauses.append(f'({" OR ".join(alternatives) or "0"})')
+                params.extend(values)
+            elif v is None:
+                clauses.append(f'{expression} IS NULL')
+            else:
+                clauses.append(f'{expression} = ?')
+                params.append(v)
+        sql = 'SELECT * FROM descriptors'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        return (self._row_descriptor(row) for row in self.con.execute(sql, params).fetchall())
+
+    def dump(self) -> None:
+        self.con.commit()
+
+    def close(self) -> None:
+        if self.con is not None:
+            self.con.commit()
+            self.con.close()
+            self.con = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
 
 
 @dataclass
@@ -106,10 +389,33 @@ class FileDescriptor:
     len: int
     time: str
     filename: str
-    filemeta: field(default_factory=dict)
+    filemeta: dict = field(default_factory=dict)
+    path: Optional[str] = None
+    pack: Optional[str] = None
+    offset: Optional[int] = None
+    size: Optional[int] = None
+    minhash: Optional[list] = None
 
     def as_dict(self):
-        return self.__dict__
+        """unset optional fields are skipped to keep the index compact"""
+        return {k: v for k, v in self.__dict__.items()
+                if k in REQUIRED_DESCRIPTOR_FIELDS or v or (k == 'offset' and v is not None)}
+
+
+@dataclass
+class IngestionReport:
+    docs: int = 0
+    written: int = 0
+    skipped: int = 0
+    seconds: float = 0.
+
+    @property
+    def docs_per_sec(self) -> float:
+        return self.docs / self.seconds if self.seconds else 0.
+
+    def __repr__(self):
+        return (f'<IngestionReport docs={self.docs}, written={self.written}, skipped={self.skipped}, '
+                f'seconds={round(self.seconds, 3)}, docs/sec={round(self.docs_per_sec, 1)}>')
 
 
 class TextDepo:
@@ -118,100 +424,427 @@ class TextDepo:
 
         This class provides methods for writing and reading text files, as well as
         maintaining an index of stored files.
+
+        Parameters:
+            dir_path: directory of the depo, it must exist.
+            file_name: optional prefix of file names and name of the index.
+            encoding: text files encoding.
+            layout: 'flat', 'sharded' or 'pack' - see module __doc__. Layout decides only where new texts go.
+                Texts are always read from the location recorded in the index.
+            codec: 'gzip' or 'zstd' - compression of the pack layout records.
+            pack_size: int - size in bytes after which a new pack file is started.
+            index: 'json' or 'sqlite' - see module __doc__.
+            indexed_meta: meta keys to be indexed by the sqlite index.
+            minhash: bool - if True MinHash signatures of texts are stored with descriptors.
+            num_perm: int - length of MinHash signatures.
+            lsh_bands: int - number of LSH bands, see ptbutil.store.minhash.LSHIndex.
+
+        close() dumps the index and closes the sqlite connection, TextDepo can be used as a context manager:
+            with TextDepo(dir_path, index='sqlite') as depo:
+                depo.write(text)
     """
 
     def __init__(self,
                  dir_path: Union[str, pathlib.Path],
                  file_name: Optional = None,
-                 encoding='utf-8') -> None:
+                 encoding='utf-8',
+                 layout: str = 'flat',
+                 codec: str = 'gzip',
+                 pack_size: int = 2 ** 28,
+                 index: str = 'json',
+                 indexed_meta: Iterable[str] = (),
+                 minhash: bool = False,
+                 num_perm: int = 128,
+                 lsh_bands: int = 16) -> None:
         self.dir_path = absolute_path(dir_path)
         if not os.path.isdir(self.dir_path):
             raise FileNotFoundError(f'Could not instantiate TextDepo in {self.dir_path}, '
                                     f'because this directory does not exist.')
+        if layout not in LAYOUTS:
+            raise ValueError(f'layout must be one of {LAYOUTS}. Got {layout}')
+        if codec not in PACK_EXTENSIONS:
+            raise ValueError(f'codec must be one of {tuple(PACK_EXTENSIONS)}. Got {codec}')
+        if codec == 'zstd' and zstandard is None:
+            raise ImportError('codec zstd requires zstandard package to be installed.')
+        if index not in INDEXES:
+            raise ValueError(f'index must be one of {INDEXES}. Got {index}')
         self.file_name = file_name
         self.encoding = encoding
+        self.layout = layout
+        self.codec = codec
+        self.pack_size = pack_size
+        self._pack_file = None
+        self._pack_number = None
+        self.minhash = minhash
+        self.num_perm = num_perm
+        self.lsh_bands = lsh_bands
+        self._lsh = None
         index_name = self.file_name or ''
-        self.index = TextDepoIndex(os.path.join(self.dir_path, f'{index_name}.index'))
-
-    def cook_descriptor(self, text, meta: Optional[dict] = None) -> FileDescriptor:
+        json_index_path = os.path.join(self.dir_path, f'{index_name}.index')
+        if index == 'sqlite':
+            self.index = TextDepoSqliteIndex(f'{json_index_path}.db', indexed_meta=indexed_meta)
+            if not len(self.index) and os.path.isfile(json_index_path):
+                self.index.set_many(TextDepoIndex(json_index_path).items()).dump()
+        else:
+            self.index = TextDepoIndex(json_index_path)
+
+    def cook_descriptor(self,
+                        text,
+                        meta: Optional[dict] = None,
+                        text_hash: Optional[str] = None,
+                        text_len: Optional[int] = None) -> FileDescriptor:
+        """text_hash and text_len can be passed if they were already computed"""
         meta = meta or dict()
-        return FileDescriptor(hash=textdepo_hash(text),
-                              len=len(text),
+        text_hash = text_hash or textdepo_hash(text)
+        return FileDescriptor(hash=text_hash,
+                              len=len(text) if text_len is None else text_len,
                               time=time.strftime('%Y%m%dT%X', time.localtime()),
                               filename=timestampped_filename(prefix=self.file_name,
                                                              extension='txt',
                                                              timeformat='%Y%m%dT%H%M%S',
                                                              adnex_sep='p'),
-                              filemeta=meta)
+                              filemeta=meta,
+                              path=shard_path(text_hash) if self.layout == 'sharded' else None)
+
+    def write(self,
+              text: str,
+              drop_duplicates=True,
+              near_duplicate_threshold: Optional[float] = None,
+              **meta) -> None:
+        """
+        Writes the text with meta information passed as keyword arguments.
+        drop_duplicates - skips texts of a hash already in the index.
+        near_duplicate_threshold - skips texts of estimated similarity to any stored text at least this high.
+        """
+        try:
+            if self._store(text,
+                           drop_duplicates=drop_duplicates,
+                           meta=meta,
+                           near_duplicate_threshold=near_duplicate_threshold):
+                self.index.dump()
+        finally:
+            self._close_pack()
 
-    def write(self, text: str, drop_duplicates=True, **meta) -> None:
-        validate_type(text, str, error_message=f'TextDepo can only write type str.')
-        validate_type(meta, dict, error_message=f'File meta information must be type dict')
-        for v in meta.values():
-            validate_with_callable(v, serializable)
+    def write_many(self,
+                   texts: Iterable,
+                   drop_duplicates: bool = True,
+                   meta: Optional[Iterable[dict]] = None,
+                   near_duplicate_threshold: Optional[float] = None) -> None:
+        """
+        Writes many texts and dumps the index once for the whole batch.
+        meta, if passed, must be an iterable of dicts of the same length as texts.
+        For near_duplicate_threshold see TextDepo.write.
+        """
+        # validation
+        validate_type(texts, IterableType, error_message='Method write_many accepts Iterable type only.')
+        if meta is None:
+            meta = repeat(None)
+            pairs = zip(texts, meta)
+        else:
+            validate_type(meta, IterableType, error_message='Parameter meta must be an iterable of dict types.')
+            pairs = zipeven(texts, meta)
 
+        written = 0
+        try:
+            for t, m in pairs:
+                written += self._store(t,
+                                       drop_duplicates=drop_duplicates,
+                                       meta=m,
+                                       near_duplicate_threshold=near_duplicate_threshold)
+        finally:
+            self._close_pack()
+            if written:
+                self.index.dump()
+
+    def _store(self,
+               text: str,
+               drop_duplicates: bool = True,
+               meta: Optional[dict] = None,
+               near_duplicate_threshold: Optional[float] = None) -> bool:
+        """
+        Writes the text file and records its descriptor in the index, without dumping the index.
+        Returns True if the text was written.
+        """
+        meta = self._validate(text, meta)
         descriptor = self.cook_descriptor(text, meta=meta)
 
         if drop_duplicates and descriptor.hash in self.index:
-            return
+            return False
+
+        if self.minhash or near_duplicate_threshold is not None:
+            signature = minhash_signature(text, num_perm=self.num_perm)
+            if near_duplicate_threshold is not None and self.lsh.similar(signature, near_duplicate_threshold):
+                return False
+            descriptor.minhash = signature.tolist()
+            self.lsh.insert(descriptor.hash, signature)
+
+        if self.layout == 'pack':
+            self._append_record(descriptor, compress(text.encode(self.encoding), self.codec))
         else:
-            file_name = descriptor.filename
-            path = os.path.join(self.dir_path, file_name)
+            path = self._descriptor_path(descriptor.as_dict())
+            if descriptor.path:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
             with open(path, 'w', encoding=self.encoding) as f:
                 f.write(text)
-            self.index.set(descriptor.hash, descriptor.as_dict()).dump()
-
-    def write_many(self,
-                   texts: Iterable,
-                   drop_duplicates: bool = True,
-                   meta: Optional[Iterable[dict]] = None) -> None:
-
-        # validation
-        validate_type(meta, IterableType, error_message='Parameter meta must be an iterable of dict types.')
-        validate_type(texts, IterableType, error_message='Method write_many accepts Iterable type only.')
-
-        for t, m in zipeven(texts, meta):
-            self.write(t, drop_duplicates=drop_duplicates, meta=m)
+        self.index.set(descriptor.hash, descriptor.as_dict())
+        return True
 
-        # this should be implemented if the loop above fails
-        # texts = tuple(texts)
-        # meta = tuple(meta)
-        # if len(meta) != len(texts):
-        #     raise ValueError(f'Different number of meta information and texts.')
-        # for t,m  in zip(texts, meta):
-        #     self.write(t, drop_duplicates=drop_duplicates, meta=m)
+    @staticmethod
+    def _validate(text: str, meta: Optional[dict]) -> dict:
+        meta = meta or dict()
+        validate_type(text, str, error_message=f'TextDepo can only write type str.')
+        validate_type(meta, dict, error_message=f'File meta information must be type dict')
+        for v in meta.values():
+            validate_with_callable(v, serializable)
+        return meta
+
+    def ingest(self,
+               items: Iterable,
+               drop_duplicates: bool = True,
+               batch_size: int = 1000,
+               processes: Optional[int] = None,
+               threads: Optional[int] = None) -> IngestionReport:
+        """
+        High throughput bulk writing.
+        items - iterable (a generator is fine) of texts or (text, meta) pairs, where meta is a dict or None.
+        Items are consumed in batches of batch_size, so only one batch is kept in memory.
+        Texts of a batch are hashed (compressed in the pack layout and minhashed if TextDepo.minhash)
+        in a process pool,
+        files are written by a thread pool and the index is dumped once per batch.
+        processes - number of processes, 0 hashes in the calling process, None leaves it to ProcessPoolExecutor.
+        threads - number of file writing threads, None leaves it to ThreadPoolExecutor.
+        Returns IngestionReport. Its line is also logged at logging.info level after every batch.
+        """
+        validate_type(items, IterableType, error_message='Method ingest accepts Iterable type only.')
+        report = IngestionReport()
+        codec = self.codec if self.layout == 'pack' else None
+        num_perm = self.num_perm if self.minhash else None
+        items = iter(items)
+        t1 = time.perf_counter()
+        processes_pool = ProcessPoolExecutor(processes) if processes != 0 else None
+        try:
+            with ThreadPoolExecutor(threads) as threads_pool:
+                while batch := list(islice(items, batch_size)):
+                    batch = [item if isinstance(item, tuple) else (item, None) for item in batch]
+                    batch = [(text, self._validate(text, meta)) for text, meta in batch]
+                    texts = [text for text, _ in batch]
+                    if processes_pool is None:
+                        cooked = [cook_record(text, self.encoding, codec, num_perm) for text in texts]
+                    else:
+                        chunksize = max(1, len(texts) // (4 * (processes or os.cpu_count() or 1)))
+                        cooked = list(processes_pool.map(cook_record, texts, repeat(self.encoding),
+                                                         repeat(codec), repeat(num_perm), chunksize=chunksize))
+                    report.written += self._write_batch(batch, cooked, threads_pool, drop_duplicates)
+                    report.docs += len(batch)
+                    report.seconds = time.perf_counter() - t1
+                    logging.info(f'{self} ingest: {report}')
+        finally:
+            self._close_pack()
+            if processes_pool is not None:
+                processes_pool.shutdown()
+        report.skipped = report.docs - report.written
+        report.seconds = time.perf_counter() - t1
+        return report
+
+    def _write_batch(self, batch: list, cooked: list, threads_pool: ThreadPoolExecutor, drop_duplicates: bool) -> int:
+        """writes one batch of TextDepo.ingest and dumps the index, returns number of written texts"""
+        descriptors = []
+        jobs = []
+        seen = set()
+        for (text, meta), (text_hash, text_len, record, signature) in zip(batch, cooked):
+            if drop_duplicates and (text_hash in seen or text_hash in self.index):
+                continue
+            seen.add(text_hash)
+            descriptor = self.cook_descriptor(text, meta=meta, text_hash=text_hash, text_len=text_len)
+            if signature is not None:
+                descriptor.minhash = signature
+                self.lsh.insert(text_hash, signature)
+            if record is not None:
+                self._append_record(descriptor, record)
+            else:
+                jobs.append(threads_pool.submit(write_text_file,
+                                                self._descriptor_path(descriptor.as_dict()),
+                                                text,
+                                                self.encoding,
+                                                bool(descriptor.path)))
+            descriptors.append(descriptor)
+        for job in jobs:
+            job.result()
+        if self._pack_file is not None:
+            self._pack_file.flush()
+        for descriptor in descriptors:
+            self.index.set(descriptor.hash, descriptor.as_dict())
+        if descriptors:
+            self.index.dump()
+        return len(descriptors)
+
+    @property
+    def lsh(self) -> LSHIndex:
+        """LSH index of stored MinHash signatures, built on first use"""
+        if self._lsh is None:
+            self._lsh = LSHIndex(num_perm=self.num_perm, bands=self.lsh_bands)
+            for descriptor in self.index.values():
+                if signature := descriptor.get('minhash'):
+                    self._lsh.insert(descriptor['hash'], signature)
+        return self._lsh
+
+    def similar(self, text: str, threshold: Optional[float] = None) -> list:
+        """
+        Returns (similarity, descriptor) pairs of stored texts similar to the text, the most similar first.
+        Only texts stored with MinHash signatures are searched.
+        threshold defaults to the LSH index threshold (about 0.7 for the default 16 bands of 8 rows),
+        lower thresholds still find only the texts, which share an LSH band with the text.
+        """
+        validate_type(text, str, error_message=f'TextDepo can only compare type str.')
+        signature = minhash_signature(text, num_perm=self.num_perm)
+        return [(similarity, self.index.get(k)) for similarity, k in self.lsh.similar(signature, threshold)]
+
+    def _append_record(self, descriptor: FileDescriptor, record: bytes) -> None:
+        """appends compressed record to the current pack and notes its position in the descriptor"""
+        if self._pack_file is None:
+            self._pack_file = open(self._current_pack(), 'ab')
+        offset = self._pack_file.tell()
+        if offset and offset + len(record) > self.pack_size:
+            self._close_pack()
+            self._pack_file = open(self._current_pack(new=True), 'ab')
+            offset = 0
+        self._pack_file.write(record)
+        descriptor.pack = os.path.basename(self._pack_file.name)
+        descriptor.offset = offset
+        descriptor.size = len(record)
+
+    def _current_pack(self, new: bool = False) -> str:
+        """
+        Returns path of the current pack, or of the next one if new.
+        The depo directory is scanned for packs only once, then the pack number is kept on the instance.
+        """
+        prefix = self.file_name or ''
+        extension = PACK_EXTENSIONS[self.codec]
+        if self._pack_number is None:
+            numbers = [int(n) for f in os.listdir(self.dir_path)
+                       if f.startswith(prefix) and f.endswith(extension)
+                       and (n := f[len(prefix):-len(extension) - 1]).isdigit()]
+            self._pack_number = max(numbers, default=0)
+        self._pack_number += new
+        return os.path.join(self.dir_path, f'{prefix}{self._pack_number:05d}.{extension}')
+
+    def close(self) -> None:
+        """dumps the index and releases its files (the sqlite connection), called on leaving a with block"""
+        self._close_pack()
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _close_pack(self) -> None:
+        if self._pack_file is not None:
+            self._pack_file.close()
+            self._pack_file = None
+
+    def _descriptor_path(self, descriptor: dict) -> str:
+        return os.path.join(self.dir_path, descriptor.get('path') or descriptor['filename'])
+
+    def _relative_path(self, filename: str) -> str:
+        """path of the file relative to the depo directory, absolute paths must lie inside it"""
+        if not os.path.isabs(filename):
+            return os.path.normpath(filename)
+        relative = os.path.relpath(filename, self.dir_path)
+        if relative == os.curdir or relative.split(os.sep)[0] == os.pardir:
+            raise ValueError(f'file {filename} does not belong to {self}')
+        return relative
+
+    def _descriptor_by_path(self, relative: str) -> Optional[dict]:
+        """
+        Returns the descriptor of a file of the relative path or None.
+        Flat files are found by their filename, sharded files by the hash in their name.
+        """
+        if os.path.dirname(relative) == '':
+            if descriptor := self.index.by_filename(relative):
+                return descriptor
+        text_hash = os.path.splitext(os.path.basename(relative))[0]
+        descriptor = self.index.get(text_hash)
+        if descriptor and descriptor.get('path') and os.path.normpath(descriptor['path']) == relative:
+            return descriptor
+        return None
+
+    def _read_path(self, file_path: str) -> str:
+        with open(file_path, 'r', encoding=self.encoding) as file:
+            return file.read()
+
+    def _read_descriptor(self, descriptor: dict, packs: Optional[dict] = None) -> str:
+        """
+        Reads the text described by the index descriptor.
+        packs is an optional dict of open pack files, that will be reused and filled.
+        """
+        if not descriptor.get('pack'):
+            return self._read_path(self._descriptor_path(descriptor))
+        pack = descriptor['pack']
+        codec = next(c for c, ext in PACK_EXTENSIONS.items() if pack.endswith(ext))
+        if packs is None:
+            with open(os.path.join(self.dir_path, pack), 'rb') as f:
+                f.seek(descriptor['offset'])
+                record = f.read(descriptor['size'])
+        else:
+            if pack not in packs:
+                packs[pack] = open(os.path.join(self.dir_path, pack), 'rb')
+            packs[pack].seek(descriptor['offset'])
+            record = packs[pack].read(descriptor['size'])
+        return decompress(record, codec).decode(self.encoding)
 
     def read(self,
              filename: Optional[str] = None,
-             condition: Optional[Union[Callable, str]] = None) -> Union[str, NoReturn]:
-        if not (filename or condition):
-            raise ValueError('Expected one of arguments: filename or condition')
-
-        if filename:
-            if os.path.isfile(filename):
-                if os.path.dirname(filename) == self.dir_path:
-                    file_path = filename
-                else:
-                    raise ValueError(f'file {filename} does not belong to {self}')
-            elif os.path.isfile(f := os.path.join(self.dir_path, filename)):
-                file_path = f
-            else:
-                raise FileNotFoundError(f'{filename}')
-            with open(file_path, 'r', encoding=self.encoding) as file:
-                return file.read()
+             condition: Optional[Union[Callable, str]] = None,
+             text_hash: Optional[str] = None) -> Union[str, NoReturn]:
+        if not (filename or condition or text_hash):
+            raise ValueError('Expected one of arguments: filename, condition or text_hash')
+
+        if text_hash:
+            if descriptor := self.index.get(text_hash):
+                return self._read_descriptor(descriptor)
+            raise KeyError(f'{text_hash} not in {self}')
+        elif filename:
+            relative = self._relative_path(filename)
+            if descriptor := self._descriptor_by_path(relative):
+                return self._read_descriptor(descriptor)
+            elif os.path.isfile(file_path := os.path.join(self.dir_path, relative)):
+                return self._read_path(file_path)
+            raise FileNotFoundError(f'{filename}')
         else:
-            files = os.listdir(self.dir_path)
-            files = [f for f in files if f.endswith('txt') and conditional_check(condition, f)]
-            if files:
-                return self.read(filename=files[0])
-            else:
-                return None
-
-    def read_many(self, condition: Union[Callable, str]) -> Generator:
-        files = os.listdir(self.dir_path)
-        files = (f for f in files if f.endswith('txt') and conditional_check(condition, f))
-        for filename in files:
-            yield self.read(filename=filename)
+            for descriptor in self._matching(condition):
+                return self._read_descriptor(descriptor)
+            return None
+
+    def read_many(self,
+                  condition: Optional[Union[Callable, str]] = None,
+                  where: Optional[dict] = None,
+                  time_range: Optional[tuple] = None) -> Generator:
+        """
+        Yields texts meeting all the passed conditions:
+        condition - str contained in the file name or Callable accepting the file name and returning bool
+        where - dict of meta keys and required values. A list, tuple or set value means: one of.
+        time_range - tuple of (start, stop) times in the descriptor time format ('%Y%m%dT%X'),
+            start is inclusive, stop is exclusive, any can be None.
+        """
+        packs = dict()
+        try:
+            for descriptor in self._matching(condition, where=where, time_range=time_range):
+                yield self._read_descriptor(descriptor, packs=packs)
+        finally:
+            for f in packs.values():
+                f.close()
+
+    def _matching(self,
+                  condition: Optional[Union[Callable, str]],
+                  where: Optional[dict] = None,
+                  time_range: Optional[tuple] = None) -> Generator:
+        """yields descriptors of indexed files, which meet the conditions"""
+        descriptors = self.index.query(where=where, time_range=time_range)
+        if condition is None:
+            return descriptors
+        return (d for d in descriptors if conditional_check(condition, d['filename']))
 
     def __repr__(self):
         return f'<TextDepo dir: {self.dir_path}, len={len(self.index)}>'
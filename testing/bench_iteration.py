@@ -0,0 +1,194 @@
+"""
+iteration benchmarks on deep and wide inputs.
+
+Run: python -m ptbutil.testing.bench_iteration
+legacy_flatlist reproduces the recursive flatlist from before iflatten.
+It hits the recursion limit on DEEP, so deep inputs are timed with the iterative functions only.
+legacy_each_with_each reproduces the recursive each_with_each from before CartesianProduct.
+legacy_merge_2_dicts reproduces the recursive merge_2_dicts from before deep_merge.
+"""
+
+from collections.abc import Generator
+from itertools import product
+import numpy as np
+from ptbutil.iteration import CartesianProduct, deep_merge, each_with_each, flatlist, iflatten, nesting, zipeven
+from ptbutil.time.timing import perf_pool
+
+
+DEPTH = 100000
+
+
+def make_deep(depth=DEPTH):
+    deep = [0]
+    for i in range(depth):
+        deep = [deep, i]
+    return deep
+
+
+WIDE = [[[i, i + 1, (i, i)] for i in range(100)] for _ in range(2000)]
+DEEP = make_deep()
+GRID = np.random.default_rng(0).random((200, 100, 50))
+GRID_LISTS = GRID.tolist()
+POOLS = (range(100), range(100), range(10), range(20))
+ZIP_LENGTH = 10 ** 6
+
+
+def make_tree(width=1000, leaves=1000, offset=0):
+    return {f'k{i}': {f'j{j}': {'v': j, 's': {j}} for j in range(offset, offset + leaves)} for i in range(width)}
+
+
+TREE_A = make_tree()
+TREE_B = make_tree(offset=500)
+
+
+def legacy_flatlist(l) -> list:
+    items = []
+    for item in l:
+        if isinstance(item, (tuple, list, set, Generator, map)):
+            items += legacy_flatlist(item)
+        else:
+            items.append(item)
+    return items
+
+
+def legacy_each_with_each(*iterables):
+    if len(iterables) == 1:
+        return ((i,) for i in iterables[0])
+    first = iterables[0]
+    rest = iterables[1:]
+    return (tuple((i, *j)) for i in first for j in legacy_each_with_each(*rest))
+
+
+def legacy_merge_2_dicts(a: dict, b: dict, keep='a'):
+    for key in b.keys():
+        if key in a.keys():
+            if isinstance(a[key], dict) and isinstance(b[key], dict):
+                legacy_merge_2_dicts(a[key], b[key])
+            elif a[key] == b[key]:
+                pass
+            else:
+                if keep == 'a':
+                    pass
+                else:
+                    a[key] = b[key]
+        else:
+            a[key] = b[key]
+    return a
+
+
+def run_flatten_wide():
+    def iflatten_list(l):
+        return list(iflatten(l))
+
+    perf_pool.reset()
+    perf_pool.iterations = 5
+    perf_pool.register(legacy_flatlist)
+    perf_pool.register(flatlist)
+    perf_pool.register(iflatten_list)
+    print(f'flatten wide: {len(flatlist(WIDE))} elements')
+    perf_pool.run(WIDE)
+
+
+def run_flatten_deep():
+    perf_pool.reset()
+    perf_pool.iterations = 5
+    perf_pool.register(flatlist)
+    print(f'flatten deep: {DEPTH} levels')
+    perf_pool.run(DEEP)
+
+
+def run_nesting():
+    def nesting_lists(_):
+        return nesting(GRID_LISTS)
+
+    def nesting_array(_):
+        return nesting(GRID)
+
+    perf_pool.reset()
+    perf_pool.iterations = 5
+    perf_pool.register(nesting_lists)
+    perf_pool.register(nesting_array)
+    print(f'nesting: {GRID.shape} as nested lists and as ndarray')
+    perf_pool.run(None)
+
+
+def run_product():
+    def legacy_product(pools):
+        for _ in legacy_each_with_each(*pools):
+            pass
+
+    def itertools_product(pools):
+        for _ in product(*pools):
+            pass
+
+    def each_with_each_product(pools):
+        for _ in each_with_each(*pools):
+            pass
+
+    def array_chunks(pools):
+        for _ in CartesianProduct(*pools).arrays():
+            pass
+
+    perf_pool.reset()
+    perf_pool.iterations = 3
+    perf_pool.register(legacy_product)
+    perf_pool.register(itertools_product)
+    perf_pool.register(each_with_each_product)
+    perf_pool.register(array_chunks)
+    print(f'product: {len(CartesianProduct(*POOLS))} combinations')
+    perf_pool.run(POOLS)
+
+
+def run_zip():
+    def plain_zip(n):
+        for _ in zip((i for i in range(n)), (i for i in range(n))):
+            pass
+
+    def zipeven_generators(n):
+        for _ in zipeven((i for i in range(n)), (i for i in range(n))):
+            pass
+
+    def zipeven_sized(n):
+        for _ in zipeven(range(n), range(n)):
+            pass
+
+    perf_pool.reset()
+    perf_pool.iterations = 5
+    perf_pool.register(plain_zip)
+    perf_pool.register(zipeven_generators)
+    perf_pool.register(zipeven_sized)
+    print(f'zip: {ZIP_LENGTH} pairs')
+    perf_pool.run(ZIP_LENGTH)
+
+
+def run_merge():
+    def legacy_merge(a, b):
+        return legacy_merge_2_dicts(a, b)
+
+    def deep_merge_in_place(a, b):
+        return deep_merge(a, b)
+
+    def deep_merge_copy(a, b):
+        return deep_merge(a, b, copy=True)
+
+    def deep_merge_union_copy(a, b):
+        return deep_merge(a, b, resolver='union', copy=True)
+
+    # in place merges run after copy merges, so all of them merge the same trees
+    perf_pool.reset()
+    perf_pool.iterations = 3
+    perf_pool.register(deep_merge_copy)
+    perf_pool.register(deep_merge_union_copy)
+    perf_pool.register(legacy_merge)
+    perf_pool.register(deep_merge_in_place)
+    print(f'merge: {len(TREE_A)} x {len(TREE_A["k0"])} x 2 leaves trees with half of the paths in common')
+    perf_pool.run(TREE_A, TREE_B)
+
+
+if __name__ == '__main__':
+    run_flatten_wide()
+    run_flatten_deep()
+    run_nesting()
+    run_product()
+    run_zip()
+    run_merge()
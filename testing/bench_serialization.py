@@ -0,0 +1,99 @@
+"""
+ptbserialization benchmarks on large nested payloads.
+
+Run: python -m ptbutil.testing.bench_serialization
+Legacy functions reproduce the isinstance-chain preprocessing and the second decoding pass
+of the ptbserialization before compiled plans and object_hook decoding.
+"""
+
+import json
+from collections.abc import Mapping
+from datetime import datetime
+from ptbutil.ptbserialization import (PtbSerializable, PtbSerialisationDecoder, ptbs_preprocess, preprocess_foreign,
+                                      serialize, deserialize, serialize_binary, deserialize_binary, msgpack,
+                                      TYPE_ANNOTATION_KEY, INIT_ANNOTATION_KEY, ATTRS_ANNOTATION_KEY)
+from ptbutil.time.timing import perf_pool
+
+
+@PtbSerializable.register
+class Node:
+    def __init__(self, name, value=None):
+        self.name = name
+        self.value = value
+
+    def serialization_init_params(self):
+        return {'*': [self.name], '**': {'value': self.value}}
+
+    def serialization_instance_attrs(self):
+        return {'children': getattr(self, 'children', [])}
+
+
+def make_payload(width=20, depth=3):
+    def node(level, n):
+        nd = Node(f'n{level}_{n}', value={'stamp': datetime(2024, 1, 1), 'scores': list(range(10))})
+        nd.children = [node(level + 1, i) for i in range(width)] if level < depth else []
+        return nd
+    return {'root': node(0, 0), 'rows': [{'a': i, 'b': [i, str(i), (i, i)]} for i in range(20000)]}
+
+
+def legacy_preprocess(obj):
+    if isinstance(obj, PtbSerializable):
+        return {TYPE_ANNOTATION_KEY: obj.__class__.__name__,
+                INIT_ANNOTATION_KEY: legacy_preprocess(obj.serialization_init_params()),
+                ATTRS_ANNOTATION_KEY: legacy_preprocess(obj.serialization_instance_attrs())}
+    elif PtbSerializable.FOREIGN_SERIALIZABLE_REGISTRY.get(type(obj).__name__):
+        return preprocess_foreign(obj)
+    elif isinstance(obj, Mapping):
+        return {k: legacy_preprocess(v) for k, v in obj.items()}
+    elif isinstance(obj, (list, tuple)):
+        return [legacy_preprocess(member) for member in obj]
+    else:
+        return obj
+
+
+def legacy_deserialize(s):
+    return PtbSerialisationDecoder().decode_dispatch(json.loads(s))
+
+
+PAYLOAD = make_payload()
+SERIALIZED = serialize(PAYLOAD)
+
+
+def run_preprocess():
+    perf_pool.reset()
+    perf_pool.iterations = 5
+    perf_pool.register(legacy_preprocess)
+    perf_pool.register(ptbs_preprocess)
+    print(f'preprocess: {len(SERIALIZED)} characters payload')
+    perf_pool.run(PAYLOAD)
+
+
+def run_decode():
+    perf_pool.reset()
+    perf_pool.iterations = 5
+    perf_pool.register(legacy_deserialize)
+    perf_pool.register(deserialize)
+    print(f'deserialize: {len(SERIALIZED)} characters payload')
+    perf_pool.run(SERIALIZED)
+
+
+def run_binary():
+    def json_roundtrip(payload):
+        return deserialize(serialize(payload))
+
+    def binary_roundtrip(payload):
+        return deserialize_binary(serialize_binary(payload))
+
+    perf_pool.reset()
+    perf_pool.iterations = 5
+    perf_pool.register(json_roundtrip)
+    perf_pool.register(binary_roundtrip)
+    print(f'roundtrip: json {len(SERIALIZED)} characters, '
+          f'binary {len(serialize_binary(PAYLOAD))} bytes, packer: {msgpack.__name__}')
+    perf_pool.run(PAYLOAD)
+
+
+if __name__ == '__main__':
+    run_preprocess()
+    run_decode()
+    run_binary()
@@ -0,0 +1,126 @@
+import unittest
+import random
+from copy import deepcopy
+from ptbutil.iteration.dictwise import deep_merge, merge_2_dicts, RESOLVERS
+
+
+def legacy_merge_2_dicts(a: dict, b: dict, keep='a'):
+    """recursive merge_2_dicts from before deep_merge, keep does not reach nested levels"""
+    for key in b.keys():
+        if key in a.keys():
+            if isinstance(a[key], dict) and isinstance(b[key], dict):
+                legacy_merge_2_dicts(a[key], b[key])
+            elif a[key] == b[key]:
+                pass
+            else:
+                if keep == 'a':
+                    pass
+                else:
+                    a[key] = b[key]
+        else:
+            a[key] = b[key]
+    return a
+
+
+def recursive_merge(a: dict, b: dict, resolver) -> dict:
+    """new dict merged recursively, for reference"""
+    merged = dict(a)
+    for key, value in b.items():
+        if key not in merged:
+            merged[key] = value
+        elif isinstance(merged[key], dict) and isinstance(value, dict):
+            merged[key] = recursive_merge(merged[key], value, resolver)
+        else:
+            merged[key] = resolver(merged[key], value)
+    return merged
+
+
+def random_tree(rng: random.Random, leaves: str, depth: int = 3) -> dict:
+    """
+    nested dict with keys drawn from a small alphabet, so random trees collide.
+    Keys starting with d hold dicts, the other ones hold leaves of a type given by the first letter:
+    n - int, l - list, s - set
+    """
+    tree = {}
+    for _ in range(rng.randint(0, 4)):
+        kind = rng.choice('d' + leaves) if depth else rng.choice(leaves)
+        key = f'{kind}{rng.randint(0, 2)}'
+        if kind == 'd':
+            tree[key] = random_tree(rng, leaves, depth - 1)
+        elif kind == 'n':
+            tree[key] = rng.randint(0, 3)
+        elif kind == 'l':
+            tree[key] = [rng.randint(0, 3) for _ in range(rng.randint(0, 3))]
+        else:
+            tree[key] = {rng.randint(0, 3) for _ in range(rng.randint(0, 3))}
+    return tree
+
+
+class TestDeepMerge(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = random.Random(0)
+
+    def test_resolvers_with_copy(self):
+        leaves = {'a': 'nls', 'b': 'nls', 'union': 'ls', 'sum': 'nl'}
+        for resolver, resolve in RESOLVERS.items():
+            for _ in range(300):
+                a, b = random_tree(self.rng, leaves[resolver]), random_tree(self.rng, leaves[resolver])
+                a_before, b_before = deepcopy(a), deepcopy(b)
+                merged = deep_merge(a, b, resolver=resolver, copy=True)
+                self.assertEqual(merged, recursive_merge(a_before, b_before, resolve))
+                self.assertEqual((a, b), (a_before, b_before))
+
+    def test_in_place(self):
+        for _ in range(300):
+            a, b = random_tree(self.rng, 'nls'), random_tree(self.rng, 'nls')
+            expected = recursive_merge(deepcopy(a), b, RESOLVERS['b'])
+            self.assertIs(deep_merge(a, b, resolver='b'), a)
+            self.assertEqual(a, expected)
+
+    def test_merge_2_dicts_against_legacy(self):
+        for _ in range(300):
+            a, b = random_tree(self.rng, 'nls'), random_tree(self.rng, 'nls')
+            self.assertEqual(merge_2_dicts(deepcopy(a), deepcopy(b)), legacy_merge_2_dicts(deepcopy(a), deepcopy(b)))
+            # keep='b' reaches nested levels now, the legacy merge applied it at the top level only
+            self.assertEqual(merge_2_dicts(deepcopy(a), deepcopy(b), keep='b'),
+                             recursive_merge(a, b, RESOLVERS['b']))
+
+    def test_copy_on_write_shares_untouched_subtrees(self):
+        a = {'x': {'p': 1, 'q': {'r': 2}}, 'y': {'s': 3}}
+        b = {'x': {'p': 5, 't': 6}, 'z': {'u': 7}}
+        merged = deep_merge(a, b, resolver='b', copy=True)
+        self.assertEqual(merged, {'x': {'p': 5, 'q': {'r': 2}, 't': 6}, 'y': {'s': 3}, 'z': {'u': 7}})
+        self.assertIsNot(merged['x'], a['x'])
+        self.assertIs(merged['x']['q'], a['x']['q'])
+        self.assertIs(merged['y'], a['y'])
+        self.assertIs(merged['z'], b['z'])
+
+    def test_callable_and_invalid_resolvers(self):
+        merged = deep_merge({'k': {'v': 2}}, {'k': {'v': 3}}, resolver=max, copy=True)
+        self.assertEqual(merged, {'k': {'v': 3}})
+        self.assertEqual(deep_merge({'k': (1, 2)}, {'k': (2, 3)}, resolver='union'), {'k': (1, 2, 3)})
+        self.assertEqual(deep_merge({'k': 1}, {'k': 1}, resolver='union'), {'k': 1})
+        with self.assertRaises(TypeError):
+            deep_merge({'k': 1}, {'k': 2}, resolver='union')
+        with self.assertRaises(ValueError):
+            deep_merge({}, {}, resolver='first')
+        with self.assertRaises(TypeError):
+            deep_merge({}, {}, resolver=1)
+
+    def test_deep_trees(self):
+        a, b = {}, {}
+        node_a, node_b = a, b
+        for i in range(5000):
+            node_a['k'], node_b['k'] = {'a': i}, {'b': i}
+            node_a, node_b = node_a['k'], node_b['k']
+        merged = deep_merge(a, b, copy=True)
+        node = merged
+        for i in range(5000):
+            node = node['k']
+            self.assertEqual((node['a'], node['b']), (i, i))
+        self.assertNotIn('b', a['k'])
+
+
+if __name__ == '__main__':
+    unittest.main()
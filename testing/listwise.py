@@ -0,0 +1,663 @@
+import unittest
+import json
+import os
+import random
+import tempfile
+from collections import Counter, deque
+from collections.abc import Generator
+from itertools import product, count, islice
+from concurrent.futures import ProcessPoolExecutor
+import array
+import pickle
+from unittest import mock
+import numpy as np
+from ptbutil.iteration import listwise
+from ptbutil.iteration.listwise import (ngrams, ngram_array, ngram_counts, ngram_counts_stream, GridFeed, iflatten,
+                                        flatlist, Nesting, nesting, UnevenNestingError, split_bounds, lchunks, nchunks,
+                                        SharedSplitter, Stack, NumericStack, bool_mask, apply_mask, apply_mask_many,
+                                        sequence_binary_mask, ifish, indmap, indmap_array, CartesianProduct,
+                                        each_with_each)
+
+
+def brute_ngram_counts(tokens: list, n: int, pad=None) -> Counter:
+    if pad is None:
+        return Counter(tuple(tokens[i: i + n]) for i in range(len(tokens) - n + 1))
+    return Counter(tuple(pad if t is None else t for t in gram) for gram in ngrams(tokens, n))
+
+
+def as_counter(grams: np.ndarray, counts: np.ndarray) -> Counter:
+    return Counter({tuple(gram): count for gram, count in zip(grams.tolist(), counts.tolist())})
+
+
+def random_chunks(rng: random.Random, tokens: list) -> list:
+    bounds = sorted(rng.randint(0, len(tokens)) for _ in range(rng.randint(0, 6)))
+    return [np.array(tokens[a:b], dtype=np.int64) for a, b in zip([0, *bounds], [*bounds, len(tokens)])]
+
+
+def legacy_flatlist(l) -> list:
+    """recursive flatlist from before iflatten"""
+    items = []
+    for item in l:
+        if isinstance(item, (tuple, list, set, Generator, map)):
+            items += legacy_flatlist(item)
+        else:
+            items.append(item)
+    return items
+
+
+class LegacyNesting(Nesting):
+    """recursive Nesting._nesting from before the explicit stack walk"""
+
+    def _nesting(self, iterables, _n=0) -> int:
+        if self.nested_type:
+            if self._check_nested_type(type(iterables)):
+                return _n
+            elif self._check_nesting_type(type(iterables)):
+                if all(self._check_nested_type(type(token)) for token in iterables):
+                    return _n + 1
+                inner_types = {type(token) for token in iterables}
+                if len(inner_types) == 1:
+                    type_ = inner_types.pop()
+                    if self._check_nesting_type(type_):
+                        nestings_ = {self._nesting(token, _n=_n + 1) for token in iterables}
+                        if len(nestings_) > 1:
+                            raise UnevenNestingError('Uneven _nesting. Check data')
+                        return nestings_.pop()
+                    raise TypeError(f'Found {type_} type')
+                raise UnevenNestingError(f'Types {inner_types} have been found at the same level.')
+            raise TypeError(f'Unresolved type {type(iterables)}.')
+        if self._check_nesting_type(type(iterables)):
+            if all(not self._check_nesting_type(type(token)) for token in iterables):
+                return _n + 1
+            inner_types = {type(token) for token in iterables}
+            if len(inner_types) == 1:
+                type_ = inner_types.pop()
+                if self._check_nesting_type(type_):
+                    nestings_ = {self._nesting(token, _n=_n + 1) for token in iterables}
+                    if len(nestings_) > 1:
+                        raise UnevenNestingError('Uneven _nesting. Check data')
+                    return nestings_.pop()
+                raise TypeError(f'Found {type_} type.')
+            raise UnevenNestingError(f'Types {inner_types} have been found at the same level.')
+        self.nested_type = [type(iterables)]
+        self._nested_types = {type(iterables)}
+        return _n
+
+
+def legacy_sequence_binary_mask(sequence, binary_mask: int = 0):
+    """sequence_binary_mask from before bool_mask"""
+    for ind in range(len(sequence)):
+        if binary_mask >> ind & 1:
+            yield sequence[ind]
+
+
+def legacy_ifish(it, indexes) -> list:
+    """ifish from before set lookups and direct indexing"""
+    return [e for n, e in enumerate(it) if n in indexes]
+
+
+def legacy_indmap(fn, sequence, indices=None):
+    """indmap from before set lookups"""
+    if not indices:
+        yield from sequence
+        return
+    for ind in range(len(sequence)):
+        yield fn(sequence[ind]) if ind in indices else sequence[ind]
+
+
+def legacy_each_with_each(*iterables):
+    """recursive each_with_each from before CartesianProduct"""
+    if len(iterables) == 1:
+        return ((i,) for i in iterables[0])
+    first = iterables[0]
+    rest = iterables[1:]
+    return (tuple((i, *j)) for i in first for j in legacy_each_with_each(*rest))
+
+
+def random_nested(rng: random.Random, depth: int):
+    """nested lists and tuples of ints and strings, unevenly nested now and then"""
+    if depth == 0 or rng.random() < 0.05:
+        return rng.choice([rng.randint(0, 9), 'ab', 1.5])
+    container = rng.choice([list, list, tuple])
+    return container(random_nested(rng, depth - 1) for _ in range(rng.randint(0, 3)))
+
+
+def outcome(fn, *args, **kwargs):
+    try:
+        return fn(*args, **kwargs)
+    except (TypeError, UnevenNestingError) as e:
+        return type(e)
+
+
+class TestNgrams(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = random.Random(0)
+
+    def test_ngram_array(self):
+        tokens = np.arange(5)
+        self.assertEqual(ngram_array(tokens, 2).tolist(), [[0, 1], [1, 2], [2, 3], [3, 4]])
+        self.assertEqual(ngram_array(tokens, 3, pad=9).tolist()[:2], [[9, 9, 0], [9, 0, 1]])
+        self.assertEqual(ngram_array(tokens, 6).shape, (0, 6))
+
+    def test_counts_against_counter(self):
+        for _ in range(200):
+            vocab_size = self.rng.randint(1, 6)
+            tokens = [self.rng.randrange(vocab_size) for _ in range(self.rng.randint(0, 30))]
+            pad = self.rng.choice([None, 0, vocab_size - 1])
+            counts = ngram_counts(tokens, n=(1, 2, 3), pad=pad)
+            for n in (1, 2, 3):
+                self.assertEqual(as_counter(*counts[n]), brute_ngram_counts(tokens, n, pad))
+
+    def test_stream_crossing_chunk_borders(self):
+        for _ in range(300):
+            vocab_size = self.rng.randint(1, 6)
+            tokens = [self.rng.randrange(vocab_size) for _ in range(self.rng.randint(0, 30))]
+            pad = self.rng.choice([None, 0, vocab_size - 1])
+            chunks = random_chunks(self.rng, tokens)
+            counts = ngram_counts_stream(chunks, n=(1, 2, 4), vocab_size=vocab_size, pad=pad)
+            for n in (1, 2, 4):
+                self.assertEqual(as_counter(*counts[n]), brute_ngram_counts(tokens, n, pad))
+
+    def test_stream_buffered_merges(self):
+        tokens = [self.rng.randrange(50) for _ in range(3000)]
+        chunks = random_chunks(self.rng, tokens) + [np.array(tokens[i: i + 7]) for i in range(0, 3000, 7)]
+        with mock.patch.object(listwise, 'NGRAM_MERGE_BUFFER', 16):
+            counts = ngram_counts_stream(chunks, n=(2, 3), vocab_size=50)
+        for n in (2, 3):  # the stream is tokens twice
+            self.assertEqual(as_counter(*counts[n]), brute_ngram_counts(tokens + tokens, n))
+
+    def test_out_of_vocabulary_ids(self):
+        with self.assertRaises(ValueError):
+            ngram_counts_stream([np.array([0, 5, 1, 0, 5, 1])], n=2, vocab_size=3)
+        with self.assertRaises(ValueError):
+            ngram_counts_stream([np.array([0, 1]), np.array([-1])], n=2, vocab_size=3)
+        with self.assertRaises(ValueError):
+            ngram_counts_stream([np.array([0, 1])], n=2, vocab_size=3, pad=3)
+        with self.assertRaises(ValueError):
+            ngram_counts([0, -1, 2], n=2)
+
+    def test_unpackable_ngrams(self):
+        tokens = [0, 2 ** 40, 1, 0, 2 ** 40, 1]
+        grams, counts = ngram_counts(tokens, n=2)[2]
+        self.assertEqual(as_counter(grams, counts), brute_ngram_counts(tokens, 2))
+
+
+def grid_combinations(grid: dict) -> list:
+    return [dict(zip(grid, values)) for values in product(*grid.values())]
+
+
+def grid_fn(a, b):
+    return a * 10 + b
+
+
+def chunk_sum(chunk) -> float:
+    with chunk as view:
+        return float(view.sum())
+
+
+class TestGridFeed(unittest.TestCase):
+
+    def setUp(self):
+        self.grid = {'a': [1, 2, 3], 'b': 'xy', 'c': (None, 0.5), 'd': range(4)}
+        self.combinations = grid_combinations(self.grid)
+
+    def test_iteration_and_indexing(self):
+        feed = GridFeed(self.grid)
+        self.assertEqual(len(feed), 48)
+        self.assertEqual(list(feed), self.combinations)
+        self.assertEqual(list(feed.combinations), self.combinations)
+        self.assertEqual([feed[i] for i in range(-48, 48)], self.combinations * 2)
+        with self.assertRaises(IndexError):
+            feed[48]
+        with self.assertRaises(TypeError):
+            feed['a']
+        with self.assertRaises(TypeError):
+            GridFeed([1, 2])
+
+    def test_slicing(self):
+        feed = GridFeed(self.grid)
+        for item in (slice(5, 20), slice(None, None, -3), slice(-7, None), slice(40, 3, -5), slice(50, 60)):
+            view = feed[item]
+            self.assertIsInstance(view, GridFeed)
+            self.assertEqual(list(view), self.combinations[item])
+            self.assertEqual(len(view), len(self.combinations[item]))
+        view = feed[3:40][::2][1:]
+        self.assertEqual(list(view), self.combinations[3:40][::2][1:])
+        self.assertEqual(view[-1], self.combinations[3:40][::2][-1])
+
+    def test_partition(self):
+        feed = GridFeed(self.grid)
+        for n_workers in (1, 5, 48, 60):
+            parts = [feed.partition(n_workers, worker_id) for worker_id in range(n_workers)]
+            lengths = [len(part) for part in parts]
+            self.assertLessEqual(max(lengths) - min(lengths), 1)
+            indices = sorted(i for part in parts for i in part.indices)
+            self.assertEqual(indices, list(range(48)))
+            self.assertEqual(sorted(map(repr, (c for part in parts for c in part))),
+                             sorted(map(repr, self.combinations)))
+        with self.assertRaises(ValueError):
+            feed.partition(3, 3)
+
+    def test_map(self):
+        feed = GridFeed({'a': range(5), 'b': range(4)})
+        expected = {i: c['a'] * 10 + c['b'] for i, c in enumerate(feed)}
+        for executor in (None, 'thread', 'process'):
+            results = list(feed.map(grid_fn, executor=executor, max_workers=2, chunksize=3))
+            self.assertEqual({r.index: r.result for r in results}, expected)
+            self.assertTrue(all(r.params == feed[r.index] and r.seconds >= 0 for r in results))
+        self.assertEqual([r.index for r in feed[5::4].map(grid_fn, executor=None)], [5, 9, 13, 17])
+        with self.assertRaises(ValueError):
+            next(feed.map(grid_fn, executor='cluster'))
+        with self.assertRaises(ValueError):
+            next(feed.map(grid_fn, chunksize=0))
+
+    def test_map_stop(self):
+        feed = GridFeed({'a': range(5), 'b': range(4)})
+        results = list(feed.map(grid_fn, executor=None, chunksize=4, stop=lambda r: r.result == 12))
+        self.assertEqual([r.index for r in results], list(range(7)))
+        results = list(feed.map(grid_fn, executor='thread', max_workers=2, stop=lambda r: r.result >= 30))
+        self.assertEqual(sum(r.result >= 30 for r in results), 1)
+        self.assertGreaterEqual(results[-1].result, 30)
+
+    def test_map_checkpoint_and_resume(self):
+        feed = GridFeed({'a': range(5), 'b': range(4)})
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = os.path.join(directory, 'grid.json')
+            first = list(feed.map(grid_fn, executor=None, chunksize=3, checkpoint=checkpoint,
+                                  stop=lambda r: r.index == 7))
+            with open(checkpoint) as f:
+                self.assertEqual(json.load(f)['results'], {str(r.index): r.result for r in first})
+            second = list(feed.map(grid_fn, executor='thread', max_workers=2, checkpoint=checkpoint))
+            self.assertEqual(sorted(r.index for r in second), list(range(8, 20)))
+            with open(checkpoint) as f:
+                stored = json.load(f)['results']
+            self.assertEqual(stored, {str(i): c['a'] * 10 + c['b'] for i, c in enumerate(feed)})
+            self.assertEqual(list(feed.map(grid_fn, executor=None, checkpoint=checkpoint)), [])
+            self.assertEqual(os.listdir(directory), ['grid.json'])
+            os.remove(checkpoint)
+            results = feed.map(grid_fn, executor=None, checkpoint=checkpoint)
+            next(results)
+            results.close()  # an abandoned run records what it yielded
+            with open(checkpoint) as f:
+                self.assertEqual(json.load(f)['results'], {'0': 0})
+
+    def test_empty_collection(self):
+        feed = GridFeed({'a': [1, 2], 'b': []})
+        self.assertEqual(len(feed), 0)
+        self.assertEqual(list(feed), [])
+
+
+class TestFlattenAndNesting(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = random.Random(0)
+
+    def test_flatten_against_legacy(self):
+        for _ in range(500):
+            data = [random_nested(self.rng, self.rng.randint(0, 5)) for _ in range(3)]
+            self.assertEqual(flatlist(data), legacy_flatlist(data))
+            self.assertEqual(list(iflatten(data)), legacy_flatlist(data))
+
+    def test_flatten_iterators_and_arrays(self):
+        data = [(i for i in range(3)), map(str, [1, 2]), {7}, [[], [[8]]], 'ab', {'k': 1}]
+        self.assertEqual(list(iflatten(data)), [0, 1, 2, '1', '2', 7, 8, 'ab', {'k': 1}])
+        array = np.arange(6).reshape(2, 3)
+        self.assertEqual(list(iflatten([array, [array[0]]])), [0, 1, 2, 3, 4, 5, 0, 1, 2])
+        self.assertEqual(list(iflatten(array)), list(range(6)))
+        flat = flatlist([array, [1]])
+        self.assertIs(flat[0], array)
+        self.assertEqual(flat[1:], [1])
+
+    def test_flatten_deep(self):
+        deep = [0]
+        for i in range(100000):
+            deep = [deep, i]
+        self.assertEqual(flatlist(deep), [0, *range(100000)])
+
+    def test_nesting_against_legacy(self):
+        for _ in range(2000):
+            data = random_nested(self.rng, self.rng.randint(0, 5))
+            self.assertEqual(outcome(nesting, data), outcome(lambda d: LegacyNesting(d).nesting, data), data)
+            self.assertEqual(outcome(nesting, data, nested_type=(int, str, float)),
+                             outcome(lambda d: LegacyNesting(d, nested_type=(int, str, float)).nesting, data),
+                             data)
+
+    def test_nesting(self):
+        self.assertEqual(nesting([[1, 2], [3, 4]]), 2)
+        self.assertEqual(nesting([['ab', 'cd'], ['ef']]), 2)
+        self.assertEqual(nesting(5), 0)
+        self.assertEqual(nesting([]), 1)
+        self.assertEqual(nesting(np.zeros((2, 3, 4))), 3)
+        self.assertEqual(nesting(np.zeros((2, 0, 4))), 2)
+        self.assertEqual(nesting(np.zeros((2, 3, 4))), nesting(np.zeros((2, 3, 4)).tolist()))
+        with self.assertRaises(UnevenNestingError):
+            nesting([[1, 2], [[3]]])
+        with self.assertRaises(UnevenNestingError):
+            nesting([[1], (2,)])
+        with self.assertRaises(TypeError):
+            nesting([[1]], nested_type=str, nesting_type=list)
+
+    def test_nesting_deep(self):
+        deep = [1]
+        for _ in range(5000):
+            deep = [deep]
+        self.assertEqual(nesting(deep), 5001)
+
+
+class TestChunks(unittest.TestCase):
+
+    def test_split_bounds(self):
+        for length in range(0, 30):
+            for n in range(1, 12):
+                bounds = split_bounds(length, n)
+                sizes = [stop - start for start, stop in bounds]
+                self.assertEqual(len(bounds), n)
+                self.assertEqual([stop for _, stop in bounds[:-1]], [start for start, _ in bounds[1:]])
+                self.assertEqual((bounds[0][0], bounds[-1][1]), (0, length))
+                self.assertLessEqual(max(sizes) - min(sizes), 1)
+        with self.assertRaises(ValueError):
+            split_bounds(10, 0)
+
+    def test_lchunks(self):
+        data = list(range(23))
+        expected = [data[i: i + 5] for i in range(0, 23, 5)]
+        self.assertEqual(list(lchunks(data, 5)), expected)
+        self.assertEqual([list(chunk) for chunk in lchunks(iter(data), 5)], expected)
+        self.assertEqual([list(chunk) for chunk in lchunks(range(23), 5)], expected)
+        self.assertEqual([chunk.tolist() for chunk in lchunks(bytes(data), 5)], expected)
+        self.assertEqual([chunk.tolist() for chunk in lchunks(array.array('i', data), 5)], expected)
+        self.assertEqual(list(lchunks([], 5)), [])
+        with self.assertRaises(ValueError):
+            next(lchunks(data, 0))
+
+    def test_chunks_are_views(self):
+        values = np.arange(23)
+        for chunk in lchunks(values, 5):
+            self.assertTrue(np.shares_memory(chunk, values))
+        buffer = bytearray(range(23))
+        chunks = nchunks(buffer, 4)
+        self.assertTrue(all(isinstance(chunk, memoryview) for chunk in chunks))
+        chunks[1][0] = 99
+        self.assertEqual(buffer[6], 99)
+
+    def test_nchunks(self):
+        data = list(range(23))
+        chunks = nchunks(data, 4)
+        self.assertEqual([len(chunk) for chunk in chunks], [6, 6, 6, 5])
+        self.assertEqual(flatlist(chunks), data)
+        self.assertEqual(nchunks(np.arange(3), 5)[-1].tolist(), [])
+
+    def test_shared_splitter(self):
+        values = np.arange(1000, dtype=np.float64).reshape(250, 4)
+        with SharedSplitter(values) as splitter:
+            chunks = splitter.split(3)
+            self.assertEqual([len(chunk) for chunk in chunks], [84, 83, 83])
+            self.assertEqual([len(chunk) for chunk in splitter.chunks(100)], [100, 100, 50])
+            with chunks[1] as view:
+                np.testing.assert_array_equal(view, values[84:167])
+            restored = pickle.loads(pickle.dumps(chunks[2]))
+            self.assertIsNone(restored._shm)
+            with ProcessPoolExecutor(2) as pool:
+                sums = list(pool.map(chunk_sum, splitter.chunks(60)))
+            self.assertEqual(sums, [float(values[i: i + 60].sum()) for i in range(0, 250, 60)])
+        with SharedSplitter(b'abcdef') as splitter:
+            with splitter.split(2)[1] as view:
+                self.assertEqual(view.tobytes(), b'def')
+        with self.assertRaises(TypeError):
+            SharedSplitter(np.array([{}, []], dtype=object))
+
+
+class TestStack(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = random.Random(0)
+
+    def test_against_deque(self):
+        for max_size in (1, 2, 5):
+            stack, reference = Stack(max_size=max_size), deque(maxlen=max_size)
+            for i in range(300):
+                operation = self.rng.random()
+                if operation < 0.6:
+                    stack.append(i)
+                    reference.append(i)
+                elif operation < 0.7 and reference:
+                    self.assertEqual(stack.pop(), reference.pop())
+                elif operation < 0.8 and reference:
+                    self.assertEqual(stack.pop(0), reference.popleft())
+                elif operation < 0.9:
+                    stack.extend([i, -i])
+                    reference.extend([i, -i])
+                elif reference:
+                    index = self.rng.randrange(len(reference))
+                    stack[index] = i
+                    reference[index] = i
+                self.assertEqual(list(stack), list(reference))
+                self.assertEqual(len(stack), len(reference))
+                self.assertEqual([stack[j] for j in range(-len(stack), len(stack))], list(reference) * 2)
+
+    def test_list_api(self):
+        stack = Stack([1, 2, 3, 4, 5], max_size=4)
+        self.assertEqual(stack, [2, 3, 4, 5])
+        self.assertEqual(stack[1:3], [3, 4])
+        self.assertEqual(stack.pop(1), 3)
+        stack.insert(0, 9)
+        self.assertEqual(stack, [9, 2, 4, 5])
+        stack.insert(1, 8)  # a full stack evicts on insert too
+        self.assertEqual(stack, [8, 2, 4, 5])
+        del stack[0]
+        self.assertIn(5, stack)
+        self.assertEqual(stack + [7], [2, 4, 5, 7])
+        self.assertEqual([0] + stack, [0, 2, 4, 5])
+        stack.sort(reverse=True)
+        self.assertEqual(stack.to_list(), [5, 4, 2])
+        self.assertEqual(json.dumps(stack.to_list()), '[5, 4, 2]')
+        copy = stack.copy()
+        copy.append(1)
+        self.assertEqual((len(copy), len(stack)), (4, 3))
+        stack.max_size = 2
+        self.assertEqual(stack, Stack([4, 2], max_size=2))
+        self.assertEqual(Stack([1], max_size=0), [])
+        with self.assertRaises(TypeError):
+            Stack((1, 2))
+        with self.assertRaises(IndexError):
+            Stack()[0]
+
+    def test_numeric_stack(self):
+        for max_size in (1, 3, 10):
+            values = [self.rng.uniform(-100, 100) for _ in range(200)]
+            stack = NumericStack(max_size=max_size)
+            for i, value in enumerate(values):
+                stack.append(value)
+                window = values[max(0, i + 1 - max_size): i + 1]
+                self.assertEqual(stack.array().tolist(), window)
+                self.assertEqual((stack.min(), stack.max()), (min(window), max(window)))
+                self.assertAlmostEqual(stack.sum(), sum(window), places=9)
+                self.assertAlmostEqual(stack.mean(), sum(window) / len(window), places=9)
+                self.assertEqual(stack.full, len(window) == max_size)
+                self.assertEqual(stack[-1], value)
+
+    def test_numeric_stack_api(self):
+        stack = NumericStack([5, 1, 4, 1, 3], max_size=3, dtype=np.int64)
+        self.assertEqual(stack.array().tolist(), [4, 1, 3])
+        self.assertEqual(stack[1:].tolist(), [1, 3])
+        self.assertEqual(list(stack), [4, 1, 3])
+        self.assertEqual((stack.sum(), stack.min(), stack.max()), (8, 1, 4))
+        with self.assertRaises(IndexError):
+            stack[3]
+        stack.clear()
+        self.assertEqual(len(stack), 0)
+        for statistic in (stack.mean, stack.min, stack.max):
+            with self.assertRaises(ValueError):
+                statistic()
+        with self.assertRaises(ValueError):
+            NumericStack(max_size=0)
+
+
+class TestMasks(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = random.Random(0)
+
+    def test_bool_mask_forms(self):
+        expected = [True, False, True, True, False]
+        for mask in (expected, [1, 0, 1, 1, 0], '1 11', '10110', np.array(expected), 0b01101):
+            self.assertEqual(bool_mask(mask, length=5).tolist(), expected)
+        self.assertEqual(bool_mask(bytes([0b10110000]), length=5, packed=True).tolist(), expected)
+        self.assertEqual(bool_mask([1, 1], length=4).tolist(), [True, True, False, False])
+        self.assertEqual(bool_mask('0011', length=2).tolist(), [False, False])
+        with self.assertRaises(ValueError):
+            bool_mask(5)
+        with self.assertRaises(TypeError):
+            bool_mask(1.5)
+
+    def test_apply_mask_types(self):
+        for sequence in ('abcde', ('a', 'b', 'c', 'd', 'e'), list('abcde'), range(5)):
+            self.assertEqual(apply_mask(sequence, [0, 1, 1]), list(sequence)[1:3])
+            self.assertEqual(apply_mask(sequence, [1, 0, 1]), [sequence[0], sequence[2]])
+            self.assertEqual(apply_mask(sequence, []), [])
+            self.assertEqual(apply_mask(sequence, '01', reduce=False, fill='-'), ['-', sequence[1], '-', '-', '-'])
+        values = np.arange(10)
+        view = apply_mask(values, [0, 0, 1, 1, 1])
+        self.assertTrue(np.shares_memory(view, values))
+        self.assertEqual(apply_mask(values, [1, 0, 1]).tolist(), [0, 2])
+        masked = apply_mask(values, [1, 0, 1], reduce=False)
+        self.assertEqual(masked.compressed().tolist(), [0, 2])
+        buffer = memoryview(bytes(range(10)))
+        self.assertIsInstance(apply_mask(buffer, [0, 1, 1]), memoryview)
+        self.assertEqual(apply_mask(buffer, [0, 1, 0, 1]), [1, 3])
+
+    def test_apply_mask_against_compress(self):
+        for _ in range(200):
+            sequence = [self.rng.randint(0, 9) for _ in range(self.rng.randint(0, 12))]
+            mask = [self.rng.random() < 0.5 for _ in range(self.rng.randint(0, 14))]
+            padded = (mask + [False] * len(sequence))[:len(sequence)]
+            expected = [e for e, m in zip(sequence, padded) if m]
+            self.assertEqual(apply_mask(sequence, mask), expected)
+            self.assertEqual(apply_mask(np.array(sequence, dtype=np.int64), mask).tolist(), expected)
+            self.assertEqual(apply_mask_many([sequence, sequence[::-1]], mask),
+                             [expected, [e for e, m in zip(sequence[::-1], padded) if m]])
+            if sequence:
+                grid = np.array([sequence, sequence])
+                self.assertEqual(apply_mask_many(grid, mask).tolist(), [expected, expected])
+
+    def test_sequence_binary_mask_against_legacy(self):
+        for _ in range(300):
+            sequence = 'abcdefghij'[:self.rng.randint(0, 10)]
+            binary_mask = self.rng.randint(-2 ** 12, 2 ** 12)
+            self.assertEqual(list(sequence_binary_mask(sequence, binary_mask)),
+                             list(legacy_sequence_binary_mask(sequence, binary_mask)))
+        self.assertEqual(tuple(sequence_binary_mask('abcde', 0b1101)), ('a', 'c', 'd'))
+        self.assertEqual(''.join(sequence_binary_mask('abcde', -1)), 'abcde')
+        self.assertEqual(''.join(sequence_binary_mask('abcde', -2)), 'bcde')
+
+
+class TestIndexing(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = random.Random(0)
+
+    def test_ifish_against_legacy(self):
+        for _ in range(300):
+            values = [self.rng.randint(0, 99) for _ in range(self.rng.randint(0, 15))]
+            indexes = [self.rng.randint(-3, 18) for _ in range(self.rng.randint(0, 6))]
+            expected = legacy_ifish(values, indexes)
+            for it in (values, tuple(values), iter(values), np.array(values, dtype=np.int64)):
+                self.assertEqual(ifish(it, indexes), expected)
+            self.assertEqual(ifish(range(len(values)), indexes), legacy_ifish(range(len(values)), indexes))
+            self.assertEqual(ifish(values, iter(indexes)), expected)
+            self.assertEqual(ifish(''.join(map(chr, values)), indexes), [chr(e) for e in expected])
+
+    def test_ifish_consumes_up_to_last_index(self):
+        iterator = iter(range(100))
+        self.assertEqual(ifish(iterator, [2, 5]), [2, 5])
+        self.assertEqual(next(iterator), 6)
+        with self.assertRaises(TypeError):
+            ifish(5, [1])
+        with self.assertRaises(TypeError):
+            ifish([1, 2], [0.5])
+
+    def test_indmap_against_legacy(self):
+        for _ in range(300):
+            values = [self.rng.randint(0, 99) for _ in range(self.rng.randint(0, 15))]
+            indices = [self.rng.randint(-3, 18) for _ in range(self.rng.randint(0, 6))]
+            for sequence in (values, tuple(values), range(len(values))):
+                self.assertEqual(list(indmap(str, sequence, indices)), list(legacy_indmap(str, sequence, indices)))
+        self.assertEqual(list(indmap(str, [1, 2, 3])), [1, 2, 3])
+        with self.assertRaises(TypeError):
+            list(indmap(str, iter([1, 2]), [0]))
+        with self.assertRaises(ValueError):
+            list(indmap(str, [1, 2], [0.5]))
+
+    def test_indmap_array(self):
+        values = np.arange(12).reshape(6, 2)
+        result = indmap_array(lambda rows: rows * 10, values, [0, -1, 0])
+        expected = values.copy()
+        expected[[0, 5]] *= 10
+        np.testing.assert_array_equal(result, expected)
+        np.testing.assert_array_equal(values, np.arange(12).reshape(6, 2))
+        np.testing.assert_array_equal(indmap_array(np.negative, values, []), values)
+
+
+class TestCartesianProduct(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = random.Random(0)
+
+    def random_pools(self) -> list:
+        return [list(range(self.rng.randint(0, 4))) for _ in range(self.rng.randint(1, 4))]
+
+    def test_random_access(self):
+        for _ in range(200):
+            pools = self.random_pools()
+            combinations = list(product(*pools))
+            cartesian = CartesianProduct(*pools)
+            self.assertEqual(len(cartesian), len(combinations))
+            self.assertEqual(list(cartesian), combinations)
+            self.assertEqual([cartesian[i] for i in range(-len(combinations), len(combinations))], combinations * 2)
+            start, stop, step = self.rng.randint(-5, 5), self.rng.randint(-5, 50), self.rng.choice([1, 2, -3])
+            self.assertEqual(cartesian[start:stop:step], combinations[start:stop:step])
+            with self.assertRaises(IndexError):
+                cartesian[len(combinations)]
+        with self.assertRaises(TypeError):
+            CartesianProduct([1])['a']
+
+    def test_each_with_each_against_legacy(self):
+        for _ in range(200):
+            pools = self.random_pools()
+            self.assertEqual(list(each_with_each(*pools)), list(legacy_each_with_each(*pools)))
+        generators = (i for i in range(3)), (c for c in 'ab'), (c for c in 'xy')
+        self.assertEqual(list(each_with_each(*generators)), list(product(range(3), 'ab', 'xy')))
+        self.assertEqual(list(each_with_each()), [()])
+
+    def test_each_with_each_lazy_first_iterable(self):
+        combinations = each_with_each(count(), 'ab', [None])
+        self.assertEqual(list(islice(combinations, 5)),
+                         [(0, 'a', None), (0, 'b', None), (1, 'a', None), (1, 'b', None), (2, 'a', None)])
+        self.assertEqual(next(combinations), (2, 'b', None))
+        self.assertEqual(list(islice(each_with_each(count(5)), 2)), [(5,), (6,)])
+
+    def test_arrays(self):
+        for _ in range(100):
+            pools = self.random_pools()
+            combinations = list(product(*pools))
+            start, stop = self.rng.randint(0, 10), self.rng.choice([None, self.rng.randint(0, 70)])
+            chunks = list(CartesianProduct(*pools).arrays(chunksize=self.rng.randint(1, 7), start=start, stop=stop))
+            rows = [tuple(row) for chunk in chunks for row in chunk.tolist()]
+            self.assertEqual(rows, combinations[start:stop])
+            self.assertTrue(all(chunk.shape[1] == len(pools) for chunk in chunks))
+
+    def test_arrays_dtypes(self):
+        self.assertEqual(next(CartesianProduct(range(2), range(3)).arrays()).dtype, np.int64)
+        self.assertEqual(next(CartesianProduct('ab', ['cd']).arrays()).dtype.kind, 'U')
+        mixed = next(CartesianProduct(range(2), 'ab', [0.5]).arrays())
+        self.assertEqual(mixed.dtype, object)
+        self.assertEqual([tuple(row) for row in mixed.tolist()], list(product(range(2), 'ab', [0.5])))
+        self.assertIs(type(mixed[0, 0]), int)
+        nested = next(CartesianProduct(range(2), [(1, 2), (3, 4)]).arrays())
+        self.assertEqual(nested.shape, (4, 2))
+        self.assertEqual(nested[1, 1], (3, 4))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+from unittest import mock
+from ptbutil.iteration import other
+from ptbutil.iteration.other import zipeven, DLI_MESSAGE
+
+
+def generator(n: int):
+    yield from range(n)
+
+
+class TestZipeven(unittest.TestCase):
+
+    def inputs(self, *lengths) -> list:
+        """every length as a list, a range, a generator and a map"""
+        return [[list(range(n)) for n in lengths],
+                [range(n) for n in lengths],
+                [generator(n) for n in lengths],
+                [map(str, range(n)) for n in lengths],
+                [list(range(lengths[0])), *(generator(n) for n in lengths[1:])]]
+
+    def check_zips(self):
+        for iterables in self.inputs(4, 4, 4):
+            self.assertEqual([tuple(map(int, t)) for t in zipeven(*iterables)], [(i, i, i) for i in range(4)])
+        for iterables in self.inputs(0, 0):
+            self.assertEqual(list(zipeven(*iterables)), [])
+        self.assertEqual(list(zipeven('ab')), [('a',), ('b',)])
+        self.assertEqual(list(zipeven()), [])
+
+    def check_mismatches(self):
+        for lengths in ((3, 4), (4, 3), (4, 4, 2), (0, 1)):
+            for iterables in self.inputs(*lengths):
+                with self.assertRaises(ValueError):
+                    list(zipeven(*iterables))
+
+    def test_equal_lengths(self):
+        self.check_zips()
+
+    def test_mismatch(self):
+        self.check_mismatches()
+
+    def test_sized_mismatch_raises_at_once(self):
+        with self.assertRaisesRegex(ValueError, DLI_MESSAGE):
+            zipeven([1, 2], range(3))
+
+    def test_streaming_mismatch_yields_common_part(self):
+        zipped = zipeven(generator(2), map(str, range(3)))
+        self.assertEqual([next(zipped), next(zipped)], [(0, '0'), (1, '1')])
+        with self.assertRaises(ValueError):
+            next(zipped)
+
+    def test_fallback_without_strict_zip(self):
+        with mock.patch.object(other, 'STRICT_ZIP', False):
+            self.assertIsInstance(zipeven(generator(1), [1]), type(other._zip_strict()))
+            self.check_zips()
+            self.check_mismatches()
+            zipped = zipeven([1, 2, 3], generator(2))
+            self.assertEqual(list(zip(range(2), zipped)), [(0, (1, 0)), (1, (2, 1))])
+            with self.assertRaisesRegex(ValueError, DLI_MESSAGE):
+                next(zipped)
+
+
+if __name__ == '__main__':
+    unittest.main()
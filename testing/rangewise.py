@@ -0,0 +1,198 @@
+import unittest
+import random
+from collections import Counter
+from ptbutil.iteration.rangewise import Range, Multirange, RangeMap, coverage
+
+
+def random_multirange(rng: random.Random, n: int = 4, lo: int = -40, hi: int = 40) -> Multirange:
+    ranges = []
+    for _ in range(rng.randint(0, n)):
+        start = rng.randint(lo, hi)
+        ranges.append(Range(start, start + rng.randint(0, 15)))
+    return Multirange(*ranges)
+
+
+def random_range_map(rng: random.Random, n: int = 4, lo: int = -40, hi: int = 40) -> RangeMap:
+    bounds = sorted(rng.sample(range(lo, hi), 2 * rng.randint(0, n)))
+    return RangeMap(*((Range(start, stop), rng.randint(-20, 20)) for start, stop in zip(bounds[::2], bounds[1::2])))
+
+
+def as_set(r) -> set:
+    return set() if r is None else set(r)
+
+
+class TestMultirange(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = random.Random(0)
+
+    def test_against_sets(self):
+        for _ in range(500):
+            a, b = random_multirange(self.rng), random_multirange(self.rng)
+            sa, sb = set(a), set(b)
+            self.assertEqual(list(a), sorted(sa))
+            self.assertEqual(len(a), len(sa))
+            self.assertEqual(set(a.union(b)), sa | sb)
+            self.assertEqual(as_set(a.intersection(b)), sa & sb)
+            self.assertEqual(as_set(a.difference(b)), sa - sb)
+            values = list(range(-45, 60))
+            self.assertEqual([v in a for v in values], [v in sa for v in values])
+            self.assertEqual(a.contains_many(values).tolist(), [v in sa for v in values])
+            i = self.rng.randint(-45, 60)
+            self.assertEqual(as_set(a.take_from(i)), {v for v in sa if v >= i})
+            self.assertEqual(as_set(a.take_upto(i)), {v for v in sa if v < i})
+
+    def test_indexing_and_slicing(self):
+        for _ in range(300):
+            a = random_multirange(self.rng)
+            elements = list(a)
+            for i in range(-len(elements), len(elements)):
+                self.assertEqual(a[i], elements[i])
+            with self.assertRaises(IndexError):
+                a[len(elements)]
+            start, stop = sorted(self.rng.randint(0, len(elements) + 5) for _ in range(2))
+            self.assertEqual(list(a[start:stop]), elements[start:stop])
+            self.assertEqual(list(a[-3:]), elements[-3:])
+
+    def test_union_all_and_intersect_all(self):
+        for _ in range(200):
+            multiranges = [random_multirange(self.rng, lo=-20, hi=20) for _ in range(self.rng.randint(1, 5))]
+            sets = [set(m) for m in multiranges]
+            self.assertEqual(set(Multirange.union_all(*multiranges)), set.union(*sets))
+            self.assertEqual(as_set(Multirange.intersect_all(*multiranges)), set.intersection(*sets))
+
+    def test_coverage(self):
+        for _ in range(200):
+            multiranges = [random_multirange(self.rng, lo=-20, hi=20) for _ in range(self.rng.randint(0, 5))]
+            counts = Counter(v for m in multiranges for v in m)
+            starts, stops, covered = coverage(*multiranges)
+            self.assertTrue((covered > 0).all())
+            result = Counter()
+            for start, stop, count in zip(starts.tolist(), stops.tolist(), covered.tolist()):
+                result.update({v: count for v in range(start, stop)})
+            self.assertEqual(result, counts)
+
+    def test_shift(self):
+        a = Multirange(1, 3, 10, 12)
+        self.assertIs(a.shift(2), a)
+        self.assertEqual(a, Multirange(3, 5, 12, 14))
+        self.assertEqual(a.shift([5, -4]), Multirange(8, 10))
+        with self.assertRaises(ValueError):
+            a.shift([1, 2, 3])
+
+    def test_equality_and_hash(self):
+        a = Multirange(Range(1, 3), Range(3, 5), Range(8, 9))
+        b = Multirange(1, 5, 8, 9)
+        self.assertEqual(a, b)
+        self.assertEqual(hash(a), hash(b))
+        self.assertEqual(len({a, b, Multirange(1, 5)}), 2)
+
+    def test_ordering(self):
+        self.assertLess(Multirange(1, 3), Multirange(2, 3))
+        self.assertLess(Multirange(1, 3), Multirange(1, 2, 4, 5))
+        self.assertLess(Multirange(), Multirange(1, 2))
+        self.assertFalse(Multirange(1, 2) < Multirange())
+        self.assertFalse(Multirange() < Multirange())
+
+    def test_ranges(self):
+        a = Multirange(1, 3, 5, 9)
+        self.assertEqual(a.ranges, (Range(1, 3), Range(5, 9)))
+        with self.assertRaises(AttributeError):
+            a.ranges.append(Range(20, 30))
+        a.ranges = [*a.ranges, Range(20, 30)]
+        self.assertEqual(a, Multirange(1, 3, 5, 9, 20, 30))
+
+    def test_big_integers(self):
+        self.assertEqual(Range(0, 2 ** 70).difference(Range(3, 4)), Multirange(0, 3, 4, 2 ** 70))
+        a = Multirange(Range(0, 2 ** 63))
+        self.assertIn(2 ** 63 - 1, a)
+        self.assertNotIn(2 ** 63, a)
+        self.assertEqual(a[-1], 2 ** 63 - 1)
+        self.assertEqual(a.union(Range(2 ** 63, 2 ** 70)), Multirange(0, 2 ** 70))
+        self.assertEqual(a.take_from(2 ** 62), Range(2 ** 62, 2 ** 63))
+        self.assertEqual(Multirange(0, 2 ** 70)[5: 2 ** 69], Multirange(5, 2 ** 69))
+        self.assertEqual(Multirange(1, 3).shift(2 ** 64), Multirange(2 ** 64 + 1, 2 ** 64 + 3))
+        self.assertEqual(hash(Multirange(0, 2 ** 70)), hash(Multirange(Range(0, 2 ** 70))))
+        small = Multirange(0, 2 ** 70).intersection(Range(0, 5))
+        self.assertEqual(small.stops.dtype, small.starts.dtype)  # back to int64
+
+
+class TestRangeMap(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = random.Random(0)
+
+    @staticmethod
+    def as_dict(range_map: RangeMap) -> dict:
+        return {v: v + offset for r, offset in range_map for v in r}
+
+    def test_against_dict(self):
+        domain = range(-80, 80)
+        for _ in range(300):
+            range_map = random_range_map(self.rng)
+            mapping = self.as_dict(range_map)
+            self.assertEqual([range_map(v) for v in domain], [mapping.get(v, v) for v in domain])
+            multirange = random_multirange(self.rng)
+            self.assertEqual(set(range_map.map(multirange)), {mapping.get(v, v) for v in multirange})
+
+    def test_compose(self):
+        domain = range(-150, 150)
+        for _ in range(300):
+            maps = [random_range_map(self.rng) for _ in range(self.rng.randint(1, 4))]
+            composed = maps[0].compose(*maps[1:])
+            expected = list(domain)
+            for range_map in maps:
+                expected = [range_map(v) for v in expected]
+            self.assertEqual([composed(v) for v in domain], expected)
+            # normal form: maps translating equally are equal
+            self.assertEqual(composed, RangeMap(*composed))
+
+    def test_normal_form(self):
+        a = RangeMap((Range(0, 5), 2), (Range(5, 9), 2), (Range(20, 30), 0))
+        b = RangeMap()
+        b.set(Range(5, 9), 2)
+        b.set(Range(20, 30), 0)
+        b.set(Range(0, 5), 2)
+        self.assertEqual(len(a), 1)
+        self.assertEqual(a, b)
+        # 10:20 goes there and back, so it is dropped as offset 0
+        c = RangeMap((Range(10, 20), 10)).compose(RangeMap((Range(10, 30), -10)))
+        self.assertEqual(c, RangeMap((Range(20, 30), -10)))
+        self.assertEqual(len(c), 1)
+        self.assertIsNone(a.lookup(25))
+        self.assertEqual(a.lookup(6), (Range(0, 9), 2))
+
+    def test_overlaps(self):
+        with self.assertRaises(ValueError):
+            RangeMap((Range(0, 5), 1), (Range(3, 9), 2))
+        range_map = RangeMap((Range(0, 5), 1))
+        with self.assertRaises(ValueError):
+            range_map.set(Range(4, 6), 1)
+        with self.assertRaises(TypeError):
+            range_map.set((4, 6), 1)
+
+    def test_almanac(self):
+        seeds = [79, 14, 55, 13]
+        maps = [RangeMap.from_triples(*triples) for triples in (
+            [(50, 98, 2), (52, 50, 48)],
+            [(0, 15, 37), (37, 52, 2), (39, 0, 15)],
+            [(49, 53, 8), (0, 11, 42), (42, 0, 7), (57, 7, 4)],
+            [(88, 18, 7), (18, 25, 70)],
+            [(45, 77, 23), (81, 45, 19), (68, 64, 13)],
+            [(0, 69, 1), (1, 0, 69)],
+            [(60, 56, 37), (56, 93, 4)])]
+        seed_to_location = maps[0].compose(*maps[1:])
+        self.assertEqual(min(seed_to_location(seed) for seed in seeds), 35)
+        seed_ranges = Multirange(*(Range(start, start + n) for start, n in zip(seeds[::2], seeds[1::2])))
+        self.assertEqual(seed_to_location.map(seed_ranges)[0], 46)
+
+    def test_big_integers(self):
+        range_map = RangeMap((Range(0, 2 ** 70), 2 ** 70))
+        self.assertEqual(range_map(5), 2 ** 70 + 5)
+        self.assertEqual(range_map.map(Range(5, 10)), Multirange(2 ** 70 + 5, 2 ** 70 + 10))
+        back = RangeMap((Range(2 ** 70, 2 ** 71), -2 ** 70))
+        self.assertEqual(range_map.compose(back), back)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,451 @@
+import unittest
+import io
+import json
+import subprocess
+import sys
+from unittest import mock
+from datetime import datetime, timedelta, timezone
+from ptbutil import ptbmsgpack, ptbserialization
+from ptbutil.ptbserialization import (PtbSerializable, PtbSerialisationDecoder, PLANS, serialize, deserialize,
+                                      serialize_binary, deserialize_binary, serialize_stream, deserialize_stream,
+                                      preprocess_serializable,
+                                      TYPE_ANNOTATION_KEY)
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+
+def msgpack_samples(module) -> list:
+    """values at every MessagePack length and value boundary"""
+    ints = [0, 1, 127, 128, 255, 256, 65535, 65536, 2 ** 32 - 1, 2 ** 32, 2 ** 63 - 1, 2 ** 64 - 1,
+            -1, -32, -33, -128, -129, -32768, -32769, -2 ** 31, -2 ** 31 - 1, -2 ** 63]
+    sizes = [0, 1, 15, 16, 31, 32, 255, 256, 65535, 65536]
+    return [None, True, False, 0.0, -1.5, 1e300, float('inf'),
+            *ints,
+            *('x' * n for n in sizes), 'zażółć',
+            *(b'x' * n for n in sizes), bytearray(b'abc'), memoryview(b'abcd'),
+            *(list(range(n)) for n in (0, 15, 16, 65536)),
+            *({str(i): i for i in range(n)} for n in (0, 15, 16, 65536)),
+            {1: 'int key', 'nested': [{'a': [None]}]},
+            *(module.ExtType(5, b'x' * n) for n in (1, 2, 3, 4, 8, 16, 17, 255, 256, 65536))]
+
+
+@PtbSerializable.register
+class SerializedPoint:
+    def __init__(self, x, y=0, *, label=None):
+        self.x = x
+        self.y = y
+        self.label = label
+
+    def serialization_init_params(self):
+        return {'*': [self.x], '**': {'y': self.y, 'label': self.label}}
+
+    def serialization_instance_attrs(self):
+        return {'extra': getattr(self, 'extra', None)}
+
+    def __eq__(self, other):
+        return (type(other) is type(self)
+                and (self.x, self.y, self.label, getattr(self, 'extra', None))
+                == (other.x, other.y, other.label, getattr(other, 'extra', None)))
+
+
+@PtbSerializable.register
+class SerializedParent:
+    def __init__(self, children=()):
+        self.children = list(children)
+
+    def serialization_init_params(self):
+        return {'**': {'children': self.children}}
+
+    def serialization_instance_attrs(self):
+        return None
+
+
+@PtbSerializable.register
+class SerializedChild:
+    def __init__(self, name):
+        self.name = name
+        self.parent = None
+
+    def serialization_init_params(self):
+        return {'*': [self.name]}
+
+    def serialization_instance_attrs(self):
+        return {'parent': self.parent}
+
+
+class TestJsonSerialization(unittest.TestCase):
+
+    def test_round_trip(self):
+        point = SerializedPoint(1, 2, label='a')
+        point.extra = {'nested': [SerializedPoint(3), [4, 5]]}
+        obj = {'point': point, 'when': datetime(2024, 6, 30, 12, 0, 1), 'items': [1, 2.5, 'x', None, True],
+               'pair': (4, 5)}
+        decoded = deserialize(serialize(obj))
+        self.assertEqual(decoded['point'], point)
+        self.assertEqual(decoded['pair'], [4, 5])  # tuples come back as lists
+        self.assertEqual(decoded['when'], obj['when'])
+        self.assertEqual(decoded['items'], obj['items'])
+        self.assertTrue(decoded['point']._was_serialized)
+
+    def test_plain_data(self):
+        obj = {'a': [1, {'b': 'c'}], 'd': None}
+        self.assertEqual(json.loads(serialize(obj)), obj)
+        self.assertEqual(deserialize(serialize(obj)), obj)
+
+    def test_object_hook_decoding(self):
+        data = serialize([SerializedPoint(1), {'p': SerializedPoint(2)}])
+        decoded = json.loads(data, cls=PtbSerialisationDecoder)
+        self.assertEqual(decoded, [SerializedPoint(1), {'p': SerializedPoint(2)}])
+
+    def test_unknown_type_on_decoding(self):
+        with self.assertRaises(ValueError):
+            deserialize(json.dumps({TYPE_ANNOTATION_KEY: 'NotRegisteredAnywhere', 'INIT__': None}))
+
+    def test_plans_cleared_on_registering(self):
+        class Interval:
+            def __init__(self, low, high):
+                self.low, self.high = low, high
+
+        # the registration is undone, so later tests see the global registry unchanged
+        self.addCleanup(PLANS.clear)
+        self.addCleanup(PtbSerializable.FOREIGN_SERIALIZABLE_REGISTRY.pop, 'Interval', None)
+        serialize(SerializedPoint(1))
+        self.assertIs(PLANS[SerializedPoint], preprocess_serializable)
+        PtbSerializable.register_foreign(Interval, serializable_init_params=lambda i: {'*': [i.low, i.high]})
+        self.assertNotIn(SerializedPoint, PLANS)
+        decoded = deserialize(serialize([Interval(1, 2)]))[0]
+        self.assertEqual((type(decoded), decoded.low, decoded.high), (Interval, 1, 2))
+
+
+class TestBinarySerialization(unittest.TestCase):
+
+    def test_round_trip(self):
+        point = SerializedPoint(1, 2, label='a')
+        point.extra = {'raw': b'bytes', 'nested': [SerializedPoint(3), [4, 5]]}
+        obj = {'point': point, 'points': [SerializedPoint(i) for i in range(3)], 'pair': (4, 5),
+               'naive': datetime(2024, 6, 30, 12, 0, 1, 500),
+               'aware': datetime(2024, 6, 30, 12, tzinfo=timezone(timedelta(hours=2))),
+               'utc': datetime(2024, 6, 30, 12, tzinfo=timezone.utc),
+               1: 'int key'}
+        decoded = deserialize_binary(serialize_binary(obj))
+        self.assertEqual(decoded['point'], point)
+        self.assertEqual(decoded['points'], obj['points'])
+        self.assertEqual(decoded['pair'], [4, 5])
+        self.assertEqual(decoded['naive'], obj['naive'])
+        self.assertEqual(decoded['aware'], obj['aware'])
+        self.assertEqual(decoded['aware'].utcoffset(), timedelta(hours=2))
+        self.assertEqual(decoded['utc'], obj['utc'])
+        self.assertEqual(decoded['utc'].utcoffset(), timedelta(0))
+        self.assertEqual(decoded[1], 'int key')
+
+    def test_types_interned(self):
+        data = serialize_binary([SerializedPoint(i) for i in range(100)])
+        self.assertEqual(data.count(b'SerializedPoint'), 1)
+
+    def test_not_serializable(self):
+        with self.assertRaises(TypeError):
+            serialize_binary({'a': object()})
+
+    def test_unsupported_version(self):
+        data = ptbmsgpack.packb([ptbserialization.BINARY_FORMAT_VERSION + 1, [], ptbmsgpack.packb(None)])
+        with self.assertRaises(ValueError):
+            deserialize_binary(data)
+
+    def test_fallback_round_trip(self):
+        obj = {'point': SerializedPoint(1, label='a'), 'when': datetime(2024, 6, 30)}
+        with mock.patch.object(ptbserialization, 'msgpack', ptbmsgpack):
+            data = serialize_binary(obj)
+            self.assertEqual(deserialize_binary(data), obj)
+
+    @unittest.skipIf(msgpack is None, 'msgpack is not installed')
+    def test_fallback_byte_identical(self):
+        for c_sample, py_sample in zip(msgpack_samples(msgpack), msgpack_samples(ptbmsgpack)):
+            c_packed = msgpack.packb(c_sample, use_bin_type=True)
+            self.assertEqual(ptbmsgpack.packb(py_sample, use_bin_type=True), c_packed)
+            unpacked = ptbmsgpack.unpackb(c_packed, raw=False, strict_map_key=False)
+            self.assertEqual(unpacked, msgpack.unpackb(c_packed, raw=False, strict_map_key=False))
+        obj = {'point': SerializedPoint(1, label='a'), 'when': datetime(2024, 6, 30), 'pair': (1, 2)}
+        with mock.patch.object(ptbserialization, 'msgpack', ptbmsgpack):
+            fallback = serialize_binary(obj)
+        self.assertEqual(serialize_binary(obj), fallback)
+
+    def test_fallback_truncated(self):
+        data = ptbmsgpack.packb(['x' * 40, b'x' * 300, 2 ** 40, {'a': [1, 2]}, ptbmsgpack.ExtType(5, b'abc')])
+        for i in range(len(data)):
+            with self.assertRaises(ptbmsgpack.UnpackException):
+                ptbmsgpack.unpackb(data[:i])
+
+
+class TestStreams(unittest.TestCase):
+
+    def setUp(self):
+        self.objects = [{'n': i, 'point': SerializedPoint(i, label=str(i))} for i in range(25)]
+
+    def test_ndjson(self):
+        fp = io.StringIO()
+        self.assertEqual(serialize_stream(iter(self.objects), fp, chunksize=7), 25)
+        self.assertEqual(fp.getvalue().count('\n'), 25)
+        fp.seek(0)
+        self.assertEqual(list(deserialize_stream(fp)), self.objects)
+
+    def test_frames(self):
+        fp = io.BytesIO()
+        self.assertEqual(serialize_stream(iter(self.objects), fp, framing='frames', chunksize=7), 25)
+        fp.seek(0)
+        self.assertEqual(list(deserialize_stream(fp, framing='frames')), self.objects)
+
+    def test_frames_lazy(self):
+        fp = io.BytesIO()
+        serialize_stream(self.objects, fp, framing='frames')
+        fp.seek(0)
+        objects = deserialize_stream(fp, framing='frames')
+        self.assertEqual(next(objects), self.objects[0])
+        self.assertLess(fp.tell(), len(fp.getvalue()))
+
+    def test_truncated_frame(self):
+        fp = io.BytesIO()
+        serialize_stream(self.objects[:2], fp, framing='frames')
+        data = fp.getvalue()
+        first = ptbserialization.FRAME_HEADER.size + ptbserialization.FRAME_HEADER.unpack(data[:4])[0]
+        # truncated payload, truncated header of the second frame, truncated payload of the first frame
+        for truncated, decoded in ((data[:-1], 1), (data[:first + 2], 1), (data[:first - 1], 0)):
+            objects = deserialize_stream(io.BytesIO(truncated), framing='frames')
+            for _ in range(decoded):
+                next(objects)
+            with self.assertRaises(ValueError):
+                next(objects)
+
+    def test_invalid_framing(self):
+        with self.assertRaises(ValueError):
+            serialize_stream([], io.StringIO(), framing='lines')
+        with self.assertRaises(ValueError):
+            list(deserialize_stream(io.StringIO(), framing='lines'))
+
+    def test_process_pool(self):
+        fp = io.BytesIO()
+        objects = [{'n': i, 'items': list(range(i))} for i in range(30)]
+        self.assertEqual(serialize_stream(objects, fp, framing='frames', processes=2, chunksize=8), 30)
+        fp.seek(0)
+        self.assertEqual(list(deserialize_stream(fp, framing='frames')), objects)
+
+
+class TestForeignHandlers(unittest.TestCase):
+
+    def round_trips(self, obj) -> list:
+        return [deserialize(serialize(obj)), deserialize_binary(serialize_binary(obj))]
+
+    def test_lazy_imports(self):
+        code = ('import sys; import ptbutil.ptbserialization as s; '
+                's.deserialize(s.serialize({"a": [1]})); s.deserialize_binary(s.serialize_binary({"a": [1]})); '
+                'print("numpy" in sys.modules, "pandas" in sys.modules)')
+        out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+        self.assertEqual(out.split(), ['False', 'False'])
+
+    @unittest.skipIf(np is None, 'numpy is not installed')
+    def test_arrays(self):
+        arrays = [np.arange(12, dtype='>i4').reshape(3, 4),
+                  np.arange(12.).reshape(3, 4).T,  # not contiguous
+                  np.arange(24).reshape(2, 3, 4)[:, ::2, 1],
+                  np.array(3.5),
+                  np.zeros((0, 3), dtype='u2'),
+                  np.array(['2024-06-30', '2024-07-01'], dtype='datetime64[D]'),
+                  np.array(['ab', 'cde'])]
+        for array in arrays:
+            for decoded in self.round_trips({'array': array}):
+                decoded = decoded['array']
+                self.assertEqual(decoded.dtype, array.dtype)
+                self.assertEqual(decoded.shape, array.shape)
+                np.testing.assert_array_equal(decoded, array)
+
+    @unittest.skipIf(np is None, 'numpy is not installed')
+    def test_structured_array(self):
+        dtype = np.dtype([('name', 'U5'), ('point', '<f8', (2,)), ('n', '>i2')])
+        array = np.array([('a', (1., 2.), 3), ('bcdef', (4., 5.), -6)], dtype=dtype)
+        for decoded in self.round_trips(array):
+            self.assertEqual(decoded.dtype, dtype)
+            np.testing.assert_array_equal(decoded, array)
+
+    @unittest.skipIf(np is None, 'numpy is not installed')
+    def test_nested_structured_array(self):
+        inner = np.dtype([('x', '<f4'), ('tags', 'U3', (2,))])
+        dtype = np.dtype([('id', '<i8'), ('inner', inner), ('pairs', inner, (2,)), (('title', 'n'), 'u1')])
+        array = np.zeros(3, dtype=dtype)
+        array['id'] = [1, 2, 3]
+        array['inner']['x'] = [.5, 1.5, 2.5]
+        array['pairs']['tags'] = 'ab'
+        array['n'] = 7
+        for decoded in self.round_trips({'array': array}):
+            self.assertEqual(decoded['array'].dtype, dtype)
+            np.testing.assert_array_equal(decoded['array'], array)
+
+    @unittest.skipIf(np is None, 'numpy is not installed')
+    def test_object_array(self):
+        array = np.empty((2, 2), dtype=object)
+        array[:] = [[1, 'a'], [SerializedPoint(1), [2, 3]]]
+        for decoded in self.round_trips(array):
+            self.assertEqual(decoded.dtype, object)
+            self.assertEqual(decoded.shape, (2, 2))
+            self.assertEqual(decoded.tolist(), array.tolist())
+
+    @unittest.skipIf(np is None, 'numpy is not installed')
+    def test_numpy_scalars(self):
+        self.assertEqual(deserialize_binary(serialize_binary([np.float32(1.5), np.int64(3)])), [1.5, 3])
+
+    @unittest.skipIf(pd is None, 'pandas is not installed')
+    def test_dataframe(self):
+        df = pd.DataFrame({'a': [1, 2, 3], 'b': [1.5, None, 3.], 'c': ['x', 'y', None]})
+        indexed = df.set_index(pd.Index([10, 20, 30], name='key'))
+        for frame in (df, indexed):
+            for decoded in self.round_trips(frame):
+                pd.testing.assert_frame_equal(decoded, frame)
+
+    @unittest.skipIf(pd is None, 'pandas is not installed')
+    def test_extension_columns(self):
+        times = pd.date_range('2024-03-30 22:00', periods=4, freq='h', tz='Europe/Warsaw')
+        df = pd.DataFrame({'category': pd.Categorical(['b', 'a', None, 'b'], categories=['b', 'a']),
+                           'ordered': pd.Categorical([3, 1, 2, 3], ordered=True),
+                           'warsaw': times,
+                           'fixed': times.tz_convert(timezone(timedelta(hours=2))).as_unit('ns'),
+                           'utc': pd.Series(times.tz_convert('UTC')).where([True, False, True, True]),
+                           'nullable': pd.array(['x', None, 'z', 'w'], dtype='string'),
+                           'text': ['x', 'y', None, 'w']},
+                          index=pd.CategoricalIndex(['i', 'j', 'k', 'l'], name='key'))
+        for decoded in self.round_trips(df):
+            pd.testing.assert_frame_equal(decoded, df)
+        for series in (df['ordered'], df['warsaw'], df.set_index('utc')['text']):
+            for decoded in self.round_trips(series):
+                pd.testing.assert_series_equal(decoded, series)
+
+    @unittest.skipIf(pd is None, 'pandas is not installed')
+    def test_unsupported_extension_columns(self):
+        df = pd.DataFrame({'n': pd.array([1, None], dtype='Int64')})
+        with self.assertRaisesRegex(TypeError, 'Int64'):
+            serialize(df)
+        with self.assertRaisesRegex(TypeError, 'period'):
+            serialize_binary(pd.Series(pd.period_range('2024-01', periods=2, freq='M')))
+
+    @unittest.skipIf(pd is None, 'pandas is not installed')
+    def test_series(self):
+        series = pd.Series([1., 2., 3.], index=pd.Index(['a', 'b', 'c'], name='key'), name='value')
+        for decoded in self.round_trips(series):
+            pd.testing.assert_series_equal(decoded, series)
+
+
+class TestReferences(unittest.TestCase):
+
+    def round_trip(self, obj):
+        return deserialize(serialize(obj, references=True), references=True)
+
+    def test_deep_chains(self):
+        # deeper than the json module recursion allows, through INIT__ and through ATTRS__
+        parent = SerializedParent()
+        for _ in range(5000):
+            parent = SerializedParent([parent])
+        depth = 0
+        decoded = self.round_trip(parent)
+        while decoded.children:
+            decoded = decoded.children[0]
+            depth += 1
+        self.assertEqual(depth, 5000)
+        head = child = SerializedChild(0)
+        for i in range(1, 5000):
+            child.parent = child = SerializedChild(i)
+        decoded = self.round_trip([head, child])
+        node = decoded[0]
+        for _ in range(4999):
+            node = node.parent
+        self.assertIs(node, decoded[1])
+        self.assertEqual(node.name, 4999)
+        with self.assertRaises(RecursionError):
+            serialize(parent)
+
+    def test_iterative_json_against_json_module(self):
+        samples = [0, -1.5e-300, 'zażółć "\\ \n', None, True, [], {}, [[]], {'a': {}},
+                   {'a': [1, 2.5, {'b': None, 'c': [True, False]}], 'd': 'e', 1: 'int key', 2.5: 1, None: 2},
+                   [float('inf'), float('-inf'), 10 ** 30, -0.0, '\ud800']]
+        for sample in samples:
+            text = json.dumps(sample)
+            self.assertEqual(ptbserialization._dumps_iterative(sample), text)
+            self.assertEqual(repr(ptbserialization._loads_iterative(text)), repr(json.loads(text)))
+            self.assertEqual(ptbserialization._loads_iterative(json.dumps(sample, indent=2).encode()), json.loads(text))
+        nan = ptbserialization._loads_iterative(' [NaN , {"k" :-Infinity}] ')
+        self.assertNotEqual(nan[0], nan[0])
+        self.assertEqual(nan[1], {'k': float('-inf')})
+        for invalid in ('', '[1,]', '[1 2]', '{"a" 1}', '{1: 2}', '[1]]', '[', 'nul', '"abc'):
+            with self.assertRaises(json.JSONDecodeError, msg=invalid):
+                ptbserialization._loads_iterative(invalid)
+        with self.assertRaises(TypeError):
+            ptbserialization._dumps_iterative([{1, 2}])
+
+    def family(self):
+        children = [SerializedChild('a'), SerializedChild('b')]
+        parent = SerializedParent(children)
+        for child in children:
+            child.parent = parent
+        return parent
+
+    def test_shared_objects(self):
+        point = SerializedPoint(1)
+        decoded = self.round_trip({'a': point, 'b': [point, SerializedPoint(1)]})
+        self.assertIs(decoded['a'], decoded['b'][0])
+        self.assertIsNot(decoded['a'], decoded['b'][1])
+        self.assertEqual(decoded['a'], point)
+        self.assertEqual(json.loads(serialize([point, point], references=True))[1], {'REF__': 0})
+
+    def test_back_references_from_parent(self):
+        parent = self.round_trip(self.family())
+        self.assertEqual([child.name for child in parent.children], ['a', 'b'])
+        for child in parent.children:
+            self.assertIs(child.parent, parent)
+
+    def test_back_references_from_child(self):
+        child = self.round_trip(self.family().children[1])
+        self.assertEqual(child.name, 'b')
+        self.assertEqual([c.name for c in child.parent.children], ['a', 'b'])
+        self.assertIs(child.parent.children[1], child)
+        self.assertIs(child.parent.children[0].parent, child.parent)
+
+    def test_self_reference(self):
+        point = SerializedPoint(1)
+        point.extra = [point]
+        decoded = self.round_trip(point)
+        self.assertIs(decoded.extra[0], decoded)
+
+    def test_init_cycle(self):
+        child = SerializedChild('a')
+        child.parent = SerializedParent([SerializedPoint(1, label=child)])
+        decoded = self.round_trip(child)  # child init is complete, when it is referenced by init of its attribute
+        self.assertIs(decoded.parent.children[0].label, decoded)
+        point = SerializedPoint(1)
+        point.x = SerializedParent([point])
+        with self.assertRaises(ValueError):
+            serialize(point, references=True)
+        with self.assertRaises(ValueError):
+            serialize(SerializedParent([point]), references=True)
+
+    def test_container_cycle(self):
+        items = [1]
+        items.append(items)
+        with self.assertRaises(ValueError):
+            serialize(items, references=True)
+
+    def test_unresolved_reference(self):
+        with self.assertRaises(ValueError):
+            deserialize(json.dumps([{'REF__': 3}]), references=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
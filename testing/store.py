@@ -1,6 +1,7 @@
 import unittest
 import os
 import shutil
+from unittest import mock
 from ptbutil.store.textdepo import TextDepo, textdepo_hash, TextDepoIndex, FileDescriptor
 
 
@@ -69,6 +70,134 @@ class TestTextDepo(unittest.TestCase):
         with self.assertRaises(ValueError):
             self.text_depo.read()
 
+    def test_write_many_with_meta(self):
+        self.text_depo.write_many(["Text 1", "Text 2"], meta=[{"source": "a"}, {"source": "b"}])
+        metas = sorted(d["filemeta"]["source"] for d in self.text_depo.index.values())
+        self.assertEqual(metas, ["a", "b"])
+
+    def test_write_many_generators_with_meta(self):
+        texts = (f"Text {i}" for i in range(12))
+        meta = ({"n": i} for i in range(12))
+        self.text_depo.write_many(texts, meta=meta)
+        self.assertEqual(len(self.text_depo.index), 12)
+        with self.assertRaises(ValueError):
+            self.text_depo.write_many((f"Other {i}" for i in range(3)), meta=({"n": i} for i in range(2)))
+
+    def test_sharded_layout(self):
+        depo = TextDepo(self.test_dir, file_name="sharded", layout="sharded")
+        depo.write_many(["Text 1", "Text 2"])
+        h = textdepo_hash("Text 1")
+        self.assertTrue(os.path.isfile(os.path.join(self.test_dir, h[:2], h[2:4], f"{h}.txt")))
+        self.assertEqual(sorted(depo.read_many(condition="sharded")), ["Text 1", "Text 2"])
+        filename = depo.index.get(h)["filename"]
+        self.assertEqual(depo.read(filename=filename), "Text 1")
+        self.assertEqual(depo.read(filename=os.path.join(self.test_dir, h[:2], h[2:4], f"{h}.txt")), "Text 1")
+        self.assertEqual(depo.read(filename=os.path.join(h[:2], h[2:4], f"{h}.txt")), "Text 1")
+        self.assertEqual(depo.read(filename=os.path.join(self.test_dir, filename)), "Text 1")
+        with self.assertRaises(ValueError):
+            depo.read(filename=os.path.join(os.path.dirname(self.test_dir), f"{h}.txt"))
+
+    def test_pack_layout(self):
+        self.text_depo.write("Flat text")
+        depo = TextDepo(self.test_dir, file_name="test_depo", layout="pack", pack_size=64)
+        depo.write_many(["Text 1", "Text 2", "Text 3"])
+        self.assertEqual(len(depo.index), 4)
+        files = os.listdir(self.test_dir)
+        self.assertEqual(len([f for f in files if f.endswith(".txt")]), 1)
+        self.assertGreater(len([f for f in files if f.endswith(".pack.gz")]), 1)
+        self.assertEqual(depo.read(text_hash=textdepo_hash("Text 2")), "Text 2")
+        filename = depo.index.get(textdepo_hash("Text 3"))["filename"]
+        self.assertEqual(depo.read(filename=filename), "Text 3")
+        self.assertEqual(sorted(depo.read_many(condition="test_depo")),
+                         ["Flat text", "Text 1", "Text 2", "Text 3"])
+
+    def test_pack_directory_scanned_once(self):
+        depo = TextDepo(self.test_dir, file_name="test_depo", layout="pack", pack_size=64)
+        with mock.patch("os.listdir", wraps=os.listdir) as listdir:
+            for i in range(6):
+                depo.write(f"Text {i}")
+        self.assertEqual(listdir.call_count, 1)
+        packs = sorted({d["pack"] for d in depo.index.values()})
+        self.assertEqual(packs, sorted(f for f in os.listdir(self.test_dir) if f.endswith(".pack.gz")))
+        self.assertGreater(len(packs), 1)
+        self.assertEqual(sorted(depo.read_many()), [f"Text {i}" for i in range(6)])
+
+    def test_read_many_where(self):
+        self.text_depo.write_many(["Text 1", "Text 2", "Text 3"],
+                                  meta=[{"source": "a"}, {"source": "b"}, {"source": "a"}])
+        self.assertEqual(sorted(self.text_depo.read_many(where={"source": "a"})), ["Text 1", "Text 3"])
+        self.assertEqual(list(self.text_depo.read_many(time_range=(None, "0"))), [])
+
+    def test_sqlite_index(self):
+        self.text_depo.write("Text 0", source="c")
+        depo = TextDepo(self.test_dir, file_name="test_depo", index="sqlite", indexed_meta=("source",))
+        self.assertEqual(len(depo.index), 1)  # imported from json index
+        depo.write_many(["Text 1", "Text 2", "Text 3"],
+                        meta=[{"source": "a"}, {"source": "b"}, {"source": "a"}])
+        self.assertEqual(len(depo.index), 4)
+        self.assertTrue(textdepo_hash("Text 2") in depo.index)
+        self.assertEqual(sorted(depo.read_many(where={"source": ["a", "c"]})), ["Text 0", "Text 1", "Text 3"])
+        self.assertEqual(sorted(depo.read_many(condition="test_depo", time_range=("0", None))),
+                         ["Text 0", "Text 1", "Text 2", "Text 3"])
+        plan = depo.index.con.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM descriptors WHERE json_extract(meta, '$.\"source\"') = 'a'"
+        ).fetchall()
+        self.assertIn("descriptors_meta_source", str([tuple(r) for r in plan]))
+        depo.close()
+
+    def test_query_parity(self):
+        meta = [{"source": "a", "n": 1}, {"source": None, "n": 2}, {"n": 3}, {"source": "b", "flag": True}]
+        texts = [f"Text {i}" for i in range(len(meta))]
+        json_depo = TextDepo(self.test_dir, file_name="json_depo")
+        with TextDepo(self.test_dir, file_name="sqlite_depo", index="sqlite", indexed_meta=("source",)) as sqlite_depo:
+            for depo in (json_depo, sqlite_depo):
+                depo.write_many(texts, meta=meta)
+            queries = [{"source": None}, {"source": "a"}, {"source": ["a", None]}, {"source": [None]},
+                       {"source": []}, {"source": "b", "flag": True}, {"n": [1, 3]}, {"source": None, "n": 3}]
+            for where in queries:
+                expected = sorted(json_depo.read_many(where=where))
+                self.assertEqual(sorted(sqlite_depo.read_many(where=where)), expected, where)
+        self.assertEqual(sorted(json_depo.read_many(where={"source": None})), ["Text 1", "Text 2"])
+
+    def test_close(self):
+        with TextDepo(self.test_dir, file_name="closed", index="sqlite", layout="pack") as depo:
+            depo.write_many(["Text 1", "Text 2"])
+            index = depo.index
+        self.assertIsNone(index.con)
+        index.close()  # closing twice is harmless
+        self.assertEqual(sorted(f for f in os.listdir(self.test_dir) if "closed.index" in f), ["closed.index.db"])
+        with TextDepo(self.test_dir, file_name="closed", index="sqlite") as depo:
+            self.assertEqual(sorted(depo.read_many()), ["Text 1", "Text 2"])
+        self.text_depo.write("Flat text")
+        self.text_depo.close()
+        self.assertEqual(len(TextDepo(self.test_dir, file_name="test_depo").index), 1)
+
+    def test_ingest(self):
+        items = ((f"Text {i % 25}", {"n": i % 25}) for i in range(60))
+        report = self.text_depo.ingest(items, batch_size=10, processes=0)
+        self.assertEqual((report.docs, report.written, report.skipped), (60, 25, 35))
+        self.assertEqual(self.text_depo.index.get(textdepo_hash("Text 7"))["filemeta"], {"n": 7})
+        self.assertEqual(len(list(self.text_depo.read_many(condition="test_depo"))), 25)
+
+    def test_ingest_process_pool(self):
+        depo = TextDepo(self.test_dir, file_name="packed", layout="pack")
+        report = depo.ingest((f"Text {i}" for i in range(30)), batch_size=8, processes=2)
+        self.assertEqual(report.written, 30)
+        self.assertGreater(report.docs_per_sec, 0)
+        self.assertEqual(depo.read(text_hash=textdepo_hash("Text 29")), "Text 29")
+
+    def test_near_duplicates(self):
+        words = [f"word{i}" for i in range(200)]
+        text = " ".join(words)
+        self.text_depo.write(text, near_duplicate_threshold=0.9)
+        self.text_depo.write(" ".join(words[:-1] + ["other"]), near_duplicate_threshold=0.9)
+        self.text_depo.write(" ".join(f"other{i * 7}" for i in range(200)), near_duplicate_threshold=0.9)
+        self.assertEqual(len(self.text_depo.index), 2)
+        similar = self.text_depo.similar(text + " word200")
+        self.assertEqual(similar[0][1]["hash"], textdepo_hash(text))
+        depo = TextDepo(self.test_dir, file_name="test_depo")
+        self.assertEqual(len(depo.lsh), 2)  # rebuilt from stored signatures
+
     def test_text_depo_index(self):
         index = TextDepoIndex(os.path.join(self.test_dir, "test_index"))
         index.set("key1", "value1")